@@ -0,0 +1,53 @@
+"""
+Microbenchmark: werder_events.dates vs. datetime.strptime.
+
+Parses a realistic mix of date strings (many events share the same day) with
+both approaches and prints the time per call.
+
+Usage: python benchmarks/bench_dates.py [-n NUMBER]
+"""
+import argparse
+import random
+import timeit
+from datetime import date, datetime, timedelta
+
+from werder_events import dates
+
+
+def make_samples(count, distinct_days=120):
+    start = date(2024, 8, 1)
+    days = [start + timedelta(days=i) for i in range(distinct_days)]
+    samples = []
+    for _ in range(count):
+        day = random.choice(days)
+        samples.append(f"{day:%d.%m.%Y} {random.randint(8, 22):02d}:{random.choice((0, 15, 30, 45)):02d}")
+    return samples
+
+
+def run(number):
+    random.seed(42)
+    samples = make_samples(number)
+    iso_samples = [s[6:10] + '-' + s[3:5] + '-' + s[:2] for s in samples]
+
+    cases = [
+        ("dd.mm.yyyy          strptime", lambda: [datetime.strptime(s[:10], "%d.%m.%Y").date() for s in samples]),
+        ("dd.mm.yyyy          dates   ", lambda: [dates.parse_german_date(s[:10]) for s in samples]),
+        ("dd.mm.yyyy HH:MM    strptime", lambda: [datetime.strptime(s, "%d.%m.%Y %H:%M") for s in samples]),
+        ("dd.mm.yyyy HH:MM    dates   ", lambda: [dates.parse_german_datetime(s) for s in samples]),
+        ("yyyy-mm-dd          strptime", lambda: [datetime.strptime(s, "%Y-%m-%d").date() for s in iso_samples]),
+        ("yyyy-mm-dd          dates   ", lambda: [dates.parse_iso_date(s) for s in iso_samples]),
+    ]
+
+    print(f"{number} strings per run, best of 5 runs")
+    for name, func in cases:
+        dates.clear_caches()
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{name}: {best / number * 1e9:8.0f} ns/call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark werder_events.dates against datetime.strptime.')
+    parser.add_argument('-n', '--number', type=int, default=100000, help='Number of date strings per run (default: 100000)')
+    args = parser.parse_args()
+
+    run(args.number)
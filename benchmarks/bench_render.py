@@ -0,0 +1,99 @@
+"""
+Benchmark: rendering the event viewer page from a synthetic database.
+
+Creates a temporary database with NUMBER visible upcoming events (default
+100000) and renders the page with werder_events.sqlite_to_html (streaming
+through the compiled template) and with the replaced implementation, which
+fetched all rows into a list and built the page as one string. The latter
+is kept here, reduced to its data handling, only for the comparison.
+Prints the time and the peak memory (tracemalloc) of each, and the size
+of the page, gzip- and (if installed) Brotli-compressed.
+
+Usage: python benchmarks/bench_render.py [-n NUMBER]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from werder_events.dates import parse_iso_date
+from werder_events.event import Event, EVENT_COLUMNS, make_event_key
+from werder_events.precompress import compressors
+from werder_events.sqlite_to_html import render_page
+from werder_events.utils import create_database, insert_events
+
+ASSETS = {'css': 'assets/app.css', 'js': 'assets/app.js'}
+
+
+def make_events(count):
+    start = date.today()
+    for i in range(count):
+        day = (start + timedelta(days=i % 365)).isoformat()
+        summary = f"Konzert in der Heilig-Geist-Kirche Nr. {i}"
+        yield Event(summary, day, day, None, None, "Heilig-Geist-Kirche, Werder (Havel)",
+                    "", "Single Day", "benchmark", make_event_key(summary, day, "benchmark"))
+
+
+def legacy_render(conn, file):
+    today_date = date.today()
+    cursor = conn.execute(f"""
+        SELECT {EVENT_COLUMNS} FROM events
+        WHERE is_visible = 1 AND is_cancelled = 0 AND start_date != 'unknown' AND start_date >= ?
+        ORDER BY start_date
+    """, (today_date.isoformat(),))
+    events = [event for event in map(Event._make, cursor.fetchall())
+              if parse_iso_date(event.start_date) >= today_date]
+    events_json = json.dumps([
+        {"summary": e.summary, "start": e.start_date, "end": e.end_date, "location": e.location, "source": e.source}
+        for e in events
+    ])
+    file.write(f"<html><body><script>const events = {events_json};</script></body></html>")
+
+
+def measure(render, conn, path):
+    """Time a render, then render again under tracemalloc (which slows it down) for the peak memory."""
+    start = time.perf_counter()
+    with open(path, 'w', encoding='utf-8') as f:
+        render(conn, f)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    with open(path, 'w', encoding='utf-8') as f:
+        render(conn, f)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def run(number):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = create_database(os.path.join(tmpdir, 'events.sqlite'))
+        insert_events(conn, make_events(number))
+        with conn:
+            conn.execute("UPDATE events SET is_visible = 1, is_reviewed = 1")
+
+        print(f"{number} visible upcoming events")
+        for name, render in [
+            ("werder_events.sqlite_to_html", lambda conn, f: render_page(conn, f, ASSETS)),
+            ("legacy (list + one string)", legacy_render),
+        ]:
+            path = os.path.join(tmpdir, 'index.html')
+            seconds, peak = measure(render, conn, path)
+            with open(path, 'rb') as f:
+                data = f.read()
+            sizes = ", ".join(f"{suffix} {len(compress(data)) / 2**20:.2f}" for suffix, compress in compressors())
+            print(f"{name:30} {seconds:6.2f} s, peak memory {peak / 2**20:7.1f} MiB, "
+                  f"{len(data) / 2**20:.1f} MiB written ({sizes} MiB)")
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the page rendering with and without streaming.")
+    parser.add_argument("-n", "--number", type=int, default=100000, help="Number of events (default: 100000)")
+    args = parser.parse_args()
+
+    run(args.number)
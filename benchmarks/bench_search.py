@@ -0,0 +1,72 @@
+"""
+Benchmark: full-text search on a synthetic events database.
+
+Creates a temporary database with NUMBER generated events (default 100000),
+then times a set of typical queries through werder_events.search.
+
+Usage: python benchmarks/bench_search.py [-n NUMBER]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from werder_events.event import Event, make_event_key
+from werder_events.search import search_events
+from werder_events.utils import create_database, insert_events
+
+WORDS = ("Konzert Lesung Führung Baumblütenfest Markt Kirche Orgel Jazz Kinder Theater "
+         "Ausstellung Wanderung Weinprobe Flohmarkt Chor Kabarett Seniorinnen Frühstück "
+         "Straßenfest Bühne Müller Havel Insel Obstbau Radtour Schlösser Gärten").split()
+LOCATIONS = ("Werder (Havel)", "Glindow", "Petzow", "Töplitz", "Phöben", "Plötzin",
+             "Bliesendorf", "Heilig-Geist-Kirche", "Inselstadt", "Vulkanfiberfabrik")
+# Filler vocabulary so that term frequencies resemble real descriptions
+FILLER = [f"wort{i}" for i in range(20000)]
+QUERIES = ("konzert", "Müller", "mueller", "strassenfest", "jazz insel", "führung kirche", "wein")
+
+
+def make_events(count):
+    start = date(2024, 1, 1)
+    for i in range(count):
+        summary = ' '.join(random.choices(WORDS, k=2) + random.choices(FILLER, k=4))
+        day = start + timedelta(days=random.randrange(3 * 365))
+        yield Event(
+            summary=summary,
+            start_date=day.isoformat(),
+            end_date=day.isoformat(),
+            start_datetime=None,
+            end_datetime=None,
+            location=random.choice(LOCATIONS),
+            description=' '.join(random.choices(WORDS, k=3) + random.choices(FILLER, k=40)),
+            event_type="Single Day",
+            source="benchmark",
+            event_key=make_event_key(f"{summary} {i}", day.isoformat(), "benchmark"),
+        )
+
+
+def run(number):
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = create_database(os.path.join(tmpdir, 'events.sqlite'))
+        start = time.perf_counter()
+        insert_events(conn, make_events(number))
+        print(f"Inserted {number} events (incl. index maintenance) in {time.perf_counter() - start:.1f} s")
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                results = search_events(conn, query, limit=20)
+                timings.append(time.perf_counter() - start)
+            print(f"{query!r:>20}: {len(results):2d} results, best {min(timings) * 1000:6.2f} ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark full-text search on a synthetic events database.')
+    parser.add_argument('-n', '--number', type=int, default=100000, help='Number of events to generate (default: 100000)')
+    args = parser.parse_args()
+
+    run(args.number)
@@ -0,0 +1,116 @@
+"""
+Benchmark: the stadtmagazin-events.de parser vs. the two implementations it
+replaced: string splitting (the old werder_events/stadtmagazin_events_de.py)
+and BeautifulSoup (the old stadtmagazin-events/stadtmagazin-events-to-sqlite.py).
+
+The old parsers are kept here, reduced to their parsing code, only for the
+comparison. Prints the time per result page of the fixture.
+
+Usage: python benchmarks/bench_stadtmagazin.py [-n NUMBER]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import timeit
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+from werder_events.dates import parse_german_date, parse_german_datetime, parse_time_range, to_timestamp
+from werder_events.event import Event, make_event_key
+from werder_events.stadtmagazin_events_de import parse_results
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                       'scratchpad', 'stadtmagazin-events-de', 'stadtmagazin_events.json')
+
+logger = logging.getLogger("bench_stadtmagazin")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+
+
+def legacy_string_splitting(data):
+    events = []
+    for result in data['results']:
+        title = result['title']
+        html = result['html']
+
+        location_html = html.split('<div class="event_info">')[1].split('</div>')[0]
+        location_parts = location_html.split('<a href="')
+        if len(location_parts) > 1:
+            location = location_parts[1].split('">')[1].split('</a>')[0]
+        else:
+            location = "Unknown"
+
+        date_time = html.split('<p class="event_date">')[1].split('</p>')[0].strip()
+        start = parse_german_date(date_time[:10])
+        start_time, end_time = parse_time_range(date_time[10:])
+
+        start_datetime = to_timestamp(start, start_time)
+        events.append(Event(
+            summary=title,
+            start_date=start.isoformat(),
+            end_date=start.isoformat(),
+            start_datetime=start_datetime,
+            end_datetime=to_timestamp(start, end_time),
+            location=location,
+            description=html.split('<p class="description">')[1].split('</p>')[0].strip(),
+            event_type=html.split('<p class="cats">')[1].split('</p>')[0],
+            source='stadtmagazin-events.de',
+            event_key=make_event_key(title, start.isoformat(), 'stadtmagazin-events.de'),
+        ))
+    return events
+
+
+def legacy_beautifulsoup(data):
+    events = []
+    for result in data['results']:
+        soup = BeautifulSoup(result['html'], 'html.parser')
+
+        date_str = soup.find('p', class_='event_date').text.strip()
+        start_date = parse_german_datetime(date_str[:16])
+        start_time, end_time = parse_time_range(date_str[10:])
+        end_date = datetime.combine(start_date.date(), end_time) if end_time else start_date
+
+        title = result['title']
+        location_link = soup.find('a', href=re.compile(r'/locations/'))
+        location = location_link.text.strip() if location_link else ''
+        description = soup.find('p', class_='description').text.split('/')[0].strip()
+
+        start_datetime = to_timestamp(start_date.date(), start_time)
+        events.append(Event(
+            summary=title,
+            start_date=start_date.date().isoformat(),
+            end_date=end_date.date().isoformat(),
+            start_datetime=start_datetime,
+            end_datetime=to_timestamp(end_date.date(), end_time),
+            location=location,
+            description=description,
+            event_type='Single Day' if start_date.date() == end_date.date() else 'Multi-Day',
+            source='stadtmagazin-events.de',
+            event_key=make_event_key(title, start_date.date().isoformat(), 'stadtmagazin-events.de'),
+        ))
+    return events
+
+
+def run(number):
+    with open(FIXTURE, encoding='utf-8') as f:
+        data = json.load(f)
+
+    print(f"{len(data['results'])} results per page, {number} runs")
+    for name, parse in [
+        ("werder_events.stadtmagazin_events_de", lambda: parse_results(data, logger)),
+        ("legacy string splitting", lambda: legacy_string_splitting(data)),
+        ("legacy BeautifulSoup", lambda: legacy_beautifulsoup(data)),
+    ]:
+        seconds = min(timeit.repeat(parse, number=number, repeat=5)) / number
+        print(f"{name:40} {seconds * 1e6:10.1f} µs per page")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the stadtmagazin-events.de parsers on the fixture.")
+    parser.add_argument("-n", "--number", type=int, default=200, help="Number of parses per measurement (default: 200)")
+    args = parser.parse_args()
+
+    run(args.number)
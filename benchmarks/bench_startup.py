@@ -0,0 +1,71 @@
+"""
+Benchmark: startup time of the ``werder-events`` commands.
+
+For every command that doesn't scrape, measures the wall-clock time of
+``python -m werder_events COMMAND --help`` and the import time of the
+command's module (``python -X importtime``), the best of REPEAT runs each,
+and checks that the module doesn't import the scraping dependencies
+(requests, bs4, icalendar). The scraping commands are listed for
+comparison.
+
+Usage: python benchmarks/bench_startup.py [-r REPEAT] [--budget MS]
+
+Exits with status 1 if a lightweight command takes longer than the budget
+(default: 100 ms) or imports a scraping dependency.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+from werder_events.cli import COMMANDS
+
+SCRAPING_COMMANDS = {'werder-havel-de', 'havelland-verteiler', 'stadtmagazin-events-de', 'daemon', 'regions'}
+SCRAPING_DEPENDENCIES = ('requests', 'bs4', 'icalendar')
+BUDGET_MS = 100
+
+
+def help_time(command):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'werder_events', command, '--help'],
+                   check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def import_time(module):
+    """The cumulative import time of ``module`` in ms and the names of all imported modules."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            check=True, capture_output=True, text=True)
+    # "import time: self [us] | cumulative | imported package", the module itself is the last line
+    lines = [line.split('|') for line in result.stderr.splitlines() if line.startswith('import time:')]
+    imported = {name.strip() for _, _, name in lines[1:]}
+    return int(lines[-1][1]) / 1000, imported
+
+
+def run(repeat, budget):
+    failed = False
+    print(f"{'command':24} {'--help':>9} {'import':>9}")
+    for name, command in COMMANDS.items():
+        wall = min(help_time(name) for _ in range(repeat))
+        imports = [import_time(command.module) for _ in range(repeat)]
+        module_time = min(seconds for seconds, _ in imports)
+        heavy = sorted(dependency for dependency in SCRAPING_DEPENDENCIES if dependency in imports[0][1])
+        if name in SCRAPING_COMMANDS:
+            status = "(scraper)"
+        elif wall > budget or heavy:
+            status = "FAIL" + (f" imports {', '.join(heavy)}" if heavy else "")
+            failed = True
+        else:
+            status = "OK"
+        print(f"{name:24} {wall:6.1f} ms {module_time:6.1f} ms  {status}")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the startup time of the werder-events commands.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Runs per command, the best counts (default: 5)")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS,
+                        help=f"Maximum --help time of the lightweight commands in ms (default: {BUDGET_MS})")
+    args = parser.parse_args()
+
+    sys.exit(1 if run(args.repeat, args.budget) else 0)
@@ -0,0 +1,102 @@
+"""
+Benchmark: the statistics and the columnar export on a multi-year archive.
+
+Creates a temporary working database (the upcoming year) and an archive
+database (YEARS past years) with NUMBER events per year from three sources,
+some of them published by several sources, and times every aggregate of
+werder_events.stats over both databases, the Parquet and Arrow exports (if
+pyarrow is installed) and, for comparison, the JSON Lines text export of
+both databases (werder_events.dump), which the statistics used to be
+computed from.
+
+Usage: python benchmarks/bench_stats.py [-y YEARS] [-n NUMBER]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from werder_events.categories import categorize_events
+from werder_events.dump import export_database
+from werder_events.event import Event, make_event_key
+from werder_events.stats import (events_per_category, events_per_district, events_per_month, export_events,
+                                 freshness, open_stats, source_overlap)
+from werder_events.utils import create_database, insert_events
+
+SOURCES = ('werder-havel.de', 'havelland-verteiler.de', 'stadtmagazin-events.de')
+TITLES = ('Orgelkonzert', 'Stadtführung', 'Vernissage', 'Yoga am See', 'Flohmarkt', 'Lesung', 'Regatta')
+LOCATIONS = ('Heilig-Geist-Kirche, Werder (Havel)', 'Kulturkirche Petzow', 'Dorfkirche Glindow',
+             'Sportplatz Töplitz', 'Bismarckhöhe', '')
+
+
+def make_events(first_day, days, number):
+    for i in range(number):
+        day = (first_day + timedelta(days=i * days // number)).isoformat()
+        summary = f"{TITLES[i % len(TITLES)]} {i // 10}"
+        # Every tenth event is published by a second source, too
+        for source in SOURCES[i % 3:i % 3 + (2 if i % 10 == 0 else 1)]:
+            yield Event(summary, day, day, None, None, LOCATIONS[i % len(LOCATIONS)], "", "Single Day", source,
+                        make_event_key(summary, day, source))
+
+
+def fill(db_path, first_day, years, number):
+    conn = create_database(db_path)
+    for year in range(years):
+        insert_events(conn, make_events(first_day + timedelta(days=365 * year), 365, number))
+    categorize_events(conn)
+    conn.close()
+
+
+def timed(name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{name:36} {time.perf_counter() - start:7.2f} s")
+    return result
+
+
+def run(years, number):
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'events.sqlite')
+        archive_path = os.path.join(tmpdir, 'events-archive.sqlite')
+        fill(db_path, today, 1, number)
+        fill(archive_path, today - timedelta(days=365 * years), years, number)
+        total = sum(create_database(path).execute("SELECT count(*) FROM events").fetchone()[0]
+                    for path in (db_path, archive_path))
+        print(f"{total} events, {years} archived years")
+
+        conn = open_stats(db_path, archive_path)
+        for name, func in [
+            ("events per month and source", events_per_month),
+            ("events per district", events_per_district),
+            ("events per category", events_per_category),
+            ("source overlap", source_overlap),
+        ]:
+            timed(name, func, conn)
+        timed("freshness", freshness, conn)
+
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow is not installed, skipping the Parquet/Arrow export")
+        else:
+            for filename in ('events.parquet', 'events.arrow'):
+                path = os.path.join(tmpdir, filename)
+                timed(f"export {filename}", export_events, conn, path)
+                print(f"{'':36} {os.path.getsize(path) / 1e6:7.1f} MB")
+        conn.close()
+
+        start = time.perf_counter()
+        export_database(db_path, os.path.join(tmpdir, 'data'))
+        export_database(archive_path, os.path.join(tmpdir, 'data', 'archive'))
+        print(f"{'text export (dump.py)':36} {time.perf_counter() - start:7.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the event statistics and exports on a synthetic archive.")
+    parser.add_argument("-y", "--years", type=int, default=5, help="Archived years (default: 5)")
+    parser.add_argument("-n", "--number", type=int, default=50_000, help="Events per year (default: 50000)")
+    args = parser.parse_args()
+
+    run(args.years, args.number)
@@ -0,0 +1,94 @@
+"""
+Benchmark: concurrent producers writing events to one database.
+
+PRODUCERS threads each write NUMBER events in chunks of CHUNK events (like
+scrapers storing a result page at a time), either each through its own
+connection (insert_events, one transaction per chunk, competing for the
+write lock with a short busy timeout) or all through one shared
+werder_events.writer.Writer. Prints the time, the events written and the
+chunks that failed with "database is locked".
+
+Usage: python benchmarks/bench_writer.py [-p PRODUCERS] [-n NUMBER] [-c CHUNK]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from werder_events.event import Event, make_event_key
+from werder_events.utils import create_database, insert_events
+from werder_events.writer import Writer
+
+# Short, so that lock contention shows up as errors as it would with many writers
+BUSY_TIMEOUT = 0.1
+
+
+def make_chunks(producer, number, chunk):
+    start = date.today()
+    source = f"producer-{producer}"
+    events = []
+    for i in range(number):
+        day = (start + timedelta(days=i % 365)).isoformat()
+        summary = f"Konzert Nr. {i}"
+        events.append(Event(summary, day, day, None, None, "Werder (Havel)", "", "Single Day", source,
+                            make_event_key(summary, day, source)))
+    return [events[i:i + chunk] for i in range(0, number, chunk)]
+
+
+def own_connections(db_path, chunks_per_producer):
+    def produce(chunks):
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+        written = failed = 0
+        try:
+            for chunk in chunks:
+                try:
+                    written += insert_events(conn, chunk)
+                except sqlite3.OperationalError:
+                    failed += 1
+        finally:
+            conn.close()
+        return written, failed
+
+    with ThreadPoolExecutor(len(chunks_per_producer)) as executor:
+        results = list(executor.map(produce, chunks_per_producer))
+    return sum(written for written, _ in results), sum(failed for _, failed in results)
+
+
+def shared_writer(db_path, chunks_per_producer):
+    with Writer(db_path) as writer:
+        def produce(chunks):
+            futures = [writer.insert(chunk) for chunk in chunks]
+            return sum(future.result() for future in futures)
+
+        with ThreadPoolExecutor(len(chunks_per_producer)) as executor:
+            written = sum(executor.map(produce, chunks_per_producer))
+    return written, 0
+
+
+def run(producers, number, chunk):
+    chunks_per_producer = [make_chunks(producer, number, chunk) for producer in range(producers)]
+    print(f"{producers} producers, {number} events each, in chunks of {chunk}")
+    for name, write in [
+        ("one connection per producer", own_connections),
+        ("werder_events.writer.Writer", shared_writer),
+    ]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'events.sqlite')
+            create_database(db_path).close()
+            start = time.perf_counter()
+            written, failed = write(db_path, chunks_per_producer)
+            seconds = time.perf_counter() - start
+        print(f"{name:28} {seconds:6.2f} s, {written:7} events written, {failed:4} chunks failed (database is locked)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare concurrent writers with the single shared writer.")
+    parser.add_argument("-p", "--producers", type=int, default=8, help="Number of producer threads (default: 8)")
+    parser.add_argument("-n", "--number", type=int, default=5000, help="Events per producer (default: 5000)")
+    parser.add_argument("-c", "--chunk", type=int, default=20, help="Events per write (default: 20)")
+    args = parser.parse_args()
+
+    run(args.producers, args.number, args.chunk)
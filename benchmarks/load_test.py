@@ -0,0 +1,107 @@
+"""
+Load test for the events API (werder_events.serve).
+
+Creates a temporary database with NUMBER generated visible events (default
+100000), starts the API server on it in a subprocess and runs CONCURRENCY
+keep-alive clients against it for DURATION seconds, once with a small set of
+repeated queries (mostly served from the cache) and once with unique queries
+(every request hits the database).
+
+Usage: python benchmarks/load_test.py [-n NUMBER] [-c CONCURRENCY] [-d DURATION]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from werder_events.utils import create_database, insert_events
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_search import make_events  # noqa: E402
+
+PORT = 8765
+CACHED_QUERIES = (
+    "/events?from=2024-01-01",
+    "/events?from=2024-06-01&limit=20",
+    "/events?from=2024-01-01&district=Glindow",
+    "/events?from=2024-01-01&q=konzert",
+    "/sources",
+)
+
+
+def unique_queries():
+    for offset in itertools.count():
+        yield f"/events?from=2024-01-01&limit=20&offset={offset % 5000 * 20}"
+
+
+async def client(paths, deadline, counter):
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    while time.perf_counter() < deadline:
+        path = next(paths)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        content_length = 0
+        while True:
+            line = await reader.readline()
+            if line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length:"):
+                content_length = int(line.split(b":")[1])
+        await reader.readexactly(content_length)
+        counter[0] += 1
+    writer.close()
+
+
+async def run_clients(paths, concurrency, duration):
+    counter = [0]
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(paths, deadline, counter) for _ in range(concurrency)))
+    return counter[0] / duration
+
+
+async def wait_for_server():
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", PORT)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+def run(number, concurrency, duration):
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "events.sqlite")
+        conn = create_database(db_path)
+        insert_events(conn, make_events(number))
+        with conn:
+            conn.execute("UPDATE events SET is_visible = 1")
+        conn.close()
+
+        server = subprocess.Popen([sys.executable, "-m", "werder_events.serve", db_path, "--port", str(PORT)])
+        try:
+            asyncio.run(wait_for_server())
+            cached = asyncio.run(run_clients(itertools.cycle(CACHED_QUERIES), concurrency, duration))
+            print(f"Repeated queries (cached):  {cached:8.0f} requests/s")
+            uncached = asyncio.run(run_clients(unique_queries(), concurrency, duration))
+            print(f"Unique queries (uncached):  {uncached:8.0f} requests/s")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the events API on a synthetic database.")
+    parser.add_argument("-n", "--number", type=int, default=100000, help="Number of events to generate (default: 100000)")
+    parser.add_argument("-c", "--concurrency", type=int, default=20, help="Number of concurrent clients (default: 20)")
+    parser.add_argument("-d", "--duration", type=float, default=10, help="Duration of each run in seconds (default: 10)")
+    args = parser.parse_args()
+
+    run(args.number, args.concurrency, args.duration)
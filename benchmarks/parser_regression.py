@@ -0,0 +1,124 @@
+"""
+Regression harness for the parsers: runs every parser on its stored input
+fixtures, compares the normalized events to the golden files in
+``benchmarks/golden/`` and reports the differences and the parsing time per
+fixture. Use it to check that a (performance) rewrite of a parser doesn't
+change its output.
+
+Usage:
+    python benchmarks/parser_regression.py [-r REPEAT] [-k NAME]
+    python benchmarks/parser_regression.py --update   # accept the current output
+
+Exits with status 1 if any output differs from its golden file.
+"""
+import argparse
+import difflib
+import json
+import logging
+import os
+import time
+from datetime import date
+
+from werder_events import havelland_verteiler, stadtmagazin_events_de, werder_havel_de
+from werder_events.districts import WERDER_DISTRICTS_PATTERN
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scratchpad')
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+# The day the werder-havel.de fixture was saved, for 'Heute' and 'Morgen'
+WERDER_HAVEL_DE_FIXTURE_DATE = date(2024, 8, 14)
+
+logger = logging.getLogger("parser_regression")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+
+
+def parse_werder_havel_de(path):
+    with open(path, encoding='utf-8') as f:
+        return werder_havel_de.parse_html(f.read(), logger, today=WERDER_HAVEL_DE_FIXTURE_DATE)
+
+
+# (name, fixture path relative to scratchpad/, parser taking the fixture path)
+FIXTURES = [
+    ('havelland_verteiler', 'havelland_verteiler/havelland_verteiler.ics',
+     lambda path: havelland_verteiler.parse_ical(path, WERDER_DISTRICTS_PATTERN)),
+    ('havelland_verteiler_unfiltered', 'havelland_verteiler/havelland_verteiler.ics',
+     havelland_verteiler.parse_ical),
+    ('werder_havel_de', 'werder-havel-de/veranstaltungskalender.html',
+     parse_werder_havel_de),
+    ('stadtmagazin_events_de', 'stadtmagazin-events-de/stadtmagazin_events.json',
+     lambda path: stadtmagazin_events_de.parse_events(path, logger)),
+]
+
+
+def normalize(events):
+    """One JSON line per event, in a stable order."""
+    lines = [json.dumps(event._asdict(), ensure_ascii=False, sort_keys=True) for event in events]
+    return sorted(lines)
+
+
+def golden_path(name):
+    return os.path.join(GOLDEN_DIR, f"{name}.jsonl")
+
+
+def read_golden(name):
+    path = golden_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def write_golden(name, lines):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    with open(golden_path(name), 'w', encoding='utf-8') as f:
+        f.writelines(line + "\n" for line in lines)
+
+
+def time_parser(parse, path, repeat):
+    """Return the output of the first run and the best time of ``repeat`` runs in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        events = parse(path)
+        timings.append(time.perf_counter() - start)
+    return events, min(timings)
+
+
+def run(repeat, update, selected=None):
+    failed = 0
+    for name, fixture, parse in FIXTURES:
+        if selected and selected not in name:
+            continue
+        events, seconds = time_parser(parse, os.path.join(FIXTURES_DIR, fixture), repeat)
+        lines = normalize(events)
+        golden = read_golden(name)
+
+        if update:
+            status = "UPDATED" if golden != lines else "OK"
+            write_golden(name, lines)
+        elif golden is None:
+            status = "NO GOLDEN"
+            failed += 1
+        elif golden == lines:
+            status = "OK"
+        else:
+            status = "DIFF"
+            failed += 1
+        print(f"{status:9} {name:32} {len(events):5} events {seconds * 1000:9.2f} ms")
+
+        if status == "DIFF":
+            diff = difflib.unified_diff(golden, lines, f"golden/{name}.jsonl", "current", lineterm="", n=0)
+            for line in diff:
+                print(f"    {line}")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the parser output on the fixtures to the golden files.')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Parse each fixture REPEAT times and report the best time (default: 5)')
+    parser.add_argument('-k', dest='selected', help='Only run the fixtures whose name contains this string')
+    parser.add_argument('--update', action='store_true', help='Write the current output to the golden files')
+    args = parser.parse_args()
+
+    raise SystemExit(1 if run(args.repeat, args.update, args.selected) else 0)
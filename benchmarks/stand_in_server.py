@@ -0,0 +1,154 @@
+"""
+Local stand-in for the event sources that simulates slow and failing servers.
+
+Serves the scratchpad fixtures and misbehaves depending on the path:
+
+    /fixtures/<path>            the file scratchpad/<path>
+    /slow/<seconds>/<path>      the file, after sleeping <seconds>
+    /status/<code>              an empty response with the given status code
+    /flaky/<n>/<path>           status 503 for the first <n> requests, then the file
+    /paged/<n>/<path>?page=<p>  the JSON file, with "page": <p> and "more" set
+                                for pages before <n>, like the stadtmagazin API
+    /hang                       accepts the request but never responds
+
+Run it and point a scraper at it, e.g.
+
+    python benchmarks/stand_in_server.py --port 8766
+    python werder_events/werder_havel_de.py http://localhost:8766/slow/3/werder-havel-de/veranstaltungskalender.html /tmp/events.sqlite -v
+
+or run ``--check`` to exercise werder_events.fetch against it (timeouts,
+retries, circuit breaker) and print the outcome of each scenario.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scratchpad')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    request_counts = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        with self.lock:
+            self.request_counts[self.path] += 1
+            count = self.request_counts[self.path]
+
+        if parts[0] == 'fixtures':
+            self.send_file('/'.join(parts[1:]))
+        elif parts[0] == 'slow':
+            time.sleep(float(parts[1]))
+            self.send_file('/'.join(parts[2:]))
+        elif parts[0] == 'status':
+            self.send_response(int(parts[1]))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif parts[0] == 'flaky':
+            if count <= int(parts[1]):
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            else:
+                self.send_file('/'.join(parts[2:]))
+        elif parts[0] == 'paged':
+            page = int(dict(parse_qsl(url.query)).get('page', 1))
+            self.send_page('/'.join(parts[2:]), page, int(parts[1]))
+        elif parts[0] == 'hang':
+            time.sleep(3600)
+        else:
+            self.send_error(404)
+
+    def read_fixture(self, relative_path):
+        path = os.path.normpath(os.path.join(FIXTURES_DIR, relative_path))
+        if not path.startswith(os.path.normpath(FIXTURES_DIR)) or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def send_file(self, relative_path):
+        body = self.read_fixture(relative_path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_body(body)
+
+    def send_page(self, relative_path, page, pages):
+        body = self.read_fixture(relative_path)
+        if body is None:
+            self.send_error(404)
+            return
+        data = json.loads(body)
+        data['page'] = page
+        data['more'] = page < pages
+        self.send_body(json.dumps(data).encode('utf-8'))
+
+    def send_body(self, body):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port):
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def check(port):
+    from werder_events.fetch import HttpClient
+
+    base = f"http://127.0.0.1:{port}"
+    client = HttpClient(connect_timeout=1, read_timeout=1, max_retries=2,
+                        backoff_base=0.1, failure_threshold=2, reset_timeout=60)
+    scenarios = [
+        ("fixture", f"{base}/fixtures/stadtmagazin-events-de/stadtmagazin_events.json", "ok"),
+        ("slow but within timeout", f"{base}/slow/0.5/stadtmagazin-events-de/stadtmagazin_events.json", "ok"),
+        ("flaky, recovers after 2 retries", f"{base}/flaky/2/stadtmagazin-events-de/stadtmagazin_events.json", "ok"),
+        ("not found (no retry)", f"{base}/status/404", "HTTPError"),
+        ("hanging server (read timeout)", f"{base}/hang", "ReadTimeout"),
+        ("server error, breaker opens", f"{base}/status/500", "HTTPError"),
+        ("breaker open, skipped", f"{base}/fixtures/stadtmagazin-events-de/stadtmagazin_events.json", "CircuitOpenError"),
+    ]
+    failed = 0
+    for name, url, expected in scenarios:
+        start = time.perf_counter()
+        try:
+            client.get(url, source="stand-in")
+            outcome = "ok"
+        except Exception as e:
+            outcome = type(e).__name__
+        elapsed = time.perf_counter() - start
+        status = "PASS" if outcome == expected else "FAIL"
+        failed += status == "FAIL"
+        print(f"{status} {name:35} {outcome:18} {elapsed:6.2f} s")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve fixtures like a slow or failing event source.')
+    parser.add_argument('--port', type=int, default=8766, help='Port to listen on (default: 8766)')
+    parser.add_argument('--check', action='store_true', help='Run the fetch layer against the server and exit')
+    args = parser.parse_args()
+
+    server = start_server(args.port)
+    if args.check:
+        raise SystemExit(1 if check(args.port) else 0)
+    print(f"Serving on http://127.0.0.1:{args.port}/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,3 +1,11 @@
-from . import havelland_verteiler
-from . import werder_havel_de
-from . import stadtmagazin_events_de
+import importlib
+
+# The scrapers pull in requests, bs4 and icalendar: they're imported on first
+# access (``werder_events.werder_havel_de``), not with the package
+SCRAPERS = ('havelland_verteiler', 'werder_havel_de', 'stadtmagazin_events_de')
+
+
+def __getattr__(name):
+    if name in SCRAPERS:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,3 @@
+from werder_events.cli import main
+
+main()
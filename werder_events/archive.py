@@ -0,0 +1,92 @@
+"""
+Move past events from the working database into an archive database.
+
+The page only shows upcoming events, so past events just make the working
+database (which is committed on every run) bigger. Archived events are
+copied to a separate archive DB and deleted from the working DB; their
+keys are kept in the ``archived_keys`` table so that the scrapers don't
+insert them again. Finally the working DB is VACUUMed to actually shrink
+the file.
+"""
+import argparse
+import os
+import sqlite3
+from datetime import date, timedelta
+
+from werder_events.event import EVENT_COLUMNS
+from werder_events.utils import create_database, setup_logger
+
+ARCHIVED_COLUMNS = f"{EVENT_COLUMNS}, is_reviewed, is_visible, is_cancelled, category"
+
+# Events that have ended before the cutoff date. Events with unknown dates
+# ('unknown' sorts after all ISO dates) are never archived.
+PAST_EVENTS_WHERE = "coalesce(end_date, start_date) < :cutoff AND start_date < :cutoff"
+
+
+def archive_events(conn, archive_path, cutoff):
+    """
+    Move all events that ended before ``cutoff`` (an ISO date) from ``conn``
+    into the archive DB at ``archive_path``, in a single transaction.
+    Returns the number of archived events.
+    """
+    # Create the archive DB with the same schema as the working DB
+    create_database(archive_path).close()
+
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    try:
+        with conn:
+            params = {'cutoff': cutoff}
+            conn.execute(f"""
+                INSERT OR IGNORE INTO archive.events ({ARCHIVED_COLUMNS})
+                SELECT {ARCHIVED_COLUMNS} FROM main.events WHERE {PAST_EVENTS_WHERE}
+            """, params)
+            conn.execute(f"""
+                INSERT OR IGNORE INTO main.archived_keys (event_key)
+                SELECT event_key FROM main.events WHERE {PAST_EVENTS_WHERE}
+            """, params)
+            conn.execute(f"""
+                DELETE FROM main.event_presence
+                WHERE event_key IN (SELECT event_key FROM main.events WHERE {PAST_EVENTS_WHERE})
+            """, params)
+            cursor = conn.execute(f"DELETE FROM main.events WHERE {PAST_EVENTS_WHERE}", params)
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    return cursor.rowcount
+
+
+def main(db_path, archive_path, keep_days, vacuum, verbose):
+    logger = setup_logger("archive", verbose)
+    conn = None
+    try:
+        size_before = os.path.getsize(db_path)
+        conn = create_database(db_path, logger)
+
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        logger.info(f"Archiving events that ended before {cutoff} to {archive_path}")
+        archived_count = archive_events(conn, archive_path, cutoff)
+        logger.info(f"Archived events: {archived_count}")
+
+        if vacuum:
+            conn.execute("VACUUM")
+        conn.close()
+        conn = None
+        logger.info(f"Size of {db_path}: {size_before / 1024:.0f} KiB -> {os.path.getsize(db_path) / 1024:.0f} KiB")
+    except sqlite3.Error as e:
+        logger.error(f"SQLite error: {e}")
+    except OSError as e:
+        logger.error(f"Error accessing database file: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Move past events from the events database into an archive database.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    parser.add_argument('archive_path', help='Path to the archive SQLite database file (created if missing)')
+    parser.add_argument('--keep-days', type=int, default=0, help='Keep events that ended less than this many days ago (default: 0)')
+    parser.add_argument('--no-vacuum', dest='vacuum', action='store_false', help="Don't VACUUM the events database afterwards")
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
+    args = parser.parse_args()
+
+    main(args.db_path, args.archive_path, args.keep_days, args.vacuum, args.verbose)
@@ -0,0 +1,144 @@
+"""
+Normalize the event categories to a fixed taxonomy (``events.category``).
+
+The sources publish no or inconsistent categories: werder-havel.de and the
+iCal feed none (``event_type`` is 'Single Day', 'Multi-Day' or 'Recurring'),
+stadtmagazin-events.de its own, comma-separated (``source_categories``, e.g.
+'Führung, Täglich'; older rows have a single one in ``event_type``). Each
+source category is looked up in ``SOURCE_CATEGORIES``, else matched against
+the keyword rules; the first one that maps wins. Otherwise the title (then
+the description) is matched against the keyword rules, which are compiled
+into a single regex. The leftmost keyword wins, events without any match are
+'other'.
+
+Only events without a category are categorized (an upsert resets it), and
+the keyword match of a title is cached in the process, as many titles recur.
+
+    python -m werder_events.categories events.sqlite -v
+    python -m werder_events.categories events.sqlite --all
+"""
+import argparse
+import re
+from functools import cache, lru_cache
+
+from werder_events.utils import create_database, setup_logger
+
+# Category -> label shown on the page
+TAXONOMY = {
+    'music': "Musik & Konzerte",
+    'stage': "Theater & Bühne",
+    'exhibition': "Ausstellungen & Kunst",
+    'tour': "Führungen & Ausflüge",
+    'course': "Kurse & Workshops",
+    'market': "Märkte & Feste",
+    'family': "Kinder & Familie",
+    'sport': "Sport",
+    'talk': "Vorträge & Lesungen",
+    'church': "Kirche",
+    'other': "Sonstiges",
+}
+
+# The event_type values that are durations, not categories
+EVENT_TYPES = {'single day', 'multi-day', 'recurring'}
+
+# Categories published by the sources (casefolded) -> category
+SOURCE_CATEGORIES = {
+    'konzert': 'music', 'musik': 'music', 'konzerte': 'music', 'live': 'music',
+    'theater': 'stage', 'kabarett': 'stage', 'comedy': 'stage', 'bühne': 'stage',
+    'ausstellung': 'exhibition', 'kunst': 'exhibition', 'ausstellungen': 'exhibition',
+    'führung': 'tour', 'führungen': 'tour', 'ausflug': 'tour',
+    'kurs': 'course', 'workshop': 'course', 'kurse': 'course',
+    'markt': 'market', 'fest': 'market', 'festival': 'market', 'feste': 'market',
+    'kinder': 'family', 'familie': 'family',
+    'sport': 'sport',
+    'vortrag': 'talk', 'lesung': 'talk', 'literatur': 'talk',
+}
+
+# Keyword rules: category -> regex (matched case-insensitively, anywhere in a word
+# unless anchored with \b, so that e.g. 'Herbstkonzert' is music)
+KEYWORDS = {
+    'music': r"konzert|musik|orgel|jazz|chor\b|band\b|\bdisco|party|liedersingen|handpan|\btrio\b|quartett",
+    'stage': r"theater|kabarett|comedy|komödie|\btanz|dance|oper\b|musical|varieté|zaubershow|zirkus|krimi|open ?stage",
+    'exhibition': r"ausstellung|vernissage|galerie|\bkunst|retrospektive|atelier|museum|museen",
+    'tour': r"führung|rundfahrt|rundgang|ausflug|fahrten\b|wanderung|radtour|exkursion",
+    'course': r"workshop|kurs\b|seminar|qigong|yoga|meditation|kräuterkunde|basiswissen",
+    'market': r"markt|fest\b|festival|baumblüten|kirmes|feier\b|karneval|fasching|halloween",
+    'family': r"\bkinder|familie|laternen|märchen|puppen|kita\b",
+    'sport': r"regatta|lauf\b|turnier|fußball|volleyball|sportplatz|radrennen|schwimmen|fahrrad|bouldern",
+    'talk': r"vortrag|lesung|gespräch|diskussion|erzähl",
+    'church': r"gottesdienst|andacht|gebet|messe\b|taizé",
+}
+
+
+@cache
+def keyword_regex():
+    """All keyword rules as one regex; the name of the matching group is the category."""
+    return re.compile('|'.join(f"(?P<{category}>{pattern})" for category, pattern in KEYWORDS.items()),
+                      re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def match_keywords(text):
+    match = keyword_regex().search(text)
+    return match.lastgroup if match else None
+
+
+def map_source_category(name):
+    name = name.strip().casefold()
+    return (SOURCE_CATEGORIES.get(name) or match_keywords(name)) if name else None
+
+
+def categorize(summary, description, event_type, source_categories=None):
+    """Return the category of an event."""
+    for name in (source_categories or '').split(','):
+        category = map_source_category(name)
+        if category:
+            return category
+    event_type = (event_type or '').strip()
+    if event_type.casefold() not in EVENT_TYPES:
+        category = map_source_category(event_type)
+        if category:
+            return category
+    return (match_keywords(summary or '')
+            or match_keywords((description or '')[:500])
+            or 'other')
+
+
+def categorize_events(conn, logger=None, recategorize=False):
+    """
+    Set the category of all events without one (of all events if
+    ``recategorize``). Returns the number of categorized events.
+    """
+    where = "" if recategorize else "WHERE category IS NULL"
+    rows = conn.execute(
+        f"SELECT id, summary, description, event_type, source_categories FROM events {where}").fetchall()
+    with conn:
+        conn.executemany("UPDATE events SET category = ? WHERE id = ?",
+                         ((categorize(summary, description, event_type, source_categories), event_id)
+                          for event_id, summary, description, event_type, source_categories in rows))
+    if logger:
+        logger.info(f"Categorized {len(rows)} events")
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign the events to the categories of the taxonomy.")
+    parser.add_argument("db_path", help="Path to the SQLite database file")
+    parser.add_argument("--all", action="store_true", help="Recategorize all events, e.g. after changing the rules")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    logger = setup_logger("categories", args.verbose)
+    conn = create_database(args.db_path, logger)
+    try:
+        categorize_events(conn, logger, args.all)
+        if args.verbose:
+            for category, count in conn.execute(
+                    "SELECT category, count(*) FROM events GROUP BY category ORDER BY count(*) DESC"):
+                logger.debug(f"{count:6}  {category}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
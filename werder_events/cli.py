@@ -0,0 +1,88 @@
+"""
+The ``werder-events`` command: one entry point for all the tools.
+
+    werder-events COMMAND [ARGS ...]
+    werder-events dump export events.sqlite data
+    werder-events migrate 07 events.sqlite
+
+Every command runs the ``__main__`` block of its module (as with ``python -m
+werder_events.MODULE``), with the same arguments. Only that module is
+imported, so the commands that don't scrape start without loading requests,
+bs4 or icalendar (see benchmarks/bench_startup.py).
+"""
+import argparse
+import os
+import runpy
+import sys
+from typing import NamedTuple
+
+
+class Command(NamedTuple):
+    module: str
+    help: str
+
+
+COMMANDS = {
+    'werder-havel-de': Command('werder_events.werder_havel_de', "Scrape werder-havel.de"),
+    'havelland-verteiler': Command('werder_events.havelland_verteiler', "Scrape the havelland-verteiler.de iCal feed"),
+    'stadtmagazin-events-de': Command('werder_events.stadtmagazin_events_de', "Scrape stadtmagazin-events.de"),
+    'daemon': Command('werder_events.daemon', "Refresh the sources continuously"),
+    'regions': Command('werder_events.regions', "Scrape and render several regions"),
+    'html': Command('werder_events.sqlite_to_html', "Render the static page"),
+    'feeds': Command('werder_events.feeds', "Write the iCalendar and JSON feeds"),
+    'precompress': Command('werder_events.precompress', "Write .gz/.br files next to the site's files"),
+    'serve': Command('werder_events.serve', "Serve the JSON API"),
+    'search': Command('werder_events.search', "Full-text search of the events"),
+    'review': Command('werder_events.review', "Review and publish events"),
+    'archive': Command('werder_events.archive', "Move past events to the archive database"),
+    'presence': Command('werder_events.presence', "Flag events missing from their source as cancelled"),
+    'geocode': Command('werder_events.geocode', "Resolve the event locations to venues"),
+    'categories': Command('werder_events.categories', "Assign the event categories"),
+    'validate': Command('werder_events.validate', "Report or recheck rejected events"),
+    'stats': Command('werder_events.stats', "Event statistics, Parquet/Arrow export"),
+    'dump': Command('werder_events.dump', "Export the database to text or rebuild it"),
+    'raw-archive': Command('werder_events.raw_archive', "List or reparse the raw response archive"),
+}
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def find_migration(name):
+    """The path of the migration script whose name starts with ``name`` (e.g. '07')."""
+    scripts = sorted(filename for filename in os.listdir(MIGRATIONS_DIR)
+                     if filename.endswith('.py') and filename.startswith(name))
+    if len(scripts) != 1:
+        available = ', '.join(sorted(filename[:-3] for filename in os.listdir(MIGRATIONS_DIR) if filename.endswith('.py')))
+        raise SystemExit(f"werder-events migrate: {'ambiguous' if scripts else 'unknown'} migration {name!r}, "
+                         f"choose from {available}")
+    return os.path.join(MIGRATIONS_DIR, scripts[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="werder-events",
+        description="Scrape, store and publish the events of Werder (Havel). "
+                    "Run 'werder-events COMMAND --help' for the arguments of a command.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:24}{command.help}" for name, command in COMMANDS.items())
+               + f"\n  {'migrate NAME':24}Run a migration script, e.g. 'migrate 07 events.sqlite'")
+    parser.add_argument("command", choices=[*COMMANDS, 'migrate'], metavar="COMMAND")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the command")
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        parser.error("a COMMAND is required")
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        if not args.args:
+            parser.error("migrate: the name of the migration is required")
+        path = find_migration(args.args[0])
+        sys.argv = [path, *args.args[1:]]
+        runpy.run_path(path, run_name="__main__")
+    else:
+        sys.argv = [f"werder-events {args.command}", *args.args]
+        runpy.run_module(COMMANDS[args.command].module, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Keep the events database up to date in a long-running process, instead of
+scraping all sources once a day.
+
+Every source is refreshed on its own interval (with random jitter, so the
+requests don't line up). The refreshes fetch and parse in parallel, one
+worker thread per source, reusing the shared HTTP session (see fetch.py)
+across cycles, and hand their events to the single database writer (see
+writer.py), which owns the process' only database connection. The page and
+the feeds are rendered (on the writer, so they see a consistent database)
+only after a refresh changed events (or when the day changes, as past events
+drop off the page).
+
+    python -m werder_events.daemon events.sqlite --html _site/index.html --feeds _site/feeds -v
+    python -m werder_events.daemon events.sqlite --interval werder-havel.de=30 --once
+
+With ``--once``, every source is refreshed once, the outputs are rendered if
+anything changed, and the daemon exits.
+"""
+import argparse
+import asyncio
+import random
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, NamedTuple
+from urllib.parse import urlparse
+
+from werder_events import havelland_verteiler, stadtmagazin_events_de, werder_havel_de
+from werder_events.categories import categorize_events
+from werder_events.districts import WERDER_DISTRICTS_PATTERN
+from werder_events.feeds import write_feeds
+from werder_events.fetch import get_client
+from werder_events.geocode import geocode_events
+from werder_events.presence import update_presence
+from werder_events.precompress import precompress_page, precompress_tree
+from werder_events.sqlite_to_html import write_html
+from werder_events.utils import setup_logger
+from werder_events.writer import Writer
+
+JITTER = 0.1
+# Wait for other refreshes finishing at about the same time before rendering
+RENDER_DELAY = 5.0
+
+
+def refresh_werder_havel_de(writer, url, logger):
+    html = werder_havel_de.load_html(url, logger)
+    # Compares the page with the stored box fingerprints, so it runs on the writer
+    event_keys, parsed, upserted = writer.call(werder_havel_de.update_events, html, logger).result()
+    return upserted + writer.call(update_presence, werder_havel_de.SOURCE, event_keys, logger).result()
+
+
+def refresh_havelland_verteiler(writer, url, logger):
+    events = havelland_verteiler.parse_ical(url, WERDER_DISTRICTS_PATTERN, 'Single Day')
+    source = havelland_verteiler.get_domain(url) if urlparse(url).scheme else 'local_file'
+    inserted = writer.insert(events)
+    cancelled = writer.call(update_presence, source, [event.event_key for event in events], logger)
+    return inserted.result() + cancelled.result()
+
+
+def refresh_stadtmagazin_events_de(writer, url, logger):
+    events = stadtmagazin_events_de.parse_events(url, logger)
+    inserted = writer.insert(events)
+    cancelled = writer.call(update_presence, stadtmagazin_events_de.SOURCE, [event.event_key for event in events], logger)
+    return inserted.result() + cancelled.result()
+
+
+class Source(NamedTuple):
+    url: str
+    interval: float  # minutes
+    refresh: Callable  # (writer, url, logger) -> number of changed events
+
+
+# The same sources and filters as the nightly workflow
+SOURCES = {
+    'werder-havel.de': Source(
+        "https://www.werder-havel.de/tourismus/veranstaltungen/veranstaltungskalender.html",
+        60, refresh_werder_havel_de),
+    'havelland-verteiler.de': Source(
+        "webcal://havelland-verteiler.de/?post_type=tribe_events&ical=1&eventDisplay=list",
+        6 * 60, refresh_havelland_verteiler),
+    'stadtmagazin-events.de': Source(
+        "https://www.stadtmagazin-events.de/api/search/event/alle-veranstaltungen/get_search_results"
+        "?search_value=Werder&categories=&search_date=&search_date_end=&page=1",
+        3 * 60, refresh_stadtmagazin_events_de),
+}
+
+
+def next_delay(interval, jitter=JITTER):
+    """The interval (in minutes) in seconds, randomly stretched or shrunk by up to ``jitter``."""
+    return interval * 60 * random.uniform(1 - jitter, 1 + jitter)
+
+
+class Daemon:
+    def __init__(self, db_path, sources, logger, html_path=None, feeds_dir=None, jitter=JITTER):
+        self.db_path = db_path
+        self.sources = sources
+        self.logger = logger
+        self.html_path = html_path
+        self.feeds_dir = feeds_dir
+        self.jitter = jitter
+        # Fetching and parsing, one thread per source; all DB work happens on the writer
+        self.executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="werder-events")
+        self.writer = None
+        self.changed = asyncio.Event()
+        self.rendered_on = None
+
+    async def call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def call_writer(self, func, *args):
+        return await asyncio.wrap_future(self.writer.call(func, *args))
+
+    def refresh(self, name):
+        """Refresh one source (on a worker thread). Returns the number of changed events."""
+        source = self.sources[name]
+        try:
+            changed = source.refresh(self.writer, source.url, self.logger)
+        except Exception as e:
+            # RequestExceptions (incl. an open circuit), parse and DB errors
+            # only skip this cycle of the source
+            self.logger.error(f"Refreshing {name} failed: {e}")
+            self.logger.debug("", exc_info=True)
+            return 0
+        self.logger.info(f"Refreshed {name}: {changed} events changed")
+        if changed:
+            try:
+                geocoded = self.writer.call(geocode_events, self.logger)
+                self.writer.call(categorize_events, self.logger).result()
+                geocoded.result()
+            except Exception as e:
+                # The changed events are stored, the next change tries again
+                self.logger.error(f"Geocoding or categorizing the events of {name} failed: {e}")
+                self.logger.debug("", exc_info=True)
+        return changed
+
+    def render_outputs(self, conn):
+        """Render the page and the feeds (on the writer)."""
+        if self.html_path:
+            write_html(conn, self.html_path)
+            self.logger.info(f"Page written to {self.html_path}")
+        if self.feeds_dir:
+            written, changed = write_feeds(conn, self.feeds_dir)
+            self.logger.info(f"Feeds written to {self.feeds_dir}: {written} files, {changed} changed")
+        self.rendered_on = date.today()
+
+    def precompress(self):
+        if self.html_path:
+            precompress_page(self.html_path)
+        if self.feeds_dir:
+            precompress_tree(self.feeds_dir)
+
+    async def render(self):
+        await self.call_writer(self.render_outputs)
+        # Compressing doesn't need the database, so it doesn't hold up the writer
+        await self.call(self.precompress)
+
+    async def refresh_periodically(self, name):
+        # Spread the first refreshes over a few seconds
+        await asyncio.sleep(random.uniform(0, len(self.sources)))
+        while True:
+            if await self.call(self.refresh, name):
+                self.changed.set()
+            delay = next_delay(self.sources[name].interval, self.jitter)
+            self.logger.debug(f"Next refresh of {name} in {delay / 60:.1f} min")
+            await asyncio.sleep(delay)
+
+    async def render_on_change(self):
+        while True:
+            try:
+                # Wake up at least hourly to notice a new day
+                await asyncio.wait_for(self.changed.wait(), timeout=3600)
+            except asyncio.TimeoutError:
+                if self.rendered_on == date.today():
+                    continue
+            await asyncio.sleep(RENDER_DELAY)
+            self.changed.clear()
+            try:
+                await self.render()
+            except Exception as e:
+                # e.g. a full disk or a locked database, the next change renders again
+                self.logger.error(f"Rendering failed: {e}")
+                self.logger.debug("", exc_info=True)
+
+    async def run_once(self):
+        changed = await asyncio.gather(*(self.call(self.refresh, name) for name in self.sources))
+        if sum(changed):
+            await self.render()
+        else:
+            self.logger.info("No events changed, outputs not rendered")
+
+    async def run(self, once=False):
+        get_client()
+        self.writer = await self.call(Writer, self.db_path, self.logger)
+        try:
+            if once:
+                await self.run_once()
+                return
+            tasks = [asyncio.create_task(self.refresh_periodically(name)) for name in self.sources]
+            tasks.append(asyncio.create_task(self.render_on_change()))
+
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stop.set)
+            await stop.wait()
+            self.logger.info("Stopping")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            # Waits for running refreshes to finish, then for the writer to write everything they queued
+            await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self):
+        self.executor.shutdown()
+        self.writer.close()
+        get_client().close()
+
+
+def source_option(convert):
+    """Parse 'SOURCE=VALUE' arguments, e.g. 'werder-havel.de=30' -> ('werder-havel.de', 30.0)"""
+    def parse(value):
+        name, _, setting = value.partition('=')
+        if name not in SOURCES:
+            raise argparse.ArgumentTypeError(f"unknown source {name!r}, choose from {', '.join(SOURCES)}")
+        try:
+            return name, convert(setting)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid value {setting!r} for {name}")
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh every event source on its own interval.")
+    parser.add_argument("db_path", help="Path to the SQLite database file")
+    parser.add_argument("--html", help="Render the page to this file after changes")
+    parser.add_argument("--feeds", help="Write the feeds to this directory after changes")
+    parser.add_argument("--interval", type=source_option(float), action="append", default=[], metavar="SOURCE=MINUTES",
+                        help="Refresh interval of a source in minutes (default: " +
+                             ", ".join(f"{name}={source.interval:g}" for name, source in SOURCES.items()) + ")")
+    parser.add_argument("--url", type=source_option(str), action="append", default=[], metavar="SOURCE=URL",
+                        help="Fetch a source from another URL or a local file, e.g. a stand-in server")
+    parser.add_argument("--only", nargs="+", choices=SOURCES, help="Only refresh these sources")
+    parser.add_argument("--jitter", type=float, default=JITTER,
+                        help=f"Random variation of the intervals, as a fraction (default: {JITTER})")
+    parser.add_argument("--once", action="store_true", help="Refresh every source once and exit")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    logger = setup_logger("daemon", args.verbose)
+    sources = {name: source for name, source in SOURCES.items() if not args.only or name in args.only}
+    for name, minutes in args.interval:
+        if name in sources:
+            sources[name] = sources[name]._replace(interval=minutes)
+    for name, url in args.url:
+        if name in sources:
+            sources[name] = sources[name]._replace(url=url)
+
+    daemon = Daemon(args.db_path, sources, logger, args.html, args.feeds, args.jitter)
+    asyncio.run(daemon.run(args.once))
+
+
+if __name__ == "__main__":
+    main()
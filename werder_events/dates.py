@@ -0,0 +1,128 @@
+"""
+Fast, memoized parsing of the date and time formats used by our event sources.
+
+All sources publish a handful of fixed formats (``dd.mm.yyyy``,
+``dd.mm.yyyy HH:MM``, ``HH:MM - HH:MM`` and ISO dates), and the same strings
+repeat for every event on the same day. Instead of calling
+``datetime.strptime`` for every event, the parsers below slice the fixed
+positions directly and cache their results.
+"""
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+CACHE_SIZE = 4096
+
+GERMAN_DATE_RE = re.compile(r'(\d{2}\.\d{2}\.\d{4})')
+TIME_RE = re.compile(r'(\d{1,2}):(\d{2})')
+
+# Relative day names used by werder-havel.de instead of a date
+RELATIVE_DAYS = {
+    'heute': 0,
+    'morgen': 1,
+    'übermorgen': 2,
+}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_german_date(date_str):
+    """Parse a German ``dd.mm.yyyy`` date string into a date."""
+    s = date_str.strip()
+    if (len(s) != 10 or s[2] != '.' or s[5] != '.'
+            or not (s[:2] + s[3:5] + s[6:]).isdigit()):
+        raise ValueError(f"Invalid German date: {date_str!r}")
+    return date(int(s[6:]), int(s[3:5]), int(s[:2]))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_time(time_str):
+    """Parse a ``HH:MM`` (or ``H:MM``) time string, ignoring a trailing 'Uhr'."""
+    match = TIME_RE.match(time_str.strip())
+    if not match:
+        raise ValueError(f"Invalid time: {time_str!r}")
+    return time(int(match.group(1)), int(match.group(2)))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_german_datetime(datetime_str):
+    """
+    Parse a German ``dd.mm.yyyy HH:MM`` string into a datetime. A string
+    without a time part is parsed as midnight of that day.
+    """
+    s = datetime_str.strip()
+    day = parse_german_date(s[:10])
+    if len(s) == 10:
+        return datetime(day.year, day.month, day.day)
+    return datetime.combine(day, parse_time(s[10:]))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_time_range(range_str):
+    """
+    Parse a time range like ``10:00 - 18:00`` or ``10:00 Uhr`` into a
+    ``(start_time, end_time)`` tuple. Missing and impossible times are
+    returned as None. ``24:00`` is returned as 00:00; the callers move an end
+    before the start to the next day.
+    """
+    times = []
+    for h, m in TIME_RE.findall(range_str):
+        hour, minute = int(h), int(m)
+        if (hour, minute) == (24, 0):
+            hour = 0
+        times.append(time(hour, minute) if hour < 24 and minute < 60 else None)
+    start = times[0] if times else None
+    end = times[1] if len(times) > 1 else None
+    return start, end
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_iso_date(date_str):
+    """Parse an ISO ``yyyy-mm-dd`` date string (the format stored in the DB)."""
+    return date.fromisoformat(date_str)
+
+
+def parse_date_range(date_str, today=None):
+    """
+    Parse a German date or date range as shown on event listings, e.g.
+    ``17.08.2024``, ``15.08.2024 – 24.08.2024``, ``Heute`` or ``Morgen``.
+
+    Relative day names are resolved against ``today`` (default: the current
+    date). Returns a ``(start_date, end_date)`` tuple, or ``(None, None)`` if
+    no date could be found.
+    """
+    # Resolved outside the cache, so that 'Heute' follows the date in a long-running process
+    return parse_date_range_on(date_str, today or date.today())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date_range_on(date_str, today):
+    """parse_date_range with relative day names resolved against ``today``."""
+    dates = GERMAN_DATE_RE.findall(date_str)
+    if dates:
+        start = parse_german_date(dates[0])
+        end = parse_german_date(dates[-1])
+        return start, end
+
+    offset = RELATIVE_DAYS.get(date_str.strip().lower())
+    if offset is None:
+        return None, None
+    day = today + timedelta(days=offset)
+    return day, day
+
+
+def to_timestamp(day, at=None):
+    """
+    Combine a date and an optional time into the ISO timestamp stored in the
+    ``start_datetime``/``end_datetime`` columns (e.g. ``2024-08-31T18:00``).
+    Returns None if the time of day is unknown.
+    """
+    if day is None or at is None:
+        return None
+    return f"{day.isoformat()}T{at.hour:02d}:{at.minute:02d}"
+
+
+def clear_caches():
+    """Reset all parser caches (e.g. between benchmark runs)."""
+    for func in (parse_german_date, parse_time, parse_german_datetime,
+                 parse_time_range, parse_iso_date, parse_date_range_on):
+        func.cache_clear()
@@ -0,0 +1,62 @@
+"""
+The districts (Ortsteile) of Werder (Havel) and the neighbouring towns, used
+to filter regional sources by location and to split feeds per district.
+"""
+import re
+from functools import cache
+
+WERDER_DISTRICTS = (
+    "Werder", "Bliesendorf", "Resau", "Derwitz", "Glindow", "Elisabethhöhe",
+    "Kemnitz", "Kolonie Zern", "Petzow", "Löcknitz", "Riegelberg", "Phöben",
+    "Plötzin", "Neu Plötzin", "Plessow", "Töplitz", "Eichholz", "Göttin",
+    "Leest", "Neu Töplitz", "Alt Töplitz",
+)
+
+SCHWIELOWSEE_DISTRICTS = ("Schwielowsee", "Caputh", "Ferch", "Geltow")
+
+GROSS_KREUTZ_DISTRICTS = (
+    "Groß Kreutz", "Bochow", "Deetz", "Götz", "Jeserig", "Krielow",
+    "Schenkenberg", "Schmergow",
+)
+
+# The gazetteer of each region (see regions.py)
+GAZETTEERS = {
+    'werder': WERDER_DISTRICTS,
+    'schwielowsee': SCHWIELOWSEE_DISTRICTS,
+    'gross-kreutz': GROSS_KREUTZ_DISTRICTS,
+}
+
+
+def district_pattern(districts):
+    """The regex matching any of the districts, e.g. for ``--location-include``."""
+    return rf"\b({'|'.join(districts)})\b"
+
+
+WERDER_DISTRICTS_PATTERN = district_pattern(WERDER_DISTRICTS)
+
+
+@cache
+def district_regex(districts):
+    # Longer names first, so that e.g. 'Neu Töplitz' wins over 'Töplitz'
+    return re.compile(district_pattern(sorted(districts, key=len, reverse=True)), re.IGNORECASE)
+
+
+@cache
+def canonical_names(districts):
+    return {name.lower(): name for name in districts}
+
+
+def find_district(location, districts=WERDER_DISTRICTS):
+    """
+    Return the first of the districts mentioned in a location string, or None.
+    """
+    match = district_regex(districts).search(location or '')
+    return canonical_names(districts)[match.group(1).lower()] if match else None
+
+
+def slugify(name):
+    """Turn a district or source name into a file name, e.g. 'neu-toeplitz'."""
+    name = name.lower()
+    for umlaut, replacement in (('ä', 'ae'), ('ö', 'oe'), ('ü', 'ue'), ('ß', 'ss')):
+        name = name.replace(umlaut, replacement)
+    return re.sub(r'[^a-z0-9]+', '-', name).strip('-')
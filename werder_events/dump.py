@@ -0,0 +1,157 @@
+"""
+Export an events database to deterministic, line-oriented text and rebuild
+the database from it.
+
+Each table is written to ``<table>.jsonl`` in the output directory, one JSON
+object (with sorted keys) per row, sorted by a stable key (``event_key``
+for events). The same database always produces byte-identical files, and
+a new event only adds a line, so git stores small text deltas instead of a new binary blob on every
+run. Derived structures (indexes, the full-text index, triggers) are not
+exported; they are recreated by ``utils.create_database`` on import.
+"""
+import argparse
+import json
+import os
+import time
+
+from werder_events.utils import connect_read_only, create_database, create_search_index, setup_logger
+
+# Exported tables and the columns their rows are sorted by
+EXPORTED_TABLES = {
+    'events': 'event_key',
+    'review_decisions': 'title_key',
+    'archived_keys': 'event_key',
+    'box_fingerprints': 'source, fingerprint',
+    'event_presence': 'event_key',
+    'source_runs': 'source, run_at',
+    'location_cache': 'location',
+    'quarantine': 'event_key',
+    'validation_runs': 'source, run_at',
+}
+
+
+def export_database(db_path, output_dir):
+    """
+    Write all exported tables of the database to ``output_dir``. Returns a
+    dict mapping table names to the number of exported rows. Raises
+    FileNotFoundError if the database doesn't exist (instead of exporting
+    an empty one over the files).
+    """
+    conn = connect_read_only(db_path)
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    try:
+        for table, sort_key in EXPORTED_TABLES.items():
+            # Tables missing in older databases are exported as empty files
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                cursor = conn.execute(f"SELECT * FROM {table} ORDER BY {sort_key}")
+                columns = [column[0] for column in cursor.description]
+            else:
+                cursor, columns = [], []
+
+            path = os.path.join(output_dir, f"{table}.jsonl")
+            tmp_path = f"{path}.tmp"
+            count = 0
+            with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+                for row in cursor:
+                    f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, sort_keys=True, separators=(',', ':')))
+                    f.write('\n')
+                    count += 1
+            os.replace(tmp_path, path)
+            counts[table] = count
+    finally:
+        conn.close()
+    return counts
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def row_tuples(first_row, rows, columns):
+    yield tuple(first_row[column] for column in columns)
+    for row in rows:
+        yield tuple(row.get(column) for column in columns)
+
+
+def import_database(input_dir, db_path):
+    """
+    Rebuild the database at ``db_path`` from the files in ``input_dir``. The
+    new database is built next to the old one and then swapped in, so a
+    failed import leaves the old database untouched. Returns a dict mapping
+    table names to the number of imported rows.
+    """
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = create_database(tmp_path)
+    counts = {}
+    try:
+        # The file is thrown away if the import fails, no need for a journal
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        # Filling the full-text index row by row via its triggers is much
+        # slower than building it in one go after the import
+        conn.executescript("""
+            DROP TRIGGER events_fts_insert;
+            DROP TRIGGER events_fts_delete;
+            DROP TRIGGER events_fts_update;
+            DROP TABLE events_fts;
+        """)
+        with conn:
+            for table in EXPORTED_TABLES:
+                path = os.path.join(input_dir, f"{table}.jsonl")
+                if not os.path.exists(path):
+                    continue
+                rows = read_rows(path)
+                first_row = next(rows, None)
+                if first_row is None:
+                    counts[table] = 0
+                    continue
+                columns = list(first_row)
+                sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                cursor = conn.executemany(sql, row_tuples(first_row, rows, columns))
+                counts[table] = cursor.rowcount
+        create_search_index(conn)
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export an events database to JSON Lines files, or rebuild it from them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Write the database to <output_dir>/<table>.jsonl")
+    export_parser.add_argument("db_path", help="Path to the SQLite database file")
+    export_parser.add_argument("output_dir", help="Directory for the exported files")
+    import_parser = subparsers.add_parser("import", help="Rebuild the database from <input_dir>/<table>.jsonl")
+    import_parser.add_argument("input_dir", help="Directory with the exported files")
+    import_parser.add_argument("db_path", help="Path to the SQLite database file (replaced if it exists)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    logger = setup_logger("dump", args.verbose)
+    start = time.perf_counter()
+    if args.command == "export":
+        try:
+            counts = export_database(args.db_path, args.output_dir)
+        except FileNotFoundError as e:
+            logger.error(e)
+            raise SystemExit(1)
+        action = f"Exported {args.db_path} to {args.output_dir}"
+    else:
+        counts = import_database(args.input_dir, args.db_path)
+        action = f"Rebuilt {args.db_path} from {args.input_dir}"
+    elapsed = time.perf_counter() - start
+    logger.info(f"{action} in {elapsed:.2f} s: " + ', '.join(f"{table}: {count} rows" for table, count in counts.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+The event record shared by all parsers, the insert layer and the renderer.
+
+``Event`` is a NamedTuple whose field order matches the ``events`` table
+columns in ``EVENT_COLUMNS``, so a parsed event *is* the SQLite parameter
+tuple and rows read back from the DB can be turned into events with
+``Event._make(row)``.
+"""
+import hashlib
+from typing import NamedTuple, Optional
+
+
+class Event(NamedTuple):
+    summary: str
+    start_date: Optional[str]  # ISO date, e.g. '2024-08-31'
+    end_date: Optional[str]
+    start_datetime: Optional[str]  # ISO timestamp, e.g. '2024-08-31T18:00'
+    end_datetime: Optional[str]
+    location: str
+    description: str
+    event_type: str
+    source: str
+    event_key: int
+    source_categories: Optional[str] = None  # The source's own categories, e.g. 'Führung, Täglich'
+
+
+EVENT_COLUMNS = ', '.join(Event._fields)
+
+
+def normalize_title(summary):
+    """Collapse whitespace and ignore case: 'Konzert  im Park ' -> 'konzert im park'"""
+    return ' '.join(summary.split()).casefold()
+
+
+def normalize_source(source):
+    """'www.Werder-Havel.de' -> 'werder-havel.de'"""
+    return source.strip().lower().removeprefix('www.')
+
+
+def make_event_key(summary, start_date, source):
+    """
+    Return the identity of an event: a signed 64-bit integer (so that SQLite
+    stores it as a plain INTEGER) derived from the BLAKE2b digest of the
+    normalized source, title and start date ('unknown' if the date is
+    unknown). The time of day is left out: it is missing from older rows
+    (see migrations/03) and a changed time updates the event (see
+    utils.upsert_events) instead of adding another one.
+    """
+    identity = f"{normalize_source(source)}\x1f{normalize_title(summary)}\x1f{start_date or 'unknown'}"
+    digest = hashlib.blake2b(identity.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def format_event_key(event_key):
+    """The event key as 16 hex digits, e.g. for iCalendar UIDs."""
+    return f"{event_key & 0xFFFFFFFFFFFFFFFF:016x}"
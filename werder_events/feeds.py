@@ -0,0 +1,263 @@
+"""
+Generate iCalendar and JSON feeds of the visible upcoming events.
+
+Besides the feeds with all events, there is one feed per source and one per
+Werder district. All feeds are written in a single pass over the DB cursor,
+streaming each event into the feeds it belongs to, so the events are never
+held in memory as a list. The output is deterministic (the UID of an event is
+derived from its event_key) and a feed file is only replaced if its content
+changed, so unchanged feeds keep their modification time and cache entries.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import date, timedelta
+
+from werder_events.dates import parse_iso_date
+from werder_events.districts import WERDER_DISTRICTS, find_district, slugify
+from werder_events.event import Event, EVENT_COLUMNS, format_event_key
+from werder_events.utils import setup_logger
+
+UID_DOMAIN = "werder-events"
+CALENDAR_NAME = "Termine in Werder (Havel)"
+
+FEED_EVENTS_SQL = f"""
+    SELECT {EVENT_COLUMNS}
+    FROM events
+    WHERE is_visible = 1
+    AND is_cancelled = 0
+    AND start_date >= ?
+    AND start_date != 'unknown'
+    ORDER BY start_date, start_datetime, event_key
+"""
+
+ICAL_HEADER = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//werder-events//werder_events.feeds//DE
+CALSCALE:GREGORIAN
+METHOD:PUBLISH
+X-WR-TIMEZONE:Europe/Berlin
+BEGIN:VTIMEZONE
+TZID:Europe/Berlin
+BEGIN:DAYLIGHT
+TZOFFSETFROM:+0100
+TZOFFSETTO:+0200
+TZNAME:CEST
+DTSTART:19700329T020000
+RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU
+END:DAYLIGHT
+BEGIN:STANDARD
+TZOFFSETFROM:+0200
+TZOFFSETTO:+0100
+TZNAME:CET
+DTSTART:19701025T030000
+RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU
+END:STANDARD
+END:VTIMEZONE
+""".replace("\n", "\r\n")
+
+
+def iter_feed_events(conn, today=None):
+    """Yield the visible upcoming events, in start order."""
+    cursor = conn.execute(FEED_EVENTS_SQL, ((today or date.today()).isoformat(),))
+    return map(Event._make, cursor)
+
+
+def ical_escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def ical_fold(line):
+    """Fold a content line to at most 75 octets per line (RFC 5545, 3.1)."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Don't split inside a multi-byte UTF-8 character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def ical_timestamp(timestamp):
+    """'2024-08-31T18:00' -> '20240831T180000'"""
+    return timestamp.replace('-', '').replace(':', '') + '00'
+
+
+def event_to_ical(event):
+    """Return the VEVENT of an event as a string."""
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{format_event_key(event.event_key)}@{UID_DOMAIN}",
+        # DTSTAMP is required; a fixed value keeps the feed deterministic
+        f"DTSTAMP:{event.start_date.replace('-', '')}T000000Z",
+    ]
+    if event.start_datetime:
+        lines.append(f"DTSTART;TZID=Europe/Berlin:{ical_timestamp(event.start_datetime)}")
+        if event.end_datetime:
+            lines.append(f"DTEND;TZID=Europe/Berlin:{ical_timestamp(event.end_datetime)}")
+    else:
+        # All-day event, DTEND is exclusive
+        end_date = parse_iso_date(event.end_date or event.start_date) + timedelta(days=1)
+        lines.append(f"DTSTART;VALUE=DATE:{event.start_date.replace('-', '')}")
+        lines.append(f"DTEND;VALUE=DATE:{end_date.strftime('%Y%m%d')}")
+    lines.append(f"SUMMARY:{ical_escape(event.summary)}")
+    if event.location:
+        lines.append(f"LOCATION:{ical_escape(event.location)}")
+    lines.append(f"X-WERDER-EVENTS-SOURCE:{ical_escape(event.source)}")
+    lines.append("END:VEVENT")
+    return ''.join(ical_fold(line) for line in lines)
+
+
+def event_to_dict(event):
+    """Return the public fields of an event. Descriptions are left out, as on the page."""
+    return {
+        "id": f"{format_event_key(event.event_key)}@{UID_DOMAIN}",
+        "summary": event.summary,
+        "start": event.start_date,
+        "end": event.end_date,
+        "start_datetime": event.start_datetime,
+        "end_datetime": event.end_datetime,
+        "location": event.location,
+        "source": event.source,
+    }
+
+
+def event_to_json(event):
+    return json.dumps(event_to_dict(event), ensure_ascii=False)
+
+
+class FeedWriter:
+    """
+    Writes one feed to a temporary file and replaces the target file only
+    if the content has changed.
+    """
+
+    def __init__(self, path, header, separator, footer):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.separator = separator
+        self.footer = footer
+        self.count = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(self.tmp_path, 'w', encoding='utf-8', newline='')
+        self.file.write(header)
+
+    def write(self, entry):
+        if self.count:
+            self.file.write(self.separator)
+        self.file.write(entry)
+        self.count += 1
+
+    def close(self):
+        """Finish the feed. Returns True if the target file was changed."""
+        self.file.write(self.footer)
+        self.file.close()
+        if os.path.exists(self.path) and file_digest(self.path) == file_digest(self.tmp_path):
+            os.remove(self.tmp_path)
+            return False
+        os.replace(self.tmp_path, self.path)
+        return True
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').digest()
+
+
+def feed_names(event, districts=WERDER_DISTRICTS):
+    """Return the names (relative paths without extension) of the feeds an event belongs to."""
+    names = ["events", f"source/{slugify(event.source)}"]
+    district = find_district(event.location, districts)
+    if district:
+        names.append(f"district/{slugify(district)}")
+    return names
+
+
+def open_feeds(output_dir, name, calendar_name=CALENDAR_NAME):
+    """Return the .ics and .json FeedWriter of the named feed."""
+    path = os.path.join(output_dir, name)
+    return (
+        FeedWriter(f"{path}.ics",
+                   ICAL_HEADER + ical_fold(f"X-WR-CALNAME:{ical_escape(calendar_name)}"),
+                   "", "END:VCALENDAR\r\n"),
+        FeedWriter(f"{path}.json",
+                   '{"title": ' + json.dumps(calendar_name, ensure_ascii=False) + ', "events": [\n',
+                   ",\n", "\n]}\n"),
+    )
+
+
+def write_feeds(conn, output_dir, today=None, districts=WERDER_DISTRICTS, calendar_name=CALENDAR_NAME):
+    """
+    Write all .ics and .json feeds to ``output_dir``. Returns a tuple
+    ``(written, changed)`` with the number of written and changed files.
+    Events are split into per-district feeds by the given ``districts``.
+    Per-source and per-district feeds that no longer have any events are
+    removed.
+    """
+    writers = {}
+    for event in iter_feed_events(conn, today):
+        for name in feed_names(event, districts):
+            if name not in writers:
+                writers[name] = open_feeds(output_dir, name, calendar_name)
+            ical_writer, json_writer = writers[name]
+            ical_writer.write(event_to_ical(event))
+            json_writer.write(event_to_json(event))
+
+    # The main feeds are written even if there are no events
+    if "events" not in writers:
+        writers["events"] = open_feeds(output_dir, "events", calendar_name)
+
+    written = changed = 0
+    paths = set()
+    for feed_writers in writers.values():
+        for writer in feed_writers:
+            changed += writer.close()
+            written += 1
+            paths.add(os.path.abspath(writer.path))
+
+    for subdir in ("source", "district"):
+        directory = os.path.join(output_dir, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for filename in os.listdir(directory):
+            path = os.path.abspath(os.path.join(directory, filename))
+            if filename.endswith(('.ics', '.json')) and path not in paths:
+                os.remove(path)
+                changed += 1
+    return written, changed
+
+
+def main(db_path, output_dir, verbose):
+    logger = setup_logger("feeds", verbose)
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        written, changed = write_feeds(conn, output_dir)
+        logger.info(f"Feeds written to {output_dir}: {written} files, {changed} changed")
+    except sqlite3.Error as e:
+        logger.error(f"SQLite error: {e}")
+    except OSError as e:
+        logger.error(f"Error writing feeds: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate iCalendar and JSON feeds of the visible upcoming events.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    parser.add_argument('output_dir', help='Output directory for the feeds')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
+    args = parser.parse_args()
+
+    main(args.db_path, args.output_dir, args.verbose)
@@ -0,0 +1,203 @@
+"""
+Shared HTTP client for all scrapers.
+
+- one pooled ``requests.Session`` (keep-alive connections are reused)
+- connect and read timeouts on every request, so a hanging remote can't
+  block a run
+- retries with jittered exponential backoff on connection errors, timeouts
+  and 429/5xx responses (honoring ``Retry-After``)
+- a circuit breaker per source: after ``failure_threshold`` consecutive
+  failed fetches, requests to that source fail fast with CircuitOpenError
+  until ``reset_timeout`` has passed, while the other sources continue.
+  Then a single trial request is sent; the others keep failing fast until
+  it succeeds. The breakers are per process: the scrapers of the GitHub
+  workflow each run in their own process and start with closed circuits.
+
+CircuitOpenError is a RequestException, so the scrapers' existing error
+handling covers it.
+
+If the environment variable WERDER_EVENTS_RAW_ARCHIVE is set to a directory,
+the shared client stores every fetched body in a raw response archive there
+(see werder_events.raw_archive).
+"""
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 300
+USER_AGENT = "werder-events (+https://github.com/arne-cl/werder-events)"
+RAW_ARCHIVE_ENV = "WERDER_EVENTS_RAW_ARCHIVE"
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of sending a request to a source that keeps failing."""
+
+
+class CircuitBreaker:
+    """Counts consecutive failures of one source."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        # The daemon fetches the sources from several threads
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None and self.clock() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        """
+        Return True if a request may be sent. After the reset timeout, one
+        trial request is let through ('half-open') and the circuit stays open
+        for the others: until the trial succeeds, or for another reset
+        timeout if it fails (or never reports back).
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            self.opened_at = self.clock()
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+class HttpClient:
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 pool_size=10, raw_archive=None, sleep=time.sleep):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.raw_archive = raw_archive
+        self.sleep = sleep
+        self.breakers = {}
+        self.breakers_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def breaker(self, source):
+        # Called from the daemon's threads, each source must get a single breaker
+        with self.breakers_lock:
+            if source not in self.breakers:
+                self.breakers[source] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[source]
+
+    def backoff_delay(self, attempt, response=None):
+        """Full-jitter exponential backoff, or the server's Retry-After (in seconds)."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(self, url, source=None, **kwargs):
+        """
+        GET the URL with timeouts and retries and return the response.
+        ``source`` names the circuit breaker to use (default: the host name).
+        Raises a RequestException if all attempts failed, an HTTPError for
+        4xx responses and CircuitOpenError if the source is skipped.
+        """
+        source = source or urlparse(url).netloc
+        breaker = self.breaker(source)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Skipping {url}: {source} failed {breaker.failures} times in a row")
+
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except requests.exceptions.RequestException:
+                # e.g. TooManyRedirects or a broken chunked response: not
+                # retried, but counted, so that a failed trial request reopens the circuit
+                breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    # Other client errors (e.g. 404) don't mean the source is down
+                    breaker.record_success()
+                    response.raise_for_status()
+                    self.archive(response, source)
+                    return response
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} {response.reason} for url: {url}", response=response)
+
+            if attempt >= self.max_retries:
+                breaker.record_failure()
+                raise error
+            delay = self.backoff_delay(attempt, response)
+            logger.warning(f"Request to {url} failed ({error}), retrying in {delay:.1f} s")
+            self.sleep(delay)
+            attempt += 1
+
+    def archive(self, response, source):
+        if self.raw_archive is None:
+            return
+        try:
+            self.raw_archive.store(response.content, source, response.url,
+                                   response.headers.get('Content-Type'))
+        except OSError as e:
+            # A full disk must not break the run, the response is still parsed
+            logger.warning(f"Could not archive the response from {response.url}: {e}")
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+
+
+def get_client():
+    """Return the shared HttpClient of this process."""
+    global _default_client
+    if _default_client is None:
+        archive_dir = os.environ.get(RAW_ARCHIVE_ENV)
+        from werder_events.raw_archive import RawArchive
+        _default_client = HttpClient(raw_archive=RawArchive(archive_dir) if archive_dir else None)
+    return _default_client
+
+
+def fetch(url, source=None, **kwargs):
+    """GET a URL with the shared client, see HttpClient.get."""
+    return get_client().get(url, source, **kwargs)
@@ -0,0 +1,189 @@
+"""
+Offline geocoding of the free-text event locations.
+
+The locations are resolved against a local gazetteer: the known venues in
+``VENUES`` (matched by name), else the district mentioned in the location
+(see districts.py), which is placed at the district's centre. Nothing is
+looked up online. The coordinates are approximate (good enough for "events
+near me"), not for routing.
+
+Every distinct location string is resolved only once: the result (also if
+the location is unknown) is stored in the ``location_cache`` table, which is
+part of the text export. Cached results are only computed again when the
+gazetteer changes. The venues are kept in the ``venues`` table with an R*Tree
+index (``venue_rtree``) for bounding-box queries, e.g. by the JSON API:
+
+    SELECT ... FROM events e
+    JOIN location_cache lc ON lc.location = e.location
+    JOIN venues v ON v.venue_id = lc.venue_id
+    WHERE v.id IN (SELECT id FROM venue_rtree WHERE max_lat >= ? AND min_lat <= ? AND ...)
+
+Usage:
+
+    python -m werder_events.geocode events.sqlite -v
+    python -m werder_events.geocode events.sqlite --unresolved 20
+"""
+import argparse
+import hashlib
+import math
+import re
+from functools import cache
+from typing import NamedTuple
+
+from werder_events.districts import GAZETTEERS, find_district, slugify
+from werder_events.utils import create_database, setup_logger
+
+
+class Venue(NamedTuple):
+    venue_id: str
+    name: str
+    lat: float
+    lon: float
+    pattern: str = None  # Regex for the venue name in locations (case-insensitive)
+
+
+# Known venues, in match order (more specific names first)
+VENUES = (
+    Venue('an-der-foehse', 'Anleger "An der Föhse"', 52.3790, 12.9400, r'An der Föhse'),
+    Venue('kaffee-kontor', 'Kaffee Kontor Werder', 52.3775, 12.9380, r'Kaffee Kontor'),
+    Venue('plantagenplatz', 'Plantagenplatz', 52.3780, 12.9320, r'Plantagenplatz'),
+    Venue('tanzwerk', 'TANZWERK Werder', 52.3835, 12.9245, r'TANZWERK'),
+    Venue('kunst-geschoss', 'Stadtgalerie KUNST-GESCHOSS', 52.3770, 12.9390, r'KUNST-GESCHOSS'),
+    Venue('havel-therme', 'Havel-Therme', 52.3700, 12.9090, r'Havel-?Therme'),
+    Venue('comedie-soleil', 'Theater Comédie Soleil', 52.3788, 12.9360, r'Com[ée]die Soleil'),
+    Venue('kulturkirche-petzow', 'Kulturkirche Petzow', 52.3540, 12.9520, r'(Kultur|Schinkel)kirche Petzow'),
+    Venue('schlosspark-petzow', 'Schlosspark Petzow', 52.3565, 12.9565, r'Schlo(ss|ß)(garten|park) Petzow'),
+    Venue('heilig-geist-kirche', 'Heilig-Geist-Kirche', 52.3773, 12.9392, r'Heilig-Geist-Kirche'),
+    Venue('maria-meeresstern', 'Katholische Kirche Maria Meeresstern', 52.3760, 12.9300, r'Maria Meeresstern'),
+    Venue('vulkanfiberfabrik', 'Atelier Vulkanfiberfabrik', 52.3820, 12.9255, r'Vulkanfiberfabrik'),
+    Venue('lindowsches-haus', 'Lindowsches Haus', 52.3776, 12.9395, r'Lindowsche'),
+    Venue('bockwindmuehle', 'Bockwindmühle', 52.3773, 12.9410, r'Bockwindmühle'),
+    Venue('inselbruecke', 'Inselbrücke', 52.3785, 12.9345, r'Inselbrücke'),
+    Venue('marktplatz-insel', 'Marktplatz auf der Insel', 52.3778, 12.9385, r'Marktplatz (auf der )?Insel|Marktplatz Werder'),
+    Venue('bismarckhoehe', 'Bismarckhöhe', 52.3730, 12.9270, r'Bismarckh(ö|oe)he'),
+    Venue('scala', 'Scala Kulturpalast', 52.3800, 12.9300, r'Scala Kulturpalast'),
+    Venue('havelauen', 'Havelauen', 52.3850, 12.9300, r'Havelauen'),
+    Venue('werderpark', 'Einkaufszentrum Werderpark', 52.3930, 12.9130, r'Werderpark'),
+    Venue('tannenhof', 'Werderaner Tannenhof', 52.3620, 12.9080, r'Tannenhof'),
+)
+
+# Approximate centres of the districts of all regions (see districts.GAZETTEERS)
+DISTRICT_CENTRES = {
+    "Werder": (52.3786, 12.9347), "Bliesendorf": (52.3308, 12.8756), "Resau": (52.3320, 12.8250),
+    "Derwitz": (52.3594, 12.8056), "Glindow": (52.3590, 12.8987), "Elisabethhöhe": (52.3500, 12.9000),
+    "Kemnitz": (52.3960, 12.8380), "Kolonie Zern": (52.3440, 12.8900), "Petzow": (52.3552, 12.9530),
+    "Löcknitz": (52.3200, 12.8600), "Riegelberg": (52.3700, 12.9500), "Phöben": (52.4133, 12.8944),
+    "Plötzin": (52.3626, 12.8474), "Neu Plötzin": (52.3700, 12.8600), "Plessow": (52.3506, 12.8325),
+    "Töplitz": (52.4444, 12.9270), "Eichholz": (52.4200, 12.9100), "Göttin": (52.4300, 12.9200),
+    "Leest": (52.4286, 12.9306), "Neu Töplitz": (52.4436, 12.9502), "Alt Töplitz": (52.4509, 12.9333),
+    "Schwielowsee": (52.3536, 13.0011), "Caputh": (52.3536, 13.0011), "Ferch": (52.3222, 12.9594),
+    "Geltow": (52.3697, 12.9828),
+    "Groß Kreutz": (52.4020, 12.7758), "Bochow": (52.3838, 12.7930), "Deetz": (52.4269, 12.7233),
+    "Götz": (52.4183, 12.7237), "Jeserig": (52.4000, 12.7000), "Krielow": (52.4200, 12.7700),
+    "Schenkenberg": (52.4100, 12.7500), "Schmergow": (52.4350, 12.7700),
+}
+
+ALL_DISTRICTS = tuple(name for districts in GAZETTEERS.values() for name in districts)
+
+
+@cache
+def venue_regex():
+    """One regex for all venues; the name of the matching group is the venue's index."""
+    return re.compile('|'.join(f"(?P<v{i}>{venue.pattern})" for i, venue in enumerate(VENUES)), re.IGNORECASE)
+
+
+def district_venue(district):
+    lat, lon = DISTRICT_CENTRES[district]
+    return Venue(f"district/{slugify(district)}", district, lat, lon)
+
+
+def all_venues():
+    return VENUES + tuple(district_venue(district) for district in ALL_DISTRICTS)
+
+
+@cache
+def gazetteer_version():
+    """A digest of the gazetteer; cached locations resolved with another version are resolved again."""
+    return hashlib.sha256(repr(all_venues()).encode('utf-8')).hexdigest()[:16]
+
+
+def resolve_location(location):
+    """Return the venue_id of a location string, or None if it is unknown."""
+    if not location:
+        return None
+    match = venue_regex().search(location)
+    if match:
+        return VENUES[int(match.lastgroup[1:])].venue_id
+    district = find_district(location, ALL_DISTRICTS)
+    return f"district/{slugify(district)}" if district else None
+
+
+def sync_venues(conn):
+    """Replace the venues table and its R*Tree index with the current gazetteer."""
+    with conn:
+        conn.execute("DELETE FROM venues")
+        conn.execute("DELETE FROM venue_rtree")
+        for rowid, venue in enumerate(all_venues(), start=1):
+            conn.execute("INSERT INTO venues (id, venue_id, name, lat, lon) VALUES (?, ?, ?, ?, ?)",
+                         (rowid, venue.venue_id, venue.name, venue.lat, venue.lon))
+            conn.execute("INSERT INTO venue_rtree VALUES (?, ?, ?, ?, ?)",
+                         (rowid, venue.lat, venue.lat, venue.lon, venue.lon))
+
+
+def geocode_events(conn, logger=None):
+    """
+    Resolve all event locations that aren't in the location cache yet (or
+    were resolved with an older gazetteer). Returns the number of newly
+    resolved and of unknown locations.
+    """
+    version = gazetteer_version()
+    # Only a few dozen rows, and the venues aren't part of the text export
+    sync_venues(conn)
+    cursor = conn.execute("""
+        SELECT DISTINCT e.location FROM events e
+        LEFT JOIN location_cache lc ON lc.location = e.location
+        WHERE e.location IS NOT NULL AND e.location != '' AND (lc.location IS NULL OR lc.gazetteer != ?)
+    """, (version,))
+    resolved = [(location, resolve_location(location), version) for (location,) in cursor.fetchall()]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO location_cache (location, venue_id, gazetteer) VALUES (?, ?, ?)",
+                         resolved)
+    unknown = sum(1 for _, venue_id, _ in resolved if venue_id is None)
+    if logger:
+        logger.info(f"Geocoded {len(resolved)} new locations, {unknown} unknown")
+    return len(resolved) - unknown, unknown
+
+
+def bounding_box(lat, lon, radius_km):
+    """The ``(min_lat, max_lat, min_lon, max_lon)`` box around a point."""
+    dlat = radius_km / 111.32
+    dlon = radius_km / (111.32 * math.cos(math.radians(lat)))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve the event locations to venues and coordinates.")
+    parser.add_argument("db_path", help="Path to the SQLite database file")
+    parser.add_argument("--unresolved", type=int, metavar="N",
+                        help="List the N most frequent locations that couldn't be resolved")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    logger = setup_logger("geocode", args.verbose)
+    conn = create_database(args.db_path, logger)
+    try:
+        geocode_events(conn, logger)
+        if args.unresolved:
+            for location, count in conn.execute("""
+                SELECT e.location, count(*) AS n FROM events e
+                JOIN location_cache lc ON lc.location = e.location
+                WHERE lc.venue_id IS NULL
+                GROUP BY e.location ORDER BY n DESC LIMIT ?
+            """, (args.unresolved,)):
+                print(f"{count:5}  {location}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
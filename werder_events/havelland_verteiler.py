@@ -5,10 +5,14 @@ from icalendar import Calendar
 import requests
 from urllib.parse import urlparse, urlunparse
 import argparse
-import hashlib
 import re
 
-from werder_events.utils import create_database
+from werder_events.dates import to_timestamp
+from werder_events.districts import GAZETTEERS, district_pattern
+from werder_events.event import Event, make_event_key
+from werder_events.fetch import fetch
+from werder_events.presence import cancel_missing, record_presence
+from werder_events.utils import create_database, insert_events
 
 
 def get_domain(url):
@@ -25,97 +29,83 @@ def parse_ical(source, location_pattern=None, event_type_pattern=None):
             parts[0] = 'https'
             source = urlunparse(parts)
         
-        response = requests.get(source)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        cal = Calendar.from_ical(response.content)
-        source_domain = get_domain(source)
-    else:
-        # It's a local file
-        with open(source, 'rb') as file:
-            cal = Calendar.from_ical(file.read())
-        source_domain = 'local_file'
-    
+        response = fetch(source)
+        return parse_calendar(response.content, get_domain(source), location_pattern, event_type_pattern)
+
+    # It's a local file
+    with open(source, 'rb') as file:
+        return parse_calendar(file.read(), 'local_file', location_pattern, event_type_pattern)
+
+
+def parse_calendar(content, source_domain, location_pattern=None, event_type_pattern=None):
+    """Parse the events from the content of an iCal file."""
+    cal = Calendar.from_ical(content)
+    if location_pattern:
+        location_pattern = re.compile(location_pattern, re.IGNORECASE)
+    if event_type_pattern:
+        event_type_pattern = re.compile(event_type_pattern, re.IGNORECASE)
+
     events = []
-    for component in cal.walk():
-        if component.name == "VEVENT":
-            location = str(component.get('location', ''))
-            
-            # Apply location filter if pattern is provided
-            if location_pattern and not re.search(location_pattern, location, re.IGNORECASE):
-                continue
-
-            start = component.get('dtstart').dt
-            end = component.get('dtend').dt
-            
-            if isinstance(start, datetime):
-                start = start.date()
-            if isinstance(end, datetime):
-                end = end.date()
-            
-            event_type = "Single Day"
-            if start != end:
-                event_type = "Multi-Day"
-            if component.get('rrule'):
-                event_type = "Recurring"
-            
-            # Apply event type filter if pattern is provided
-            if event_type_pattern and not re.search(event_type_pattern, event_type, re.IGNORECASE):
-                continue
-            
-            summary = str(component.get('summary'))
-            event_hash = hashlib.md5(f"{summary}{start}".encode()).hexdigest()
-            
-            events.append({
-                'summary': summary,
-                'start': start.isoformat(),
-                'end': end.isoformat(),
-                'location': location,
-                'description': str(component.get('description', '')),
-                'type': event_type,
-                'source': source_domain,
-                'event_hash': event_hash
-            })
-    
-    return events
+    for component in cal.walk("VEVENT"):
+        location = str(component.get('location', ''))
+
+        # Apply location filter if pattern is provided
+        if location_pattern and not location_pattern.search(location):
+            continue
+
+        start = component.get('dtstart').dt
+        end = component.get('dtend').dt
 
+        start_datetime = end_datetime = None
+        if isinstance(start, datetime):
+            start_datetime = to_timestamp(start.date(), start.time())
+            start = start.date()
+        if isinstance(end, datetime):
+            end_datetime = to_timestamp(end.date(), end.time())
+            end = end.date()
 
-def insert_events(conn, events):
-    cursor = conn.cursor()
-    inserted_count = 0
-    for event in events:
-        cursor.execute('''
-        INSERT OR IGNORE INTO events 
-        (summary, start_date, end_date, location, description, event_type, source, event_hash, is_reviewed, is_visible)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            event['summary'],
-            event['start'],
-            event['end'],
-            event['location'],
-            event['description'],
-            event['type'],
-            event['source'],
-            event['event_hash'],
-            False,
-            False
+        event_type = "Single Day"
+        if start != end:
+            event_type = "Multi-Day"
+        if component.get('rrule'):
+            event_type = "Recurring"
+
+        # Apply event type filter if pattern is provided
+        if event_type_pattern and not event_type_pattern.search(event_type):
+            continue
+
+        summary = str(component.get('summary'))
+        events.append(Event(
+            summary=summary,
+            start_date=start.isoformat(),
+            end_date=end.isoformat(),
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+            location=location,
+            description=str(component.get('description', '')),
+            event_type=event_type,
+            source=source_domain,
+            event_key=make_event_key(summary, start.isoformat(), source_domain),
         ))
-        if cursor.rowcount > 0:
-            inserted_count += 1
-    conn.commit()
-    return inserted_count
 
-def main(input_source, output_db, location_include, event_type_include):
+    return events
+
+
+def main(input_source, output_db, location_include, event_type_include, region='werder'):
     try:
-        # If no location filter is provided, use the Werder-specific regex
+        # If no location filter is provided, match the districts of the region
         if not location_include:
-            location_include = r"\b(Werder|Bliesendorf|Resau|Derwitz|Glindow|Elisabethhöhe|Kemnitz|Kolonie Zern|Petzow|Löcknitz|Riegelberg|Phöben|Plötzin|Neu Plötzin|Plessow|Töplitz|Eichholz|Göttin|Leest|Neu Töplitz|Alt Töplitz)\b"
+            location_include = district_pattern(GAZETTEERS[region])
         
         events = parse_ical(input_source, location_include, event_type_include)
         conn = create_database(output_db)
         inserted_count = insert_events(conn, events)
         
         source_domain = get_domain(input_source) if urlparse(input_source).scheme else 'local_file'
-        
+        cancelled_count = None
+        if record_presence(conn, source_domain, [event.event_key for event in events]):
+            cancelled_count = cancel_missing(conn, source_domain)
+
         cursor = conn.cursor()
         cursor.execute('SELECT COUNT(*) FROM events')
         total_events = cursor.fetchone()[0]
@@ -127,6 +117,8 @@ def main(input_source, output_db, location_include, event_type_include):
         print(f"Total events in database: {total_events}")
         print(f"Total events from this source: {source_events}")
         print(f"New events added in this run: {inserted_count}")
+        if cancelled_count is not None:
+            print(f"Events flagged as cancelled: {cancelled_count}")
         print(f"Location filter applied: {location_include}")
         if event_type_include:
             print(f"Event type filter applied: {event_type_include}")
@@ -145,6 +137,8 @@ if __name__ == "__main__":
     parser.add_argument('output', help='Output SQLite database file')
     parser.add_argument('--location-include', help='Regex pattern to filter events by location')
     parser.add_argument('--event-type-include', help='Regex pattern to filter events by type (Single Day, Multi-Day, Recurring)')
+    parser.add_argument('--region', choices=GAZETTEERS, default='werder',
+                        help='Without --location-include, keep the events in the districts of this region (default: werder)')
     args = parser.parse_args()
 
-    main(args.input, args.output, args.location_include, args.event_type_include)
+    main(args.input, args.output, args.location_include, args.event_type_include, args.region)
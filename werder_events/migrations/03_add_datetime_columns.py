@@ -0,0 +1,29 @@
+import sqlite3
+import argparse
+
+def migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(events)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+
+    # Add new columns (start/end timestamps incl. time of day, NULL if unknown).
+    # Existing rows keep NULL, as the times were never stored; the next run of
+    # a scraper fills them in. The event identity must not depend on them
+    # (see werder_events.event.make_event_key).
+    for column in ('start_datetime', 'end_datetime'):
+        if column not in existing_columns:
+            cursor.execute(f'ALTER TABLE events ADD COLUMN {column} TEXT')
+
+    conn.commit()
+    conn.close()
+
+    print(f"Migration completed: Added 'start_datetime' and 'end_datetime' columns to the events table in {db_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add start_datetime and end_datetime columns to the events table.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    args = parser.parse_args()
+
+    migrate(args.db_path)
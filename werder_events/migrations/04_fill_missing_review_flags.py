@@ -0,0 +1,25 @@
+import sqlite3
+import argparse
+
+def migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # Events inserted by the old stadtmagazin-events importer have NULL flags,
+    # which hides them from the review queue (is_reviewed = 0)
+    cursor.execute('UPDATE events SET is_reviewed = 0 WHERE is_reviewed IS NULL')
+    reviewed_count = cursor.rowcount
+    cursor.execute('UPDATE events SET is_visible = 0 WHERE is_visible IS NULL')
+    visible_count = cursor.rowcount
+
+    conn.commit()
+    conn.close()
+
+    print(f"Migration completed: Set {reviewed_count} NULL 'is_reviewed' and {visible_count} NULL 'is_visible' values to 0 in {db_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replace NULL is_reviewed/is_visible values with 0.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    args = parser.parse_args()
+
+    migrate(args.db_path)
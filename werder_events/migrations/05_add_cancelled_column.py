@@ -0,0 +1,25 @@
+import sqlite3
+import argparse
+
+def migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(events)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+
+    # Events that were removed by their source (1) are hidden from all outputs
+    if 'is_cancelled' not in existing_columns:
+        cursor.execute('ALTER TABLE events ADD COLUMN is_cancelled INTEGER DEFAULT 0')
+
+    conn.commit()
+    conn.close()
+
+    print(f"Migration completed: Added 'is_cancelled' column to the events table in {db_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add the is_cancelled column to the events table.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    args = parser.parse_args()
+
+    migrate(args.db_path)
@@ -0,0 +1,132 @@
+import sqlite3
+import argparse
+
+from werder_events.event import make_event_key
+from werder_events.utils import create_database
+
+# Columns copied from the old events table; event_hash is replaced by event_key
+COPIED_COLUMNS = ('id, summary, start_date, end_date, start_datetime, end_datetime, location, '
+                  'description, event_type, source, is_reviewed, is_visible, is_cancelled')
+
+
+def has_event_hash(conn):
+    return 'event_hash' in {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+
+
+def archived_event_keys(archive_path, event_hashes):
+    """Compute the new keys of the archived events from the (not yet migrated) archive DB."""
+    conn = sqlite3.connect(archive_path)
+    try:
+        if not has_event_hash(conn):
+            return []
+        rows = conn.execute('SELECT event_hash, summary, start_date, source FROM events')
+        return [make_event_key(*row[1:]) for row in rows if row[0] in event_hashes]
+    finally:
+        conn.close()
+
+
+def migrate(db_path, archive_path=None):
+    conn = sqlite3.connect(db_path)
+    conn.create_function('make_event_key', 3, make_event_key, deterministic=True)
+    cursor = conn.cursor()
+
+    if not has_event_hash(conn):
+        conn.close()
+        print(f"Nothing to do: the events table in {db_path} has no 'event_hash' column")
+        return
+
+    # The triggers and the full-text index are dropped with the old table and
+    # recreated by create_database below; the event ids are kept
+    cursor.executescript(f'''
+    BEGIN;
+    DROP TRIGGER IF EXISTS events_fts_insert;
+    DROP TRIGGER IF EXISTS events_fts_delete;
+    DROP TRIGGER IF EXISTS events_fts_update;
+    DROP TRIGGER IF EXISTS events_apply_review_decision;
+    DROP TRIGGER IF EXISTS events_skip_archived;
+    DROP TABLE IF EXISTS events_fts;
+    CREATE TABLE events_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        summary TEXT,
+        start_date TEXT,
+        end_date TEXT,
+        start_datetime TEXT,
+        end_datetime TEXT,
+        location TEXT,
+        description TEXT,
+        event_type TEXT,
+        source TEXT,
+        event_key INTEGER NOT NULL UNIQUE,
+        is_reviewed BOOLEAN DEFAULT 0,
+        is_visible BOOLEAN DEFAULT 0,
+        is_cancelled INTEGER DEFAULT 0
+    );
+    -- Events with the same normalized identity (e.g. hashed differently by
+    -- an older parser) collapse into the visible, else the most recent one
+    INSERT OR IGNORE INTO events_new ({COPIED_COLUMNS}, event_key)
+    SELECT {COPIED_COLUMNS}, make_event_key(summary, start_date, source)
+    FROM events ORDER BY is_visible DESC, is_reviewed DESC, id DESC;
+    CREATE TEMP TABLE rekeyed AS
+    SELECT e.event_hash, n.event_key FROM events e LEFT JOIN events_new n USING (id);
+    DROP TABLE events;
+    ALTER TABLE events_new RENAME TO events;
+    COMMIT;
+    ''')
+    migrated, collapsed = cursor.execute(
+        'SELECT count(event_key), count(*) - count(event_key) FROM rekeyed').fetchone()
+
+    tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    archived_keys = []
+    unresolved = 0
+    if 'archived_hashes' in tables:
+        archived_hashes = {row[0] for row in cursor.execute('SELECT event_hash FROM archived_hashes')}
+        if archive_path:
+            archived_keys = archived_event_keys(archive_path, archived_hashes)
+        unresolved = len(archived_hashes) - len(archived_keys)
+
+    # Presence is re-keyed below; the box fingerprints are only a cache and
+    # are rebuilt by the next werder-havel.de run
+    cursor.execute('BEGIN')
+    if 'event_presence' in tables:
+        cursor.execute('ALTER TABLE event_presence RENAME TO event_presence_old')
+    cursor.execute('DROP TABLE IF EXISTS box_fingerprints')
+    cursor.execute('DROP TABLE IF EXISTS archived_hashes')
+    conn.commit()
+
+    # Recreate the new tables, indexes, triggers and the full-text index
+    create_database(db_path).close()
+
+    cursor.execute('BEGIN')
+    if 'event_presence' in tables:
+        cursor.execute('''
+            INSERT OR REPLACE INTO event_presence (event_key, source, missed_runs)
+            SELECT r.event_key, p.source, (
+                SELECT count(*) FROM source_runs sr WHERE sr.source = p.source AND sr.run_at > p.last_seen
+            )
+            FROM event_presence_old p JOIN rekeyed r USING (event_hash)
+            WHERE r.event_key IS NOT NULL
+        ''')
+        cursor.execute('DROP TABLE event_presence_old')
+    cursor.executemany('INSERT OR IGNORE INTO archived_keys (event_key) VALUES (?)',
+                       ((key,) for key in archived_keys))
+    conn.commit()
+    conn.close()
+
+    print(f"Migration completed: Replaced 'event_hash' with the integer 'event_key' in {db_path} "
+          f"({migrated} events, {collapsed} duplicates collapsed)")
+    if unresolved:
+        print(f"Warning: {unresolved} archived hashes could not be re-keyed, as their events "
+              f"are not in the archive database ({archive_path or 'not given'})")
+
+    if archive_path:
+        migrate(archive_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replace the MD5 event_hash column with the integer event_key.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    parser.add_argument('archive_path', nargs='?',
+                        help='Path to the archive database (migrated too, and used to re-key the archived hashes)')
+    args = parser.parse_args()
+
+    migrate(args.db_path, args.archive_path)
@@ -0,0 +1,27 @@
+import sqlite3
+import argparse
+
+def migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(events)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+
+    # The normalized category of the event (see werder_events/categories.py),
+    # filled by `python -m werder_events.categories`
+    if 'category' not in existing_columns:
+        cursor.execute('ALTER TABLE events ADD COLUMN category TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_category ON events (category, is_visible, start_date)')
+
+    conn.commit()
+    conn.close()
+
+    print(f"Migration completed: Added 'category' column to the events table in {db_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add the category column to the events table.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    args = parser.parse_args()
+
+    migrate(args.db_path)
@@ -0,0 +1,26 @@
+import sqlite3
+import argparse
+
+def migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(events)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+
+    # The categories published by the source, e.g. 'Führung, Täglich'
+    # (see werder_events/categories.py)
+    if 'source_categories' not in existing_columns:
+        cursor.execute('ALTER TABLE events ADD COLUMN source_categories TEXT')
+
+    conn.commit()
+    conn.close()
+
+    print(f"Migration completed: Added 'source_categories' column to the events table in {db_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add the source_categories column to the events table.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    args = parser.parse_args()
+
+    migrate(args.db_path)
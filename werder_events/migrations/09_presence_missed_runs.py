@@ -0,0 +1,43 @@
+import sqlite3
+import argparse
+
+def migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(event_presence)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+    if 'last_seen' not in existing_columns:
+        conn.close()
+        print(f"Nothing to do: event_presence in {db_path} has no 'last_seen' column")
+        return
+
+    # The last_seen time of every event is replaced by the number of runs of
+    # its source since then (see werder_events/presence.py), which doesn't
+    # change while the event is published
+    cursor.executescript('''
+    BEGIN;
+    CREATE TABLE event_presence_new (
+        event_key INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        missed_runs INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT INTO event_presence_new (event_key, source, missed_runs)
+    SELECT p.event_key, p.source, (
+        SELECT count(*) FROM source_runs r WHERE r.source = p.source AND r.run_at > p.last_seen
+    )
+    FROM event_presence p;
+    DROP TABLE event_presence;
+    ALTER TABLE event_presence_new RENAME TO event_presence;
+    COMMIT;
+    ''')
+    conn.close()
+
+    print(f"Migration completed: Replaced 'last_seen' with 'missed_runs' in event_presence in {db_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replace event_presence.last_seen with the missed_runs counter.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    args = parser.parse_args()
+
+    migrate(args.db_path)
@@ -0,0 +1,26 @@
+import sqlite3
+import argparse
+
+def migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(quarantine)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+
+    # Quarantined events are only updated when the event or the reasons
+    # change (see werder_events/validate.py), no longer on every run
+    if 'last_seen' in existing_columns:
+        cursor.execute('ALTER TABLE quarantine RENAME COLUMN last_seen TO last_changed')
+
+    conn.commit()
+    conn.close()
+
+    print(f"Migration completed: Renamed quarantine.last_seen to 'last_changed' in {db_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rename quarantine.last_seen to last_changed.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    args = parser.parse_args()
+
+    migrate(args.db_path)
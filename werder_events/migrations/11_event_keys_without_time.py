@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import argparse
+
+from werder_events.event import make_event_key
+
+# Tables that refer to events by their key; the box fingerprints are only a
+# cache, re-keying them spares the next werder-havel.de run a full parse
+KEYED_TABLES = ('event_presence', 'box_fingerprints')
+
+
+def rekey_events(conn):
+    """
+    Derive the event keys from the title, the start date and the source only
+    (see werder_events.event.make_event_key). Events that now share a key
+    collapse into the visible, else the reviewed, else the most recent one.
+    Returns the ``{old_key: new_key}`` mapping of the changed keys and the
+    number of removed duplicates.
+    """
+    rows = conn.execute('''
+        SELECT id, event_key, summary, start_date, source FROM events
+        ORDER BY is_visible DESC, is_reviewed DESC, id DESC
+    ''').fetchall()
+    kept = set()
+    duplicates = []
+    rekeyed = []
+    changed = {}
+    for event_id, old_key, summary, start_date, source in rows:
+        new_key = make_event_key(summary, start_date, source)
+        if new_key != old_key:
+            changed[old_key] = new_key
+        if new_key in kept:
+            duplicates.append((event_id,))
+            continue
+        kept.add(new_key)
+        if new_key != old_key:
+            rekeyed.append((new_key, event_id))
+
+    conn.executemany('DELETE FROM events WHERE id = ?', duplicates)
+    # The keys are unique, so the changed ones are moved out of the way first
+    conn.executemany('UPDATE events SET event_key = -id WHERE id = ?', ((event_id,) for _, event_id in rekeyed))
+    conn.executemany('UPDATE events SET event_key = ? WHERE id = ?', rekeyed)
+    return changed, len(duplicates)
+
+
+def rekey_quarantine(conn):
+    """Re-key the quarantined events, in the quarantine record as well."""
+    rows = conn.execute('SELECT event_key, event FROM quarantine').fetchall()
+    updates = []
+    for old_key, event_json in rows:
+        event = json.loads(event_json)
+        new_key = make_event_key(event['summary'] or '', event['start_date'], event['source'] or '')
+        if new_key != old_key:
+            event['event_key'] = new_key
+            updates.append((new_key, json.dumps(event, ensure_ascii=False), old_key))
+    conn.executemany('UPDATE OR REPLACE quarantine SET event_key = ?, event = ? WHERE event_key = ?', updates)
+    return len(updates)
+
+
+def rekey_database(db_path, archived=None):
+    """Re-key the events of a database and the tables referring to them; returns the changed keys."""
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'events' not in tables:
+        conn.close()
+        print(f"Nothing to do: {db_path} has no events table")
+        return {}
+
+    changed, duplicates = rekey_events(conn)
+    for table in KEYED_TABLES:
+        if table in tables:
+            conn.executemany(f'UPDATE OR REPLACE {table} SET event_key = ? WHERE event_key = ?',
+                             [(new_key, old_key) for old_key, new_key in changed.items()])
+    if archived and 'archived_keys' in tables:
+        conn.executemany('UPDATE OR REPLACE archived_keys SET event_key = ? WHERE event_key = ?',
+                         [(new_key, old_key) for old_key, new_key in archived.items()])
+    quarantined = rekey_quarantine(conn) if 'quarantine' in tables else 0
+    conn.commit()
+    conn.close()
+
+    print(f"Migration completed: Re-keyed {len(changed)} events without their time of day in {db_path} "
+          f"({duplicates} duplicates collapsed, {quarantined} quarantined events re-keyed)")
+    return changed
+
+
+def migrate(db_path, archive_path=None):
+    # The archive first, so that the keys of the archived events are known
+    archived = rekey_database(archive_path) if archive_path else None
+    rekey_database(db_path, archived)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Derive the event keys from the title, start date and source, without the time of day.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    parser.add_argument('archive_path', nargs='?',
+                        help='Path to the archive database (migrated too, and used to re-key the archived keys)')
+    args = parser.parse_args()
+
+    migrate(args.db_path, args.archive_path)
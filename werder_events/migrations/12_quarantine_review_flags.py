@@ -0,0 +1,53 @@
+import sqlite3
+import argparse
+
+def migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(quarantine)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+
+    # Stored events moved to the quarantine keep their review flags (see
+    # werder_events/validate.py, recheck); NULL for events that were never stored
+    if 'is_reviewed' not in existing_columns:
+        cursor.execute('ALTER TABLE quarantine ADD COLUMN is_reviewed INTEGER')
+    if 'is_visible' not in existing_columns:
+        cursor.execute('ALTER TABLE quarantine ADD COLUMN is_visible INTEGER')
+
+    # The flags are restored when the event is inserted again, and take
+    # precedence over a remembered review decision for the title
+    cursor.executescript('''
+    BEGIN;
+    DROP TRIGGER IF EXISTS events_apply_review_decision;
+    CREATE TRIGGER events_apply_review_decision AFTER INSERT ON events
+    WHEN new.is_reviewed = 0
+    AND EXISTS (SELECT 1 FROM review_decisions WHERE title_key = lower(trim(new.summary)))
+    AND NOT EXISTS (SELECT 1 FROM quarantine WHERE event_key = new.event_key AND is_reviewed = 1)
+    BEGIN
+        UPDATE events
+        SET is_reviewed = 1,
+            is_visible = (SELECT is_visible FROM review_decisions WHERE title_key = lower(trim(new.summary)))
+        WHERE id = new.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS events_restore_quarantined AFTER INSERT ON events
+    WHEN new.is_reviewed = 0
+    AND EXISTS (SELECT 1 FROM quarantine WHERE event_key = new.event_key AND is_reviewed = 1)
+    BEGIN
+        UPDATE events
+        SET is_reviewed = 1,
+            is_visible = (SELECT is_visible FROM quarantine WHERE event_key = new.event_key)
+        WHERE id = new.id;
+    END;
+    COMMIT;
+    ''')
+    conn.close()
+
+    print(f"Migration completed: Added 'is_reviewed' and 'is_visible' columns to the quarantine in {db_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Keep the review flags of quarantined events.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    args = parser.parse_args()
+
+    migrate(args.db_path)
@@ -0,0 +1,91 @@
+"""
+Precompress the static output (page, assets, feeds) for web servers that
+serve precompressed siblings (e.g. nginx ``gzip_static``/``brotli_static``).
+
+Next to every text file, a ``.gz`` (gzip level 9) and, if the optional
+``brotli`` package is installed (``pip install .[brotli]``), a ``.br`` file
+are written. The gzip files don't contain a timestamp, so compressing the
+same file twice gives the same bytes (and no diff in git). Siblings that are
+newer than their file are left alone.
+
+    python -m werder_events.precompress _site
+"""
+import argparse
+import gzip
+import os
+
+from werder_events.sqlite_to_html import ASSETS_DIR
+
+EXTENSIONS = ('.html', '.css', '.js', '.json', '.ics', '.xml', '.svg', '.txt')
+# Compressing smaller files gains nothing
+MIN_SIZE = 256
+
+
+def compressors():
+    """Return the available (suffix, compress function) pairs."""
+    result = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        result.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    return result
+
+
+def precompress(path, available=None):
+    """
+    Write the compressed siblings of ``path`` (with the ``available``
+    compressors, default: all). Returns the number of files written.
+    """
+    written = 0
+    data = None
+    mtime = os.path.getmtime(path)
+    for suffix, compress in available or compressors():
+        target = path + suffix
+        if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        with open(f"{target}.tmp", 'wb') as f:
+            f.write(compress(data))
+        os.replace(f"{target}.tmp", target)
+        written += 1
+    return written
+
+
+def precompress_tree(directory):
+    """
+    Precompress all text files below ``directory``. Returns the number of
+    files compressed and the number of siblings written.
+    """
+    available = compressors()
+    files = written = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if filename.endswith(EXTENSIONS) and os.path.getsize(path) >= MIN_SIZE:
+                files += 1
+                written += precompress(path, available)
+    return files, written
+
+
+def precompress_page(path):
+    """Precompress a page written by sqlite_to_html.write_html and its assets."""
+    precompress(path)
+    precompress_tree(os.path.join(os.path.dirname(path), ASSETS_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write .gz and .br siblings of the static output files.")
+    parser.add_argument("directory", nargs="+", help="Output directories (e.g. _site)")
+    args = parser.parse_args()
+
+    for directory in args.directory:
+        files, written = precompress_tree(directory)
+        print(f"{directory}: {files} files, {written} compressed files written")
+
+
+if __name__ == "__main__":
+    main()
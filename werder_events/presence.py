@@ -0,0 +1,156 @@
+"""
+Track which events each source still publishes, and flag upcoming events
+that disappeared from their source as cancelled.
+
+Every scraper run records the event keys it found with
+``record_presence``: the keys are loaded into a temporary table, the
+``missed_runs`` counter of the upcoming events of the source that weren't
+found is incremented, and the counter of the found ones is reset to 0. The
+run itself is logged in ``source_runs``. ``cancel_missing`` then flags the
+upcoming events of the source that were missing from the last
+``MISSING_RUNS`` runs (``is_cancelled = 1``); an event that shows up again
+is restored by the next ``record_presence``.
+
+The counter is kept in its own table (``event_presence``) instead of the
+events table, and only rows whose counter changes are written (events that
+are published on every run, or are already cancelled, stay untouched), so
+that the daily update doesn't rewrite the text export.
+
+Report of the sources and their missing events:
+
+    python -m werder_events.presence events.sqlite
+"""
+import argparse
+import sqlite3
+from datetime import date, datetime, timezone
+
+from werder_events.utils import setup_logger
+
+# Consecutive runs an event must be missing from its source to be cancelled
+MISSING_RUNS = 3
+
+CANCEL_MISSING_SQL = '''
+UPDATE events SET is_cancelled = 1
+WHERE source = :source
+AND is_cancelled = 0
+AND start_date >= :today AND start_date != 'unknown'
+AND event_key IN (
+    SELECT event_key FROM event_presence
+    WHERE source = :source AND missed_runs >= :missing_runs
+)
+'''
+
+
+def record_presence(conn, source, event_keys, seen_at=None, today=None):
+    """
+    Record that ``source`` currently publishes the events with the given
+    keys. Returns False (and records nothing) if there are none, as an
+    empty result is more likely a broken page than a source without events.
+    """
+    event_keys = set(event_keys)
+    if not event_keys:
+        return False
+    seen_at = (seen_at or datetime.now(timezone.utc)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    with conn:
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS seen_keys (event_key INTEGER PRIMARY KEY)')
+        conn.execute('DELETE FROM seen_keys')
+        conn.executemany('INSERT INTO seen_keys (event_key) VALUES (?)', ((k,) for k in event_keys))
+        conn.execute('''
+            INSERT INTO event_presence (event_key, source, missed_runs)
+            SELECT s.event_key, ?, 0 FROM seen_keys s
+            JOIN events e ON e.event_key = s.event_key
+            WHERE true
+            ON CONFLICT (event_key) DO UPDATE SET missed_runs = 0 WHERE missed_runs != 0
+        ''', (source,))
+        # Only upcoming events that aren't cancelled yet need counting
+        conn.execute('''
+            UPDATE event_presence SET missed_runs = missed_runs + 1
+            WHERE source = :source
+            AND event_key NOT IN (SELECT event_key FROM seen_keys)
+            AND event_key IN (
+                SELECT event_key FROM events
+                WHERE is_cancelled = 0 AND start_date >= :today AND start_date != 'unknown'
+            )
+        ''', {'source': source, 'today': (today or date.today()).isoformat()})
+        # Events that were flagged as cancelled but are back
+        conn.execute('''
+            UPDATE events SET is_cancelled = 0
+            WHERE is_cancelled = 1 AND event_key IN (SELECT event_key FROM seen_keys)
+        ''')
+        conn.execute('INSERT OR REPLACE INTO source_runs (source, run_at, event_count) VALUES (?, ?, ?)',
+                     (source, seen_at, len(event_keys)))
+    return True
+
+
+def cancel_missing(conn, source, missing_runs=MISSING_RUNS, today=None):
+    """
+    Flag the upcoming events of ``source`` that were missing from its last
+    ``missing_runs`` runs as cancelled. Returns the number of newly
+    cancelled events.
+    """
+    with conn:
+        cursor = conn.execute(CANCEL_MISSING_SQL, {
+            'source': source,
+            'today': (today or date.today()).isoformat(),
+            'missing_runs': missing_runs,
+        })
+    return cursor.rowcount
+
+
+def update_presence(conn, source, event_keys, logger, missing_runs=MISSING_RUNS):
+    """Record a scraper run and cancel missing events; used by the scrapers."""
+    if not record_presence(conn, source, event_keys):
+        logger.warning(f"No events found for {source}, not counting this run for cancellations")
+        return 0
+    cancelled = cancel_missing(conn, source, missing_runs)
+    logger.info(f"Events flagged as cancelled: {cancelled}")
+    return cancelled
+
+
+def report(conn, today=None):
+    """
+    Return ``(source, last_run, event_count, missing, cancelled)`` for every
+    source, where ``missing`` counts the upcoming events that were not in
+    the last run and ``cancelled`` the upcoming cancelled events.
+    """
+    return conn.execute('''
+        SELECT r.source, max(r.run_at), (
+            SELECT event_count FROM source_runs WHERE source = r.source ORDER BY run_at DESC LIMIT 1
+        ), (
+            SELECT count(*) FROM event_presence p JOIN events e USING (event_key)
+            WHERE p.source = r.source AND e.start_date >= :today AND e.start_date != 'unknown'
+            AND p.missed_runs > 0
+        ), (
+            SELECT count(*) FROM events e
+            WHERE e.source = r.source AND e.is_cancelled = 1 AND e.start_date >= :today
+            AND e.start_date != 'unknown'
+        )
+        FROM source_runs r
+        GROUP BY r.source
+        ORDER BY r.source
+    ''', {'today': (today or date.today()).isoformat()}).fetchall()
+
+
+def main(db_path, verbose):
+    logger = setup_logger("presence", verbose)
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        for source, last_run, event_count, missing, cancelled in report(conn):
+            print(f"{source:30} last run {last_run} ({event_count} events), "
+                  f"{missing} upcoming events missing, {cancelled} cancelled")
+    except sqlite3.Error as e:
+        logger.error(f"SQLite error: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Show which events the sources no longer publish.')
+    parser.add_argument('db_path', help='Path to the SQLite database file')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
+    args = parser.parse_args()
+
+    main(args.db_path, args.verbose)
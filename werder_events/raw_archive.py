@@ -0,0 +1,197 @@
+"""
+Archive of the raw responses of the event sources, for reparsing them later.
+
+Every body is stored once, gzip-compressed, under the SHA-256 of its content
+(``objects/ab/cdef....gz``), so a page that didn't change since the last run
+takes no extra space. Each fetch is recorded as one line of ``index.jsonl``
+with the source, URL, fetch time and digest.
+
+The ``reparse`` command replays archived responses through the current
+parsers in parallel, e.g. to check a parser fix against past inputs or to
+benchmark the parsers offline on real data:
+
+    python -m werder_events.raw_archive list raw --source www.werder-havel.de
+    python -m werder_events.raw_archive reparse raw --since 2024-09-01 -j 4
+    python -m werder_events.raw_archive reparse raw events.sqlite
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+INDEX_FILENAME = "index.jsonl"
+OBJECTS_DIRNAME = "objects"
+
+
+class RawArchive:
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, INDEX_FILENAME)
+
+    def object_path(self, digest):
+        return os.path.join(self.root, OBJECTS_DIRNAME, digest[:2], f"{digest[2:]}.gz")
+
+    def store(self, body, source, url, content_type=None, fetched_at=None):
+        """Store a response body (bytes) and record the fetch. Returns the digest."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                # mtime=0 makes the compressed file depend on the content only
+                f.write(gzip.compress(body, compresslevel=9, mtime=0))
+            os.replace(tmp_path, path)
+
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        entry = {
+            "content_type": content_type,
+            "digest": digest,
+            "fetched_at": fetched_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "size": len(body),
+            "source": source,
+            "url": url,
+        }
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, sort_keys=True) + "\n")
+        return digest
+
+    def load(self, digest):
+        with open(self.object_path(digest), 'rb') as f:
+            return gzip.decompress(f.read())
+
+    def entries(self, source=None, since=None, until=None):
+        """
+        Yield the index entries, oldest first. ``since`` and ``until`` are
+        ISO dates or timestamps, compared against the fetch time.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if source and entry['source'] != source:
+                    continue
+                if since and entry['fetched_at'] < since:
+                    continue
+                if until and entry['fetched_at'][:len(until)] > until:
+                    continue
+                yield entry
+
+
+def parse_werder_havel_de(body, fetched_at):
+    from werder_events.werder_havel_de import parse_html
+    return parse_html(body.decode("utf-8"), logging.getLogger("parsers"), today=fetched_at.date())
+
+
+def parse_havelland_verteiler(body, fetched_at):
+    from werder_events.districts import WERDER_DISTRICTS_PATTERN
+    from werder_events.havelland_verteiler import parse_calendar
+    # The same filters as in the workflow
+    return parse_calendar(body, 'havelland-verteiler.de', WERDER_DISTRICTS_PATTERN, 'Single Day')
+
+
+def parse_stadtmagazin_events_de(body, fetched_at):
+    from werder_events.stadtmagazin_events_de import parse_results
+    return parse_results(json.loads(body), logging.getLogger("parsers"))
+
+
+# Archived sources (host names) and the parsers for their responses
+PARSERS = {
+    'www.werder-havel.de': parse_werder_havel_de,
+    'havelland-verteiler.de': parse_havelland_verteiler,
+    'www.stadtmagazin-events.de': parse_stadtmagazin_events_de,
+}
+
+
+def reparse_entry(root, entry):
+    """Parse one archived response. Returns ``(entry, events, seconds)``."""
+    body = RawArchive(root).load(entry['digest'])
+    fetched_at = datetime.strptime(entry['fetched_at'], '%Y-%m-%dT%H:%M:%SZ')
+    start = time.perf_counter()
+    events = PARSERS[entry['source']](body, fetched_at)
+    return entry, events, time.perf_counter() - start
+
+
+def init_worker(verbose):
+    # Parser warnings (e.g. unparseable dates) are only shown in verbose mode
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.ERROR,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def reparse(root, source=None, since=None, until=None, jobs=None, verbose=False):
+    """
+    Yield ``(entry, events, seconds)`` for every archived response with a
+    known parser, parsed in ``jobs`` worker processes.
+    """
+    entries = [entry for entry in RawArchive(root).entries(source, since, until)
+               if entry['source'] in PARSERS]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(verbose,)) as executor:
+        yield from executor.map(reparse_entry, [root] * len(entries), entries)
+
+
+def list_entries(root, source, since, until):
+    for entry in RawArchive(root).entries(source, since, until):
+        print(f"{entry['fetched_at']}  {entry['digest'][:12]}  {entry['size']:>9}  {entry['source']}  {entry['url']}")
+
+
+def main_reparse(root, db_path, source, since, until, jobs, verbose):
+    from werder_events.utils import create_database, insert_events, setup_logger
+
+    logger = setup_logger("reparse", verbose)
+    conn = create_database(db_path, logger) if db_path else None
+    responses = total_events = inserted = 0
+    total_bytes = parse_seconds = 0.0
+    start = time.perf_counter()
+    try:
+        for entry, events, seconds in reparse(root, source, since, until, jobs, verbose):
+            logger.debug(f"{entry['fetched_at']} {entry['source']}: {len(events)} events in {seconds * 1000:.1f} ms")
+            responses += 1
+            total_events += len(events)
+            total_bytes += entry['size']
+            parse_seconds += seconds
+            if conn:
+                inserted += insert_events(conn, events)
+    except sqlite3.Error as e:
+        logger.error(f"SQLite error: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Reparsed {responses} responses ({total_bytes / 1e6:.1f} MB) into {total_events} events "
+                f"in {elapsed:.2f} s ({parse_seconds:.2f} s parsing)")
+    if conn:
+        logger.info(f"New events added to {db_path}: {inserted}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Inspect and reparse the raw response archive.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_filter_arguments(subparser):
+        subparser.add_argument('archive', help='Path to the archive directory')
+        subparser.add_argument('--source', help='Only responses from this source (host name)')
+        subparser.add_argument('--since', help='Only responses fetched on or after this date (YYYY-MM-DD)')
+        subparser.add_argument('--until', help='Only responses fetched on or before this date (YYYY-MM-DD)')
+
+    list_parser = subparsers.add_parser('list', help='List the archived responses')
+    add_filter_arguments(list_parser)
+
+    reparse_parser = subparsers.add_parser('reparse', help='Parse archived responses with the current parsers')
+    add_filter_arguments(reparse_parser)
+    reparse_parser.add_argument('db_path', nargs='?', help='Insert the parsed events into this SQLite database')
+    reparse_parser.add_argument('-j', '--jobs', type=int, help='Number of worker processes (default: number of CPUs)')
+    reparse_parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        list_entries(args.archive, args.source, args.since, args.until)
+    else:
+        main_reparse(args.archive, args.db_path, args.source, args.since, args.until, args.jobs, args.verbose)
@@ -0,0 +1,187 @@
+"""
+Region profiles, to run the event page for several Havelland towns.
+
+Each region has a gazetteer (its districts, see districts.py), its own
+sources, and its own database shard and output directory (``index.html``
+and ``feeds/``). Sources that cover the whole Havelland (``SHARED_FEEDS``)
+are fetched and parsed once per ingest; their events are fanned out to the
+shards of all regions whose gazetteer matches the event location (an
+event can belong to several regions). The region sources are fetched in
+parallel; each shard has a single writer (see writer.py). Rendering the regions is CPU bound
+and runs in a process pool.
+
+    python -m werder_events.regions ingest -v
+    python -m werder_events.regions render
+    python -m werder_events.regions ingest --region schwielowsee gross-kreutz
+"""
+import argparse
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+import requests
+
+from werder_events import havelland_verteiler
+from werder_events.daemon import SOURCES
+from werder_events.categories import categorize_events
+from werder_events.districts import GAZETTEERS, district_regex
+from werder_events.feeds import write_feeds
+from werder_events.geocode import geocode_events
+from werder_events.precompress import precompress_page, precompress_tree
+from werder_events.presence import update_presence
+from werder_events.sqlite_to_html import PAGE_URL, write_html
+from werder_events.utils import setup_logger
+from werder_events.writer import Writer
+
+STADTMAGAZIN_SEARCH_URL = ("https://www.stadtmagazin-events.de/api/search/event/alle-veranstaltungen/get_search_results"
+                           "?search_value={town}&categories=&search_date=&search_date_end=&page=1")
+
+
+class Region(NamedTuple):
+    town: str
+    districts: tuple
+    db_path: str
+    output_dir: str
+    url: str
+    sources: dict  # Region-only sources: name (see daemon.SOURCES) -> URL
+
+    def matches(self, location):
+        return district_regex(self.districts).search(location or '') is not None
+
+
+REGIONS = {
+    'werder': Region(
+        "Werder (Havel)", GAZETTEERS['werder'], 'events.sqlite', '_site', PAGE_URL, {
+            'werder-havel.de': SOURCES['werder-havel.de'].url,
+            'stadtmagazin-events.de': SOURCES['stadtmagazin-events.de'].url,
+        }),
+    'schwielowsee': Region(
+        "Schwielowsee", GAZETTEERS['schwielowsee'], 'events-schwielowsee.sqlite', '_site/schwielowsee',
+        f"{PAGE_URL}schwielowsee/", {
+            'stadtmagazin-events.de': STADTMAGAZIN_SEARCH_URL.format(town='Schwielowsee'),
+        }),
+    'gross-kreutz': Region(
+        "Groß Kreutz (Havel)", GAZETTEERS['gross-kreutz'], 'events-gross-kreutz.sqlite', '_site/gross-kreutz',
+        f"{PAGE_URL}gross-kreutz/", {}),
+}
+
+# Sources covering all regions, fetched once and fanned out by location
+SHARED_FEEDS = {
+    'havelland-verteiler.de': SOURCES['havelland-verteiler.de'].url,
+}
+
+
+def parse_shared_feed(url):
+    """Return the source name and all events of a shared feed, without location filter."""
+    events = havelland_verteiler.parse_ical(url, event_type_pattern='Single Day')
+    source = havelland_verteiler.get_domain(url) if urlparse(url).scheme else 'local_file'
+    return source, events
+
+
+def refresh_source(writer, name, source, url, logger):
+    try:
+        changed = SOURCES[source].refresh(writer, url, logger)
+    except Exception as e:
+        logger.error(f"{name}: refreshing {source} failed: {e}")
+        logger.debug("", exc_info=True)
+        return
+    logger.info(f"{name}: {changed} events from {source} changed")
+
+
+def ingest(regions, logger, urls=None):
+    """
+    Fetch all shared feeds and region sources and store their events in the
+    region shards, each through its own writer (see writer.py). The region
+    sources are fetched in parallel. ``urls`` overrides the URLs of sources,
+    by name.
+    """
+    urls = urls or {}
+    writers = {}
+    try:
+        for name, region in regions.items():
+            writers[name] = Writer(region.db_path, logger)
+
+        for feed, url in SHARED_FEEDS.items():
+            try:
+                source, events = parse_shared_feed(urls.get(feed, url))
+            except (requests.exceptions.RequestException, OSError, ValueError) as e:
+                logger.error(f"Fetching {feed} failed: {e}")
+                continue
+            for name, region in regions.items():
+                regional = [event for event in events if region.matches(event.location)]
+                inserted = writers[name].insert(regional)
+                writers[name].call(update_presence, source, [event.event_key for event in regional], logger)
+                logger.info(f"{name}: {len(regional)} of {len(events)} events from {feed}, {inserted.result()} new")
+
+        jobs = [(name, source, url) for name, region in regions.items() for source, url in region.sources.items()]
+        if jobs:
+            with ThreadPoolExecutor(len(jobs)) as executor:
+                for name, source, url in jobs:
+                    executor.submit(refresh_source, writers[name], name, source, urls.get(source, url), logger)
+
+        for writer in writers.values():
+            writer.call(geocode_events, logger)
+            writer.call(categorize_events, logger)
+    finally:
+        # Writes everything queued
+        for writer in writers.values():
+            writer.close()
+
+
+def render_region(region):
+    """
+    Write the (precompressed) page and the feeds of a region. Returns the
+    ``(written, changed)`` feed files.
+    """
+    # Not precompress_tree(output_dir): the werder output contains the other regions
+    page, feeds_dir = os.path.join(region.output_dir, 'index.html'), os.path.join(region.output_dir, 'feeds')
+    conn = sqlite3.connect(region.db_path)
+    try:
+        write_html(conn, page, title=f"Aktuelle Termine in {region.town}", url=region.url)
+        feeds = write_feeds(conn, feeds_dir, districts=region.districts, calendar_name=f"Termine in {region.town}")
+    finally:
+        conn.close()
+    precompress_page(page)
+    precompress_tree(feeds_dir)
+    return feeds
+
+
+def render(regions, logger, jobs=None):
+    """Render all regions in parallel, in up to ``jobs`` processes."""
+    with ProcessPoolExecutor(min(jobs or os.cpu_count(), len(regions))) as executor:
+        for name, (written, changed) in zip(regions, executor.map(render_region, regions.values())):
+            logger.info(f"{name}: page and {written} feed files written to {regions[name].output_dir}, "
+                        f"{changed} feed files changed")
+
+
+def source_url(value):
+    """'havelland-verteiler.de=ical.ics' -> ('havelland-verteiler.de', 'ical.ics')"""
+    name, _, url = value.partition('=')
+    if name not in SOURCES:
+        raise argparse.ArgumentTypeError(f"unknown source {name!r}, choose from {', '.join(SOURCES)}")
+    return name, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape and render the event pages of several regions.")
+    parser.add_argument("command", choices=("ingest", "render"),
+                        help="ingest: update the region databases, render: write their pages and feeds")
+    parser.add_argument("--region", nargs="+", choices=REGIONS, help="Only these regions (default: all)")
+    parser.add_argument("--url", type=source_url, action="append", default=[], metavar="SOURCE=URL",
+                        help="Fetch a source from another URL or a local file (in all regions)")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of render processes (default: number of CPUs)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    logger = setup_logger("regions", args.verbose)
+    regions = {name: region for name, region in REGIONS.items() if not args.region or name in args.region}
+    if args.command == "ingest":
+        ingest(regions, logger, dict(args.url))
+    else:
+        render(regions, logger, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
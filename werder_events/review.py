@@ -0,0 +1,206 @@
+"""
+Review queue for newly scraped events.
+
+Scraped events are inserted with ``is_reviewed = 0`` and ``is_visible = 0``
+and only show up on the page once they have been approved. This tool pages
+through the unreviewed upcoming events (using the ``(is_reviewed,
+start_date)`` index) and approves or hides them in bulk, each bulk operation
+in a single transaction.
+
+Decisions can be remembered for an event title (``--remember``); events with
+a remembered title are reviewed automatically when they are inserted, see
+``utils.create_database``.
+"""
+import argparse
+import sqlite3
+from datetime import date, datetime
+
+from werder_events.event import Event
+from werder_events.utils import create_database
+
+# Must match the expression used by the events_apply_review_decision trigger
+TITLE_KEY_SQL = "lower(trim(summary))"
+
+PENDING_SQL = f"""
+    SELECT id, {', '.join(Event._fields)}
+    FROM events
+    WHERE is_reviewed = 0
+    AND start_date >= ?
+    AND (start_date, id) > (?, ?)
+    {{filters}}
+    ORDER BY start_date, id
+    LIMIT ?
+"""
+
+
+def build_filters(ids=None, source=None, date_from=None, date_to=None, pattern=None):
+    """
+    Build the WHERE clauses (and their parameters) selecting events by id,
+    source, start date range and/or a case-insensitive summary substring.
+    """
+    clauses = []
+    params = []
+    if ids:
+        clauses.append(f"id IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+    if source:
+        clauses.append("source = ?")
+        params.append(source)
+    if date_from:
+        clauses.append("start_date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("start_date <= ?")
+        params.append(date_to)
+    if pattern:
+        clauses.append("summary LIKE ?")
+        params.append(f"%{pattern}%")
+    return clauses, params
+
+
+def pending_events(conn, limit=20, after=None, **filters):
+    """
+    Return one page of unreviewed upcoming events as ``(id, Event)`` tuples.
+    Pass the ``(start_date, id)`` of the last event of a page as ``after`` to
+    get the next page.
+    """
+    clauses, params = build_filters(**filters)
+    after_date, after_id = after or ('', 0)
+    sql = PENDING_SQL.format(filters=''.join(f"AND {clause}\n    " for clause in clauses))
+    cursor = conn.execute(sql, [date.today().isoformat(), after_date, after_id, *params, limit])
+    return [(row[0], Event._make(row[1:])) for row in cursor]
+
+
+def review_events(conn, is_visible, remember=False, include_reviewed=False, **filters):
+    """
+    Mark all matching events as reviewed and set their visibility. Unless
+    ``include_reviewed`` is set (or ids are given), only unreviewed events
+    are changed. With ``remember``, the decision is also stored for the
+    titles of these events. Returns the number of changed events.
+    """
+    clauses, params = build_filters(**filters)
+    if not clauses:
+        raise ValueError("Refusing to review all events without a filter")
+    if not include_reviewed and not filters.get('ids'):
+        clauses.append("is_reviewed = 0")
+    where = ' AND '.join(clauses)
+
+    with conn:
+        if remember:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO review_decisions (title_key, is_visible, decided_at)
+                SELECT DISTINCT {TITLE_KEY_SQL}, ?, ? FROM events WHERE {where}
+            """, [int(is_visible), datetime.now().isoformat(timespec='seconds'), *params])
+        cursor = conn.execute(
+            f"UPDATE events SET is_reviewed = 1, is_visible = ? WHERE {where}",
+            [int(is_visible), *params])
+    return cursor.rowcount
+
+
+def apply_remembered_decisions(conn):
+    """
+    Apply the remembered decisions to all unreviewed events with a known
+    title. Returns the number of changed events.
+    """
+    with conn:
+        cursor = conn.execute(f"""
+            UPDATE events
+            SET is_reviewed = 1,
+                is_visible = (SELECT is_visible FROM review_decisions WHERE title_key = {TITLE_KEY_SQL})
+            WHERE is_reviewed = 0
+            AND {TITLE_KEY_SQL} IN (SELECT title_key FROM review_decisions)
+        """)
+    return cursor.rowcount
+
+
+def format_event(event_id, event):
+    return f"[{event_id:>6}] {event.start_date}  {event.summary}  ({event.location or '?'}, {event.source})"
+
+
+def interactive_review(conn, page_size, **filters):
+    """
+    Step through the queue one event at a time. Decisions are collected per
+    page and written in one transaction.
+    """
+    print("a = approve, h = hide, A/H = approve/hide and remember title, s = skip, q = quit")
+    after = None
+    while True:
+        page = pending_events(conn, page_size, after, **filters)
+        if not page:
+            print("Review queue is empty.")
+            return
+
+        decisions = {}  # (is_visible, remember) -> event ids
+        quit_review = False
+        for event_id, event in page:
+            answer = input(f"{format_event(event_id, event)} [a/h/A/H/s/q] ").strip()
+            if answer == 'q':
+                quit_review = True
+                break
+            if answer in ('a', 'h', 'A', 'H'):
+                key = (answer.lower() == 'a', answer.isupper())
+                decisions.setdefault(key, []).append(event_id)
+
+        for (is_visible, remember), ids in decisions.items():
+            review_events(conn, is_visible, remember, ids=ids)
+        if quit_review:
+            return
+        after = (page[-1][1].start_date, page[-1][0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Review newly scraped events.")
+    parser.add_argument("db_path", help="Path to the SQLite database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    filter_parser = argparse.ArgumentParser(add_help=False)
+    filter_parser.add_argument("--id", dest="ids", type=int, nargs="+", help="Event IDs")
+    filter_parser.add_argument("--source", help="Only events from this source, e.g. werder-havel.de")
+    filter_parser.add_argument("--from", dest="date_from", help="Only events starting on or after this date (YYYY-MM-DD)")
+    filter_parser.add_argument("--to", dest="date_to", help="Only events starting on or before this date (YYYY-MM-DD)")
+    filter_parser.add_argument("--pattern", help="Only events whose summary contains this text")
+
+    list_parser = subparsers.add_parser("list", parents=[filter_parser], help="Show unreviewed upcoming events")
+    list_parser.add_argument("-n", "--limit", type=int, default=50, help="Page size (default: 50)")
+    list_parser.add_argument("--after", help="Show the page after START_DATE:ID (printed at the end of each page)")
+
+    for command, help_text in (("approve", "Approve matching events (make them visible)"),
+                               ("hide", "Hide matching events")):
+        command_parser = subparsers.add_parser(command, parents=[filter_parser], help=help_text)
+        command_parser.add_argument("--remember", action="store_true", help="Apply the same decision to future events with these titles")
+        command_parser.add_argument("--include-reviewed", action="store_true", help="Also change events that were already reviewed")
+
+    subparsers.add_parser("apply", help="Apply remembered decisions to unreviewed events")
+
+    interactive_parser = subparsers.add_parser("interactive", parents=[filter_parser], help="Step through the review queue")
+    interactive_parser.add_argument("-n", "--limit", type=int, default=20, help="Page size (default: 20)")
+
+    args = parser.parse_args()
+    filters = {key: getattr(args, key, None) for key in ("ids", "source", "date_from", "date_to", "pattern")}
+
+    conn = create_database(args.db_path)
+    try:
+        if args.command == "list":
+            after = None
+            if args.after:
+                after_date, after_id = args.after.rsplit(":", 1)
+                after = (after_date, int(after_id))
+            page = pending_events(conn, args.limit, after, **filters)
+            for event_id, event in page:
+                print(format_event(event_id, event))
+            if len(page) == args.limit:
+                print(f"Next page: --after {page[-1][1].start_date}:{page[-1][0]}")
+        elif args.command in ("approve", "hide"):
+            count = review_events(conn, args.command == "approve", args.remember, args.include_reviewed, **filters)
+            print(f"{'Approved' if args.command == 'approve' else 'Hid'} {count} event(s)")
+        elif args.command == "apply":
+            print(f"Applied remembered decisions to {apply_remembered_decisions(conn)} event(s)")
+        elif args.command == "interactive":
+            interactive_review(conn, args.limit, **filters)
+    except (ValueError, sqlite3.Error) as e:
+        parser.error(str(e))
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Ranked full-text search over the events database.
+
+Uses the ``events_fts`` FTS5 index created by ``utils.create_database``.
+Umlauts and accents are folded by the index tokenizer; this module adds the
+German transliterations (``ae``/``oe``/``ue``, ``ss``/``ß``) to each query
+term, so e.g. 'Mueller', 'Müller' and 'muller' find the same events.
+"""
+import argparse
+import re
+import sqlite3
+import time
+from datetime import date
+
+from werder_events.event import Event, EVENT_COLUMNS
+from werder_events.utils import create_search_index
+
+TERM_RE = re.compile(r'\w+')
+
+# Column weights for bm25(): a match in the summary counts more than one in
+# the location, which counts more than one in the description.
+SUMMARY_WEIGHT = 10.0
+LOCATION_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+SEARCH_SQL = f"""
+    SELECT {', '.join('e.' + column for column in Event._fields)}
+    FROM events_fts
+    JOIN events e ON e.id = events_fts.rowid
+    WHERE events_fts MATCH ?
+    {{filters}}
+    ORDER BY bm25(events_fts, {SUMMARY_WEIGHT}, {LOCATION_WEIGHT}, {DESCRIPTION_WEIGHT})
+    LIMIT ?
+"""
+
+
+def term_variants(term):
+    """Return the spellings of a query term that should all be matched."""
+    term = term.lower()
+    variants = [term]
+    folded = term.replace('ae', 'a').replace('oe', 'o').replace('ue', 'u')
+    if 'ß' in term:
+        variants.append(term.replace('ß', 'ss'))
+    if 'ss' in folded:
+        variants.append(folded.replace('ss', 'ß'))
+    if folded != term:
+        variants.append(folded)
+    return variants
+
+
+def build_match_query(query):
+    """
+    Turn a free-text user query into an FTS5 MATCH expression. All terms must
+    match (as a prefix, so 'konzert' also finds 'Konzertabend'); each term
+    matches any of its spellings. Returns None if the query has no terms.
+    """
+    groups = []
+    for term in TERM_RE.findall(query):
+        variants = ' OR '.join(f'"{variant}"*' for variant in term_variants(term))
+        groups.append(f'({variants})')
+    return ' AND '.join(groups) or None
+
+
+def search_events(conn, query, limit=20, upcoming_only=False, visible_only=False):
+    """
+    Return up to ``limit`` events matching the query, best matches first.
+    """
+    match_query = build_match_query(query)
+    if match_query is None:
+        return []
+
+    filters = []
+    params = [match_query]
+    if upcoming_only:
+        filters.append("AND e.start_date >= ?")
+        params.append(date.today().isoformat())
+    if visible_only:
+        filters.append("AND e.is_visible = 1 AND e.is_cancelled = 0")
+    params.append(limit)
+
+    cursor = conn.execute(SEARCH_SQL.format(filters='\n    '.join(filters)), params)
+    return list(map(Event._make, cursor))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over the events in an SQLite database.")
+    parser.add_argument("db_path", help="Path to the SQLite database file")
+    parser.add_argument("query", help="Search terms, e.g. 'konzert kirche'")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="Maximum number of results (default: 20)")
+    parser.add_argument("--upcoming", action="store_true", help="Only return events that haven't started yet")
+    parser.add_argument("--visible", action="store_true", help="Only return events marked as visible")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    create_search_index(conn)
+
+    start = time.perf_counter()
+    events = search_events(conn, args.query, args.limit, args.upcoming, args.visible)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    conn.close()
+
+    for event in events:
+        print(f"{event.start_date}  {event.summary}  ({event.location}, {event.source})")
+    print(f"{len(events)} result(s) in {elapsed_ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
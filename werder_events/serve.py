@@ -0,0 +1,433 @@
+"""
+Read-only HTTP API over the events database.
+
+Endpoints (all GET, JSON responses, visible events only; cancelled events are left out):
+
+    /events     upcoming events, paginated. Parameters:
+                from, to (YYYY-MM-DD), district, source, category, q (full-text query),
+                bbox (min_lon,min_lat,max_lon,max_lat) or near (lat,lon) and
+                radius (km, default 5), limit (default 50, max 500), offset.
+                Events with a known venue (see geocode.py) have its coordinates.
+    /sources    all event sources
+    /categories the categories of the taxonomy (see categories.py), with labels
+    /districts  all Werder districts
+
+The server is a minimal asyncio HTTP/1.1 server with keep-alive. Queries run
+in a thread pool on a pool of read-only SQLite connections. Responses are
+kept in an in-process LRU cache keyed on the normalized request; the cache
+is cleared whenever the database changes (detected via ``PRAGMA
+data_version`` and the file's inode, since the nightly rebuild replaces the
+file) and when the day changes, since /events starts at today by default. Every response has an ETag, and ``If-None-Match`` requests for an
+unchanged response are answered with 304 Not Modified.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlsplit
+
+from werder_events.categories import TAXONOMY
+from werder_events.dates import parse_iso_date
+from werder_events.districts import WERDER_DISTRICTS, canonical_names, find_district
+from werder_events.event import Event
+from werder_events.feeds import event_to_dict
+from werder_events.geocode import bounding_box
+from werder_events.search import build_match_query
+from werder_events.utils import connect_read_only, setup_logger
+
+logger = logging.getLogger("serve")
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+MAX_HEADER_LINES = 100
+DEFAULT_RADIUS_KM = 5
+
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+@lru_cache(maxsize=4096)
+def district_of(location):
+    return find_district(location, WERDER_DISTRICTS)
+
+
+def connect_worker(db_path):
+    """A read-only connection for the worker threads."""
+    conn = connect_read_only(db_path, check_same_thread=False)
+    # The district of a location as in the per-district feeds (see feeds.py)
+    conn.create_function('district', 1, district_of, deterministic=True)
+    return conn
+
+
+class ConnectionPool:
+    """A fixed number of read-only connections, shared by the worker threads."""
+
+    def __init__(self, db_path, size):
+        self.connections = queue.SimpleQueue()
+        for _ in range(size):
+            self.connections.put(connect_worker(db_path))
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        conn = self.connections.get()
+        try:
+            yield conn
+        finally:
+            self.connections.put(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self.connections.get().close()
+
+
+class ResponseCache:
+    """LRU cache of ``(body, etag)`` tuples."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def parse_date_param(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        return parse_iso_date(value).isoformat()
+    except ValueError:
+        raise BadRequest(f"Invalid date for '{name}': {value!r}")
+
+
+def parse_int_param(params, name, default, maximum=None):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise BadRequest(f"Invalid number for '{name}': {value!r}")
+    if number < 0:
+        raise BadRequest(f"'{name}' must not be negative")
+    return min(number, maximum) if maximum else number
+
+
+def parse_floats_param(params, name, count):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        numbers = [float(number) for number in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(map(math.isfinite, numbers)):
+        raise BadRequest(f"'{name}' must be {count} comma-separated numbers: {value!r}")
+    return numbers
+
+
+def parse_area_params(params):
+    """Return the ``(min_lat, max_lat, min_lon, max_lon)`` of the bbox or near/radius parameters, or None."""
+    bbox = parse_floats_param(params, 'bbox', 4)
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return min_lat, max_lat, min_lon, max_lon
+    near = parse_floats_param(params, 'near', 2)
+    if near:
+        radius = parse_floats_param(params, 'radius', 1) or [DEFAULT_RADIUS_KM]
+        return bounding_box(*near, min(abs(radius[0]), 100))
+    return None
+
+
+def query_events(conn, params):
+    """Run an /events query and return the response object."""
+    clauses = ["e.is_visible = 1", "e.is_cancelled = 0", "e.start_date != 'unknown'", "e.start_date >= ?"]
+    args = [parse_date_param(params, 'from') or date.today().isoformat()]
+    join = ""
+
+    date_to = parse_date_param(params, 'to')
+    if date_to:
+        clauses.append("e.start_date <= ?")
+        args.append(date_to)
+    if params.get('source'):
+        clauses.append("e.source = ?")
+        args.append(params['source'])
+    if params.get('category'):
+        clauses.append("e.category = ?")
+        args.append(params['category'])
+    if params.get('district'):
+        district = canonical_names(WERDER_DISTRICTS).get(params['district'].lower())
+        if district is None:
+            raise BadRequest(f"Unknown district: {params['district']!r} (see /districts)")
+        clauses.append("district(e.location) = ?")
+        args.append(district)
+    if params.get('q'):
+        match_query = build_match_query(params['q'])
+        if match_query:
+            join = "JOIN events_fts ON events_fts.rowid = e.id"
+            clauses.append("events_fts MATCH ?")
+            args.append(match_query)
+    area = parse_area_params(params)
+    if area:
+        # The R*Tree finds the venues in the area, the events are joined via their location
+        clauses.append("""v.id IN (SELECT id FROM venue_rtree
+                                   WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?)""")
+        min_lat, max_lat, min_lon, max_lon = area
+        args += [min_lat, max_lat, min_lon, max_lon]
+
+    limit = parse_int_param(params, 'limit', DEFAULT_LIMIT, MAX_LIMIT)
+    offset = parse_int_param(params, 'offset', 0)
+    # Fetch one more row than requested to know whether there is a next page
+    cursor = conn.execute(f"""
+        SELECT {', '.join('e.' + column for column in Event._fields)}, e.category, v.venue_id, v.name, v.lat, v.lon
+        FROM events e {join}
+        LEFT JOIN location_cache lc ON lc.location = e.location
+        LEFT JOIN venues v ON v.venue_id = lc.venue_id
+        WHERE {' AND '.join(clauses)}
+        ORDER BY e.start_date, e.start_datetime, e.id
+        LIMIT ? OFFSET ?
+    """, [*args, limit + 1, offset])
+    events = [event_with_venue(row) for row in cursor]
+    return {
+        "events": events[:limit],
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(events) > limit else None,
+    }
+
+
+def event_with_venue(row):
+    event = event_to_dict(Event._make(row[:len(Event._fields)]))
+    event["category"], venue_id, name, lat, lon = row[len(Event._fields):]
+    event["venue"] = {"id": venue_id, "name": name, "lat": lat, "lon": lon} if venue_id else None
+    return event
+
+
+def query_sources(conn, params):
+    cursor = conn.execute("SELECT DISTINCT source FROM events WHERE is_visible = 1 AND is_cancelled = 0 ORDER BY source")
+    return {"sources": [row[0] for row in cursor]}
+
+
+def query_categories(conn, params):
+    return {"categories": [{"id": category, "label": label} for category, label in TAXONOMY.items()]}
+
+
+def query_districts(conn, params):
+    return {"districts": list(WERDER_DISTRICTS)}
+
+
+ROUTES = {
+    "/events": query_events,
+    "/sources": query_sources,
+    "/categories": query_categories,
+    "/districts": query_districts,
+}
+
+
+class EventsAPI:
+    """Maps requests to (cached) database queries."""
+
+    def __init__(self, db_path, pool_size=4, cache_size=1024):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.pool = ConnectionPool(db_path, pool_size)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.cache = ResponseCache(cache_size)
+        self.version_conn = connect_read_only(db_path)
+        self.version = self.current_version()
+        # The queries running on the current pool
+        self.queries = set()
+        self.retiring = set()
+
+    def current_version(self):
+        data_version = self.version_conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, os.stat(self.db_path).st_ino, date.today()
+
+    def check_version(self):
+        """
+        Clear the cache if the DB or the day changed (and reopen the
+        connections if the file was replaced).
+        """
+        version = self.current_version()
+        if version == self.version:
+            return
+        if version[1] != self.version[1]:
+            # New queries use new connections, the old pool is closed once
+            # the queries still running on it have finished
+            retire = asyncio.create_task(self.retire(self.pool, self.queries))
+            self.retiring.add(retire)
+            retire.add_done_callback(self.retiring.discard)
+            self.pool = ConnectionPool(self.db_path, self.pool_size)
+            self.queries = set()
+            self.version_conn.close()
+            self.version_conn = connect_read_only(self.db_path)
+            version = self.current_version()
+        self.version = version
+        self.cache.clear()
+
+    async def retire(self, pool, queries):
+        if queries:
+            await asyncio.wait(set(queries))
+        await asyncio.get_running_loop().run_in_executor(self.executor, pool.close)
+
+    def run_query(self, pool, handler, params):
+        with pool.connection() as conn:
+            result = handler(conn, params)
+        body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return body, etag
+
+    async def respond(self, method, target, headers):
+        """Return ``(status, body, etag)`` for a request."""
+        if method not in ("GET", "HEAD"):
+            return 405, b'{"error": "Method not allowed"}', None
+        url = urlsplit(target)
+        handler = ROUTES.get(url.path.rstrip('/') or '/')
+        if handler is None:
+            return 404, b'{"error": "Not found"}', None
+
+        params = dict(parse_qsl(url.query))
+        key = (url.path, tuple(sorted(params.items())))
+        loop = asyncio.get_running_loop()
+        self.check_version()
+        entry = self.cache.get(key)
+        if entry is None:
+            try:
+                version = self.version
+                query = loop.run_in_executor(self.executor, self.run_query, self.pool, handler, params)
+                self.queries.add(query)
+                query.add_done_callback(self.queries.discard)
+                entry = await query
+            except BadRequest as e:
+                return 400, json.dumps({"error": str(e)}).encode('utf-8'), None
+            # If the DB changed meanwhile (and the cache was cleared), the result may be stale
+            if self.version == version:
+                self.cache.put(key, entry)
+
+        body, etag = entry
+        if headers.get('if-none-match') == etag:
+            return 304, b'', etag
+        return 200, body, etag
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    status, body, etag = await self.respond(method, target, headers)
+                except Exception:
+                    logger.exception("Error handling %s %s", method, target)
+                    status, body, etag = 500, b'{"error": "Internal server error"}', None
+
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close')
+                response_headers = [
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+                    "Content-Type: application/json; charset=utf-8",
+                    f"Content-Length: {len(body)}",
+                    "Cache-Control: public, max-age=60",
+                    "Access-Control-Allow-Origin: *",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                if etag:
+                    response_headers.append(f"ETag: {etag}")
+                writer.write(('\r\n'.join(response_headers) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
+        self.version_conn.close()
+
+
+async def serve(db_path, host, port, pool_size, cache_size):
+    api = EventsAPI(db_path, pool_size, cache_size)
+    server = await asyncio.start_server(api.handle_connection, host, port)
+    logger.info(f"Serving events from {db_path} on http://{host}:{port}/")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the events database as a read-only JSON API.")
+    parser.add_argument("db_path", help="Path to the SQLite database file")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--pool-size", type=int, default=4, help="Number of read-only DB connections (default: 4)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Number of cached responses (default: 1024)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    setup_logger("serve", args.verbose)
+    try:
+        asyncio.run(serve(args.db_path, args.host, args.port, args.pool_size, args.cache_size))
+    except FileNotFoundError as e:
+        logger.error(e)
+        raise SystemExit(1)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
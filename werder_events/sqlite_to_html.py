@@ -1,93 +1,77 @@
+"""
+Render the event viewer page (a single HTML file) from the events database.
+
+The page is rendered with a Jinja2 template that is compiled once per
+process. The events are streamed from the DB cursor through the template
+straight into the output file, encoded to JSON in chunks of
+``JSON_CHUNK_SIZE`` events, so the memory use doesn't grow with the number
+of events.
+
+The page itself holds only the markup and the events (as a JSON data
+block) and is minified. The CSS and JavaScript are minified into separate
+files in ``assets/``, named after a hash of their content, so they only
+change (and need to be downloaded again) when the code changes, not every
+day with the events. See precompress.py for the ``.gz``/``.br`` siblings.
+"""
 import argparse
-import sqlite3
+import hashlib
 import json
-import html
-from datetime import datetime, date
+import os
+import re
+import sqlite3
+from datetime import date
+from functools import cache
+from itertools import chain, islice
 
-def get_events_from_db(db_path):
-    """
-    Fetch all events from the given SQLite database. Exclude past events
-    and events with unknown start date.
-    """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    today = date.today().isoformat()
-    cursor.execute("""
-        SELECT summary, start_date, end_date, location, description, event_type, source
-        FROM events
-        WHERE is_visible = 1
-        AND start_date != 'unknown'
-        AND start_date >= ?
-        ORDER BY start_date
-    """, (today,))
-    events = []
-    for row in cursor.fetchall():
-        try:
-            start_date = datetime.strptime(row[1], "%Y-%m-%d").date()
-            if start_date >= date.today():
-                events.append({
-                    "summary": row[0],
-                    "start": row[1],
-                    "end": row[2],
-                    "location": row[3],
-                    #"description": row[4], # TODO: Are event descriptions copyrighted?
-                    #"type": row[5],
-                    "source": row[6]
-                })
-        except ValueError:
-            # Skip events with invalid date format
-            continue
-    conn.close()
-    return events
-
-def generate_html(events):
-    events_json = json.dumps(events)
-    page_title = "Aktuelle Termine in Werder (Havel)"
-    page_url = "https://arne-cl.github.io/werder-events/"
-
-    # Prepare preview information for the first three events
-    preview_events = events[:3]
-    preview_text = "\n".join([f"{event['start']} {html.escape(event['summary'])}, {html.escape(event['location'] or '')}" for event in preview_events])
-
-    html_str = f"""
+from werder_events.categories import TAXONOMY
+
+PAGE_TITLE = "Aktuelle Termine in Werder (Havel)"
+PAGE_URL = "https://arne-cl.github.io/werder-events/"
+PREVIEW_EVENTS = 3
+# Events encoded to JSON at a time; bounds the memory use of the rendering
+JSON_CHUNK_SIZE = 1000
+JSON_ENCODER = json.JSONEncoder()
+# Like Jinja's tojson filter: keep '</script>' in a title from ending the script
+HTML_SAFE_JSON = str.maketrans({'<': '\\u003c', '>': '\\u003e', '&': '\\u0026', "'": '\\u0027'})
+ASSETS_DIR = 'assets'
+ASSET_HASH_LENGTH = 10
+
+# The fields of an event shown on the page, plus the coordinates of its
+# venue (if known, see geocode.py) for "near me". The category is replaced
+# by its label (see categories.py). Event descriptions and
+# types are left out.
+# TODO: Are event descriptions copyrighted?
+PAGE_EVENTS_SQL = """
+    SELECT e.summary, e.start_date AS start, e.end_date AS end, e.location, e.source, e.category, v.lat, v.lon
+    FROM events e
+    LEFT JOIN location_cache lc ON lc.location = e.location
+    LEFT JOIN venues v ON v.venue_id = lc.venue_id
+    WHERE e.is_visible = 1
+    AND e.is_cancelled = 0
+    AND e.start_date != 'unknown'
+    AND e.start_date >= ?
+    ORDER BY e.start_date, e.start_datetime, e.id
+"""
+
+PAGE_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="de">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{page_title}</title>
-    <meta property="og:title" content="{page_title}">
-    <meta property="og:description" content="{preview_text}">
+    <title>{{ title }}</title>
+    <meta property="og:title" content="{{ title }}">
+    <meta property="og:description" content="{{ preview }}">
     <meta property="og:type" content="website">
-    <meta property="og:url" content="{page_url}">
-    <style>
-        table {{
-            border-collapse: collapse;
-            width: 100%;
-        }}
-        th, td {{
-            border: 1px solid #ddd;
-            padding: 8px;
-            text-align: left;
-        }}
-        th {{
-            background-color: #f2f2f2;
-        }}
-        .sortable {{
-            cursor: pointer;
-        }}
-        .sortable:hover {{
-            background-color: #e6e6e6;
-        }}
-        .filter-input {{
-            width: 100%;
-            box-sizing: border-box;
-            margin-bottom: 5px;
-        }}
-    </style>
+    <meta property="og:url" content="{{ url }}">
+    <link rel="stylesheet" href="{{ assets['css'] }}">
 </head>
 <body>
-    <h1>{page_title}</h1>
+    <h1>{{ title }}</h1>
+    <p>
+        <button type="button" id="nearMe">Events near me</button>
+        <span id="nearMeStatus"></span>
+    </p>
     <table id="eventTable">
         <thead>
             <tr>
@@ -111,63 +95,244 @@ def generate_html(events):
                     Source
                     <input type="text" class="filter-input" data-column="source" placeholder="Filter source...">
                 </th>
+                <th class="sortable" data-sort="category">
+                    Category
+                    <input type="text" class="filter-input" data-column="category" placeholder="Filter category...">
+                </th>
             </tr>
         </thead>
         <tbody id="eventBody"></tbody>
     </table>
+    <script id="events" type="application/json">[
+{%- for chunk in event_chunks %}{% if not loop.first %},{% endif %}
+{{ chunk }}
+{%- endfor %}
+]</script>
+    <script src="{{ assets['js'] }}"></script>
+</body>
+</html>
+"""
 
-    <script>
-        const events = {events_json};
-        let filteredEvents = [...events];
-
-        function renderEvents() {{
-            const eventBody = document.getElementById('eventBody');
-            eventBody.innerHTML = '';
-            filteredEvents.forEach(event => {{
-                const row = document.createElement('tr');
-                row.innerHTML = `
-                    <td>${{event.summary}}</td>
-                    <td>${{event.start}}</td>
-                    <td>${{event.end}}</td>
-                    <td>${{event.location || ''}}</td>
-                    <td>${{event.source}}</td>
-                `;
-                eventBody.appendChild(row);
-            }});
-        }}
-
-        document.getElementById('eventTable').addEventListener('click', (e) => {{
-            if (e.target.classList.contains('sortable')) {{
-                const sortBy = e.target.dataset.sort;
-                filteredEvents.sort((a, b) => {{
-                    if (a[sortBy] < b[sortBy]) return -1;
-                    if (a[sortBy] > b[sortBy]) return 1;
-                    return 0;
-                }});
-                renderEvents();
-            }}
-        }});
-
-        document.querySelectorAll('.filter-input').forEach(input => {{
-            input.addEventListener('input', () => {{
-                const column = input.dataset.column;
-                const filterValue = input.value.toLowerCase();
-
-                filteredEvents = events.filter(event => {{
-                    const value = event[column];
-                    return value.toLowerCase().includes(filterValue);
-                }});
-
-                renderEvents();
-            }});
-        }});
+# The static assets change only with the code, so they are written to
+# files named after their content, which browsers can cache for good
+PAGE_CSS = """
+table {
+    border-collapse: collapse;
+    width: 100%;
+}
+th, td {
+    border: 1px solid #ddd;
+    padding: 8px;
+    text-align: left;
+}
+th {
+    background-color: #f2f2f2;
+}
+.sortable {
+    cursor: pointer;
+}
+.sortable:hover {
+    background-color: #e6e6e6;
+}
+.filter-input {
+    width: 100%;
+    box-sizing: border-box;
+    margin-bottom: 5px;
+}
+"""
 
+PAGE_JS = """
+// The events are embedded in the page as JSON, see PAGE_TEMPLATE
+const events = JSON.parse(document.getElementById('events').textContent);
+let filteredEvents = [...events];
+
+function renderEvents() {
+    const eventBody = document.getElementById('eventBody');
+    eventBody.innerHTML = '';
+    filteredEvents.forEach(event => {
+        const row = document.createElement('tr');
+        row.innerHTML = `
+            <td>${event.summary}</td>
+            <td>${event.start}</td>
+            <td>${event.end}</td>
+            <td>${event.location || ''}</td>
+            <td>${event.source}</td>
+            <td>${event.category}</td>
+        `;
+        eventBody.appendChild(row);
+    });
+}
+
+document.getElementById('eventTable').addEventListener('click', (e) => {
+    if (e.target.classList.contains('sortable')) {
+        const sortBy = e.target.dataset.sort;
+        filteredEvents.sort((a, b) => {
+            if (a[sortBy] < b[sortBy]) return -1;
+            if (a[sortBy] > b[sortBy]) return 1;
+            return 0;
+        });
         renderEvents();
-    </script>
-</body>
-</html>
+    }
+});
+
+document.querySelectorAll('.filter-input').forEach(input => {
+    input.addEventListener('input', () => {
+        const column = input.dataset.column;
+        const filterValue = input.value.toLowerCase();
+
+        filteredEvents = events.filter(event => {
+            const value = event[column];
+            return (value || '').toLowerCase().includes(filterValue);
+        });
+
+        renderEvents();
+    });
+});
+
+// Events within NEAR_ME_KM of the visitor, nearest first
+const NEAR_ME_KM = 5;
+
+function distanceKm(lat1, lon1, lat2, lon2) {
+    const rad = Math.PI / 180;
+    const x = (lon2 - lon1) * rad * Math.cos((lat1 + lat2) / 2 * rad);
+    const y = (lat2 - lat1) * rad;
+    return Math.sqrt(x * x + y * y) * 6371;
+}
+
+document.getElementById('nearMe').addEventListener('click', () => {
+    const status = document.getElementById('nearMeStatus');
+    if (!navigator.geolocation) {
+        status.textContent = 'Location not available';
+        return;
+    }
+    navigator.geolocation.getCurrentPosition(position => {
+        const {latitude, longitude} = position.coords;
+        filteredEvents = events
+            .filter(event => event.lat !== null)
+            .map(event => [distanceKm(latitude, longitude, event.lat, event.lon), event])
+            .filter(([distance]) => distance <= NEAR_ME_KM)
+            .sort((a, b) => a[0] - b[0])
+            .map(([, event]) => event);
+        status.textContent = `${filteredEvents.length} events within ${NEAR_ME_KM} km`;
+        renderEvents();
+    }, () => {
+        status.textContent = 'Location not available';
+    });
+});
+
+renderEvents();
+"""
+
+
+def minify_html(html):
+    """Drop the indentation and the whitespace between tags."""
+    return re.sub(r'>\s+<', '><', re.sub(r'\n\s*', '\n', html.strip()))
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{}:;,>])\s*', r'\1', css).replace(';}', '}').strip()
+
+
+def minify_js(js):
     """
-    return html_str
+    Conservative: drop comment lines, indentation and blank lines, but keep
+    the line breaks (so automatic semicolon insertion still works).
+    """
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+@cache
+def get_assets():
+    """Return a dict mapping the asset types to their file name (in ``assets/``) and content."""
+    assets = {}
+    for kind, content in (('css', minify_css(PAGE_CSS)), ('js', minify_js(PAGE_JS))):
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:ASSET_HASH_LENGTH]
+        assets[kind] = (f"app.{digest}.{kind}", content)
+    return assets
+
+
+def write_assets(output_dir):
+    """
+    Write the static assets to ``output_dir``/assets unless they exist.
+    Returns a dict mapping the asset types to their URL relative to the page.
+    """
+    urls = {}
+    directory = os.path.join(output_dir, ASSETS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    for kind, (filename, content) in get_assets().items():
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+        urls[kind] = f"{ASSETS_DIR}/{filename}"
+    return urls
+
+
+@cache
+def get_template():
+    """The compiled (and minified) page template (compiled on first use)."""
+    # Imported here, the modules that only need the constants start faster
+    import jinja2
+
+    environment = jinja2.Environment(autoescape=True, keep_trailing_newline=True)
+    return environment.from_string(minify_html(PAGE_TEMPLATE) + "\n")
+
+
+def iter_page_events(conn, today=None):
+    """
+    Yield the visible upcoming events shown on the page as dicts, in date
+    order. Past events and events with unknown start date are left out by
+    the query.
+    """
+    cursor = conn.execute(PAGE_EVENTS_SQL, ((today or date.today()).isoformat(),))
+    columns = [column[0] for column in cursor.description]
+    for row in cursor:
+        event = dict(zip(columns, row))
+        event['category'] = TAXONOMY.get(event['category'], '')
+        yield event
+
+
+def iter_json_chunks(events, size=JSON_CHUNK_SIZE):
+    """Yield the events as HTML-safe JSON objects, one per line, in chunks of ``size`` events."""
+    from markupsafe import Markup
+
+    while chunk := list(islice(events, size)):
+        yield Markup(",\n".join(map(JSON_ENCODER.encode, chunk)).translate(HTML_SAFE_JSON))
+
+
+def render_page(conn, file, assets, today=None, title=PAGE_TITLE, url=PAGE_URL):
+    """
+    Stream the page to the (text) file object ``file``. ``assets`` are the
+    asset URLs returned by ``write_assets``.
+    """
+    events = iter_page_events(conn, today)
+    # The preview in the page header needs the first events up front
+    preview_events = list(islice(events, PREVIEW_EVENTS))
+    preview = "\n".join(f"{event['start']} {event['summary']}, {event['location'] or ''}" for event in preview_events)
+    get_template().stream(
+        title=title,
+        url=url,
+        preview=preview,
+        assets=assets,
+        event_chunks=iter_json_chunks(chain(preview_events, events)),
+    ).dump(file)
+
+
+def write_html(conn, output, today=None, title=PAGE_TITLE, url=PAGE_URL):
+    """
+    Render the page to a temporary file next to ``output`` and swap it in.
+    The assets are written to the ``assets/`` directory next to the page.
+    """
+    assets = write_assets(os.path.dirname(output) or '.')
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        render_page(conn, f, assets, today, title, url)
+    os.replace(tmp_path, output)
+
 
 def main():
     parser = argparse.ArgumentParser(description="Generate an HTML event viewer from an SQLite database.")
@@ -175,11 +340,11 @@ def main():
     parser.add_argument("-o", "--output", default="event_viewer.html", help="Output HTML file name (default: event_viewer.html)")
     args = parser.parse_args()
 
-    events = get_events_from_db(args.db_path)
-    html_content = generate_html(events)
-
-    with open(args.output, "w", encoding="utf-8") as f:
-        f.write(html_content)
+    conn = sqlite3.connect(args.db_path)
+    try:
+        write_html(conn, args.output)
+    finally:
+        conn.close()
 
     print(f"HTML event viewer has been generated: {args.output}")
 
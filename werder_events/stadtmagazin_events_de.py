@@ -1,103 +1,177 @@
+"""
+Scraper for the event search API of stadtmagazin-events.de.
+
+The API returns a page of results as JSON, each with the title and a snippet
+of HTML. Each snippet is scanned once from left to right with ``str.find``
+for the date, the location link and the description; this is much faster
+than building a parse tree for every result.
+"""
 import json
+import re
 import sqlite3
-from datetime import datetime, date
-import hashlib
 import logging
+from datetime import timedelta
+from html import unescape
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
 import requests
-from werder_events.utils import create_database, setup_logger
+from werder_events.dates import parse_german_date, parse_time_range, to_timestamp
+from werder_events.event import Event, make_event_key
+from werder_events.fetch import fetch
+from werder_events.presence import update_presence
+from werder_events.utils import create_database, setup_logger, upsert_events
 
-def parse_events(input_source, logger):
-    logger.info(f"Parsing events from {input_source}")
-    if input_source.startswith(('http://', 'https://')):
-        logger.debug("Fetching data from URL")
-        response = requests.get(input_source)
-        data = response.json()
-    else:
-        logger.debug("Reading data from local file")
-        with open(input_source, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    
+SOURCE = 'stadtmagazin-events.de'
+MAX_PAGES = 20
+
+DATE_START = '<p class="event_date">'
+LOCATION_LINK = '/locations/'
+CATS_START = '<p class="cats">'
+DESCRIPTION_START = '<p class="description">'
+MORE_LINK = 'class="more_link"'
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def html_text(fragment):
+    if '<' in fragment:
+        fragment = TAG_RE.sub('', fragment)
+    return unescape(fragment) if '&' in fragment else fragment
+
+
+def parse_description(fragment):
+    """The text of the description up to the ' / Mehr anzeigen' link."""
+    link = fragment.find(MORE_LINK)
+    if link != -1:
+        fragment = fragment[:max(fragment.rfind('<a', 0, link), 0)]
+    return html_text(fragment).strip().removesuffix('/').rstrip()
+
+
+def parse_result(result):
+    """Parse one search result into an Event."""
+    html = result['html']
+    date_start = html.find(DATE_START)
+    if date_start == -1:
+        raise ValueError(f"No event date in result {result['title']!r}")
+    date_start += len(DATE_START)
+    position = html.index('</p>', date_start)
+    date_str = html[date_start:position].strip()  # e.g. '31.08.2024 18:00 - 21:00'
+
+    location = ''
+    link = html.find(LOCATION_LINK, position)
+    if link != -1:
+        text_start = html.index('>', link) + 1
+        position = html.index('</a>', text_start)
+        location = html_text(html[text_start:position]).strip()
+
+    # The categories of the site, e.g. 'Führung, Täglich' (see categories.py)
+    source_categories = None
+    cats_start = html.find(CATS_START, position)
+    if cats_start != -1:
+        cats_start += len(CATS_START)
+        position = html.index('</p>', cats_start)
+        source_categories = html_text(html[cats_start:position]).strip() or None
+
+    description = ''
+    description_start = html.find(DESCRIPTION_START, position)
+    if description_start != -1:
+        description_start += len(DESCRIPTION_START)
+        description = parse_description(html[description_start:html.index('</p>', description_start)])
+
+    start = parse_german_date(date_str[:10])
+    start_time, end_time = parse_time_range(date_str[10:])
+    end = start
+    if end_time and start_time and end_time < start_time:
+        # Ends after midnight, e.g. '20:00 - 03:00'
+        end = start + timedelta(days=1)
+
+    title = result['title']
+    start_datetime = to_timestamp(start, start_time)
+    return Event(
+        summary=title,
+        start_date=start.isoformat(),
+        end_date=end.isoformat(),
+        start_datetime=start_datetime,
+        end_datetime=to_timestamp(end, end_time),
+        location=location,
+        description=description,
+        event_type='Single Day' if start == end else 'Multi-Day',
+        source=SOURCE,
+        event_key=make_event_key(title, start.isoformat(), SOURCE),
+        source_categories=source_categories,
+    )
+
+
+def parse_results(data, logger):
+    """Parse the events from the decoded JSON response of the search API."""
     events = []
     for result in data['results']:
-        event = {}
-        event['title'] = result['title']
-        event['link'] = f"https://www.stadtmagazin-events.de{result['html'].split('href=\"')[1].split('"')[0]}"
-        
-        location_html = result['html'].split('<div class="event_info">')[1].split('</div>')[0]
-        location_parts = location_html.split('<a href="')
-        if len(location_parts) > 1:
-            event['location'] = location_parts[1].split('">')[1].split('</a>')[0]
-        else:
-            event['location'] = "Unknown"
-        
-        date_time = result['html'].split('<p class="event_date">')[1].split('</p>')[0].split(' ')
-        event['date'] = date_time[0]
-        event['start_time'] = date_time[1]
-        event['end_time'] = date_time[3] if len(date_time) > 3 else None
-        
-        event['description'] = result['html'].split('<p class="description">')[1].split('</p>')[0].strip()
-        event['type'] = result['html'].split('<p class="cats">')[1].split('</p>')[0]
-        
-        # Parse date and time
-        event['start'] = datetime.strptime(event['date'], "%d.%m.%Y").date()
-        
-        events.append(event)
-    
+        try:
+            events.append(parse_result(result))
+        except ValueError as e:
+            # A malformed listing only skips this event
+            logger.warning(f"Skipping a result: {e}")
     logger.info(f"Parsed {len(events)} events")
     return events
 
-def insert_event(conn, event, logger):
-    cursor = conn.cursor()
-    event_hash = hashlib.md5(f"{event['title']}{event['start']}".encode()).hexdigest()
-    
-    start_date = event['start'].isoformat()
-    end_date = start_date
-    
-    cursor.execute('''
-    INSERT OR IGNORE INTO events 
-    (summary, start_date, end_date, location, description, event_type, source, event_hash, is_reviewed, is_visible)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        event['title'],
-        start_date,
-        end_date,
-        event['location'],
-        event['description'],
-        event['type'],
-        'stadtmagazin-events.de',
-        event_hash,
-        False,
-        False
-    ))
-    inserted = cursor.rowcount > 0
-    conn.commit()
-    logger.debug(f"Event {'inserted' if inserted else 'already exists'}: {event['title']}")
-    return inserted
-
-def main(input_source, output_db, verbose):
+
+def page_url(url, page):
+    """Return the URL with its ``page`` query parameter set to ``page``."""
+    parts = urlsplit(url)
+    params = dict(parse_qsl(parts.query, keep_blank_values=True))
+    params['page'] = str(page)
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
+def fetch_results(url, logger, max_pages=MAX_PAGES):
+    """Yield the decoded JSON responses of all result pages, starting at the page in ``url``."""
+    page = int(dict(parse_qsl(urlsplit(url).query)).get('page', 1))
+    for _ in range(max_pages):
+        logger.debug(f"Fetching result page {page}")
+        data = fetch(page_url(url, page)).json()
+        yield data
+        if not data.get('more') or not data['results']:
+            return
+        page += 1
+    logger.warning(f"Stopped after {max_pages} result pages")
+
+
+def parse_events(input_source, logger, max_pages=MAX_PAGES):
+    logger.info(f"Parsing events from {input_source}")
+    if input_source.startswith(('http://', 'https://')):
+        logger.debug("Fetching data from URL")
+        events = []
+        for data in fetch_results(input_source, logger, max_pages):
+            events.extend(parse_results(data, logger))
+        return events
+
+    logger.debug("Reading data from local file")
+    with open(input_source, 'r', encoding='utf-8') as f:
+        return parse_results(json.load(f), logger)
+
+
+def main(input_source, output_db, max_pages, verbose):
     logger = setup_logger("stadtmagazin-events.de scraper", verbose)
     conn = None
     try:
         logger.info("Starting event extraction and database insertion")
-        events = parse_events(input_source, logger)
-        
+        events = parse_events(input_source, logger, max_pages)
+
         conn = create_database(output_db, logger)
-        
-        inserted_count = 0
-        for event in events:
-            if insert_event(conn, event, logger):
-                inserted_count += 1
+
+        # New events are inserted, changed times, locations and descriptions updated
+        changed_count = upsert_events(conn, events)
+        update_presence(conn, SOURCE, [event.event_key for event in events], logger)
 
         cursor = conn.cursor()
         cursor.execute('SELECT COUNT(*) FROM events')
         total_events = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(*) FROM events WHERE source = ?', ('stadtmagazin-events.de',))
+        cursor.execute('SELECT COUNT(*) FROM events WHERE source = ?', (SOURCE,))
         source_events = cursor.fetchone()[0]
-        
+
         logger.info(f"Events from {input_source} have been successfully imported into {output_db}")
         logger.info(f"Total events in database: {total_events}")
         logger.info(f"Total events from this source: {source_events}")
-        logger.info(f"New events added in this run: {inserted_count}")
+        logger.info(f"New or changed events in this run: {changed_count}")
     except json.JSONDecodeError as e:
         logger.error(f"Error parsing JSON data: {e}")
     except requests.exceptions.RequestException as e:
@@ -114,9 +188,10 @@ def main(input_source, output_db, verbose):
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='Extract events from stadtmagazin-events.de and add to SQLite database.')
-    parser.add_argument('input', help='Input JSON file or URL')
+    parser.add_argument('input', help='Input JSON file or search API URL')
     parser.add_argument('output', help='Output SQLite database file')
+    parser.add_argument('--max-pages', type=int, default=MAX_PAGES, help=f'Maximum number of result pages to fetch (default: {MAX_PAGES})')
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
     args = parser.parse_args()
 
-    main(args.input, args.output, args.verbose)
+    main(args.input, args.output, args.max_pages, args.verbose)
@@ -0,0 +1,299 @@
+"""
+Event statistics for the monthly reports, and a columnar export.
+
+The aggregates are computed in SQLite: events per month and source, per
+district, per category, the overlap between the sources (the same title on
+the same day published by several sources) and the freshness of every
+source (last scrape, upcoming events, events missing from the last run, see
+presence.py). With ``--archive`` the archive database (see archive.py) is
+attached, so that the statistics cover all years:
+
+    python -m werder_events.stats events.sqlite --archive events-archive.sqlite --since 2024-01-01
+    python -m werder_events.stats events.sqlite --json > stats.json
+
+``--export`` streams the events (with their district) in record batches to
+a Parquet (``.parquet``) or Arrow IPC (``.arrow``, ``.feather``) file, for
+notebooks (pandas, polars, DuckDB). It needs the optional ``pyarrow``
+package (``pip install .[arrow]``).
+
+    python -m werder_events.stats events.sqlite --archive events-archive.sqlite --export events.parquet
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+from werder_events import presence
+from werder_events.categories import TAXONOMY, categorize
+from werder_events.districts import find_district
+from werder_events.event import normalize_title
+from werder_events.geocode import ALL_DISTRICTS
+from werder_events.utils import connect_read_only, read_only_uri, setup_logger
+
+# Rows per record batch of the export
+BATCH_SIZE = 50_000
+
+STATS_COLUMNS = ('summary', 'start_date', 'end_date', 'start_datetime', 'end_datetime', 'location', 'description',
+                 'event_type', 'source', 'event_key', 'is_reviewed', 'is_visible', 'is_cancelled', 'category',
+                 'source_categories')
+
+# Events of the period: the defaults include all ISO dates, but not 'unknown'
+PERIOD_WHERE = "start_date BETWEEN :since AND :until"
+
+
+@lru_cache(maxsize=4096)
+def district_of(location):
+    return find_district(location, ALL_DISTRICTS) or ''
+
+
+def select_columns(conn, schema):
+    """The STATS_COLUMNS of ``schema``.events, NULL for columns missing in an older (read-only) database."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(events)")}
+
+    def column_sql(column):
+        return column if column in existing else 'NULL'
+
+    columns = {column: f"{column_sql(column)} AS {column}" for column in STATS_COLUMNS}
+    # Events without a category (e.g. archived before the archive kept it)
+    # are categorized on the fly, the databases are read-only
+    columns['category'] = (f"coalesce({column_sql('category')}, categorize(summary, description, event_type, "
+                           f"{column_sql('source_categories')})) AS category")
+    return ', '.join(columns.values())
+
+
+def open_stats(db_path, archive_path=None):
+    """
+    Open the database (and the archive) read-only for the statistics: the
+    ``all_events`` view holds the events of the database and of the
+    archive, ``district(location)`` and ``title(summary)`` are available as
+    SQL functions. Raises FileNotFoundError if a database doesn't exist.
+    """
+    conn = connect_read_only(db_path)
+    schemas = ['main']
+    if archive_path:
+        conn.execute("ATTACH DATABASE ? AS archive", (read_only_uri(archive_path),))
+        schemas.append('archive')
+    selects = [f"SELECT {select_columns(conn, schema)} FROM {schema}.events" for schema in schemas]
+    conn.execute(f"CREATE TEMP VIEW all_events AS {' UNION ALL '.join(selects)}")
+    conn.create_function('categorize', 4, categorize, deterministic=True)
+    conn.create_function('district', 1, district_of, deterministic=True)
+    conn.create_function('title', 1, normalize_title, deterministic=True)
+    return conn
+
+
+def period(since=None, until=None):
+    return {'since': since or '0000', 'until': until or '9999'}
+
+
+def events_per_month(conn, since=None, until=None):
+    """``(month, source, events)`` rows, e.g. ``('2024-08', 'werder-havel.de', 120)``."""
+    return conn.execute(f'''
+        SELECT substr(start_date, 1, 7) AS month, source, count(*) FROM all_events
+        WHERE {PERIOD_WHERE} GROUP BY month, source ORDER BY month, source
+    ''', period(since, until)).fetchall()
+
+
+def events_per_district(conn, since=None, until=None):
+    """``(district, events)`` rows, '' for events without a known district."""
+    # Grouped by location first, so the district is looked up once per location
+    return conn.execute(f'''
+        SELECT district(location) AS d, sum(n) AS total FROM (
+            SELECT location, count(*) AS n FROM all_events WHERE {PERIOD_WHERE} GROUP BY location
+        ) GROUP BY d ORDER BY total DESC, d
+    ''', period(since, until)).fetchall()
+
+
+def events_per_category(conn, since=None, until=None):
+    """``(category, label, events)`` rows, '' for uncategorized events."""
+    rows = conn.execute(f'''
+        SELECT coalesce(category, '') AS c, count(*) AS total FROM all_events
+        WHERE {PERIOD_WHERE} GROUP BY c ORDER BY total DESC, c
+    ''', period(since, until)).fetchall()
+    return [(category, TAXONOMY.get(category, ''), count) for category, count in rows]
+
+
+def source_overlap(conn, since=None, until=None):
+    """
+    ``(sources, events)`` rows: the number of events (title and day)
+    published by exactly these sources, for every combination of two or
+    more sources.
+    """
+    overlap = Counter()
+    for (sources,) in conn.execute(f'''
+        SELECT group_concat(DISTINCT source) FROM all_events
+        WHERE {PERIOD_WHERE} GROUP BY start_date, title(summary) HAVING count(DISTINCT source) > 1
+    ''', period(since, until)):
+        overlap[tuple(sorted(sources.split(',')))] += 1
+    return overlap.most_common()
+
+
+def freshness(conn, today=None, now=None):
+    """
+    ``(source, last_run, hours_since_run, upcoming, missing, cancelled,
+    last_start_date)`` rows for the sources of the working database.
+    """
+    today = today or date.today()
+    now = now or datetime.now(timezone.utc)
+    upcoming = {source: (count, last_start) for source, count, last_start in conn.execute('''
+        SELECT source, sum(start_date >= :today), max(start_date) FROM main.events
+        WHERE start_date BETWEEN '0000' AND '9999' GROUP BY source
+    ''', {'today': today.isoformat()})}
+    rows = []
+    for source, last_run, _, missing, cancelled in presence.report(conn, today):
+        hours = (now - datetime.fromisoformat(last_run).astimezone(timezone.utc)).total_seconds() / 3600
+        count, last_start = upcoming.pop(source, (0, None))
+        rows.append((source, last_run, round(hours, 1), count, missing, cancelled, last_start))
+    # Sources without presence tracking
+    rows.extend((source, None, None, count, None, None, last_start)
+                for source, (count, last_start) in sorted(upcoming.items()))
+    return rows
+
+
+def collect_stats(conn, since=None, until=None, today=None):
+    return {
+        'per_month': events_per_month(conn, since, until),
+        'per_district': events_per_district(conn, since, until),
+        'per_category': events_per_category(conn, since, until),
+        'source_overlap': [(list(sources), count) for sources, count in source_overlap(conn, since, until)],
+        'freshness': freshness(conn, today),
+    }
+
+
+def parse_or_none(parse, value):
+    try:
+        return parse(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def arrow_schema(pa):
+    return pa.schema([
+        ('summary', pa.string()),
+        ('start_date', pa.date32()),
+        ('end_date', pa.date32()),
+        ('start_datetime', pa.timestamp('s')),
+        ('end_datetime', pa.timestamp('s')),
+        ('location', pa.string()),
+        ('description', pa.string()),
+        ('event_type', pa.string()),
+        ('source', pa.string()),
+        ('event_key', pa.int64()),
+        ('is_reviewed', pa.bool_()),
+        ('is_visible', pa.bool_()),
+        ('is_cancelled', pa.bool_()),
+        ('category', pa.string()),
+        ('source_categories', pa.string()),
+        ('district', pa.string()),
+    ])
+
+
+def iter_record_batches(conn, schema, since=None, until=None, batch_size=BATCH_SIZE):
+    """Yield the events of the period as Arrow record batches of ``batch_size`` rows."""
+    import pyarrow as pa
+
+    converters = {
+        'start_date': date.fromisoformat, 'end_date': date.fromisoformat,
+        'start_datetime': datetime.fromisoformat, 'end_datetime': datetime.fromisoformat,
+    }
+    cursor = conn.execute(f"SELECT {', '.join(STATS_COLUMNS)}, district(location) FROM all_events "
+                          f"WHERE {PERIOD_WHERE}", period(since, until))
+    while rows := cursor.fetchmany(batch_size):
+        arrays = []
+        for field, values in zip(schema, zip(*rows)):
+            convert = converters.get(field.name)
+            if convert:
+                values = [parse_or_none(convert, value) for value in values]
+            elif pa.types.is_boolean(field.type):
+                values = [None if value is None else bool(value) for value in values]
+            arrays.append(pa.array(values, field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_events(conn, path, since=None, until=None, batch_size=BATCH_SIZE):
+    """
+    Stream the events of the period to a Parquet or Arrow IPC file (by the
+    extension of ``path``). Returns the number of exported events.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise SystemExit("The export needs pyarrow: pip install .[arrow]") from None
+
+    schema = arrow_schema(pa)
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(f"{path}.tmp", schema, compression='zstd')
+    elif path.endswith(('.arrow', '.feather', '.ipc')):
+        writer = pa.ipc.new_file(f"{path}.tmp", schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+    else:
+        raise SystemExit(f"Unknown export format: {path} (use .parquet or .arrow)")
+    exported = 0
+    with writer:
+        for batch in iter_record_batches(conn, schema, since, until, batch_size):
+            writer.write_batch(batch)
+            exported += batch.num_rows
+    os.replace(f"{path}.tmp", path)
+    return exported
+
+
+def print_stats(stats):
+    print("Events per month and source")
+    for month, source, count in stats['per_month']:
+        print(f"  {month}  {source:30} {count:7}")
+    print("Events per district")
+    for district, count in stats['per_district']:
+        print(f"  {district or '(unknown)':30} {count:7}")
+    print("Events per category")
+    for category, label, count in stats['per_category']:
+        print(f"  {label or '(uncategorized)':30} {count:7}")
+    print("Events published by several sources")
+    for sources, count in stats['source_overlap']:
+        print(f"  {' + '.join(sources):60} {count:7}")
+    print("Freshness")
+    for source, last_run, hours, upcoming, missing, cancelled, last_start in stats['freshness']:
+        run = f"last run {last_run} ({hours} h ago)" if last_run else "no runs recorded"
+        print(f"  {source:30} {run}, {upcoming} upcoming events until {last_start}"
+              + (f", {missing} missing from the last run, {cancelled} cancelled" if last_run else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event statistics per month, source, district and category.")
+    parser.add_argument("db_path", help="Path to the SQLite database file")
+    parser.add_argument("--archive", help="Include the events of this archive database")
+    parser.add_argument("--since", help="Only events starting on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Only events starting on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+    parser.add_argument("--export", metavar="PATH",
+                        help="Export the events to a Parquet (.parquet) or Arrow (.arrow) file instead")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Rows per record batch of the export (default: {BATCH_SIZE})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    logger = setup_logger("stats", args.verbose)
+    try:
+        conn = open_stats(args.db_path, args.archive)
+    except FileNotFoundError as e:
+        logger.error(e)
+        raise SystemExit(1)
+    try:
+        start = time.perf_counter()
+        if args.export:
+            exported = export_events(conn, args.export, args.since, args.until, args.batch_size)
+            logger.info(f"Exported {exported} events to {args.export} in {time.perf_counter() - start:.2f} s")
+            return
+        stats = collect_stats(conn, args.since, args.until)
+        logger.debug(f"Computed the statistics in {time.perf_counter() - start:.2f} s")
+        if args.json:
+            print(json.dumps(stats, ensure_ascii=False, indent=1))
+        else:
+            print_stats(stats)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
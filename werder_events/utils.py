@@ -1,5 +1,10 @@
 import logging
+import os
 import sqlite3
+from urllib.request import pathname2url
+
+from werder_events.event import Event, EVENT_COLUMNS
+from werder_events.validate import filter_valid
 
 
 def setup_logger(name, verbose):
@@ -12,6 +17,22 @@ def setup_logger(name, verbose):
     return logger
 
 
+def read_only_uri(db_path):
+    """The URI to open (or ATTACH) an existing database read-only; FileNotFoundError if it is missing."""
+    if not os.path.isfile(db_path):
+        raise FileNotFoundError(f"No such database: {db_path}")
+    return f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+
+
+def connect_read_only(db_path, check_same_thread=True):
+    """
+    Open an existing database read-only. Unlike ``sqlite3.connect``, a
+    missing (e.g. mistyped) path raises FileNotFoundError instead of
+    creating an empty database. ``check_same_thread`` as in sqlite3.connect
+    (False for connections shared by worker threads).
+    """
+    return sqlite3.connect(read_only_uri(db_path), uri=True, check_same_thread=check_same_thread)
+
 
 def create_database(db_path, logger=None):
     if logger:
@@ -25,17 +46,254 @@ def create_database(db_path, logger=None):
         summary TEXT,
         start_date TEXT,
         end_date TEXT,
+        start_datetime TEXT,
+        end_datetime TEXT,
         location TEXT,
         description TEXT,
         event_type TEXT,
         source TEXT,
-        event_hash TEXT UNIQUE,
+        event_key INTEGER NOT NULL UNIQUE,
         is_reviewed BOOLEAN DEFAULT 0,
-        is_visible BOOLEAN DEFAULT 0
+        is_visible BOOLEAN DEFAULT 0,
+        is_cancelled INTEGER DEFAULT 0,
+        category TEXT,
+        source_categories TEXT
+    )
+    ''')
+    # Visible upcoming events in date order (page, feeds, API); the rowid
+    # is implicitly the last index column, so ORDER BY ..., id is covered too
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_visible ON events (is_visible, start_date, start_datetime)')
+    # Upcoming events of a category (see categories.py)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_category ON events (category, is_visible, start_date)')
+    # Events of a source in date order (statistics and freshness, see stats.py)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_source ON events (source, start_date)')
+    # Review queue: unreviewed upcoming events, in date order
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_review ON events (is_reviewed, start_date)')
+    # Remembered review decisions for recurring event titles
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS review_decisions (
+        title_key TEXT PRIMARY KEY,
+        is_visible INTEGER NOT NULL,
+        decided_at TEXT
+    )
+    ''')
+    # Newly inserted events with a remembered title are reviewed right away,
+    # unless they come back from the quarantine with their own review flags
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS events_apply_review_decision AFTER INSERT ON events
+    WHEN new.is_reviewed = 0
+    AND EXISTS (SELECT 1 FROM review_decisions WHERE title_key = lower(trim(new.summary)))
+    AND NOT EXISTS (SELECT 1 FROM quarantine WHERE event_key = new.event_key AND is_reviewed = 1)
+    BEGIN
+        UPDATE events
+        SET is_reviewed = 1,
+            is_visible = (SELECT is_visible FROM review_decisions WHERE title_key = lower(trim(new.summary)))
+        WHERE id = new.id;
+    END
+    ''')
+    # Keys of events moved to the archive DB, so that they aren't
+    # inserted again if a source still publishes them
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS archived_keys (
+        event_key INTEGER PRIMARY KEY
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS events_skip_archived BEFORE INSERT ON events
+    WHEN EXISTS (SELECT 1 FROM archived_keys WHERE event_key = new.event_key)
+    BEGIN
+        SELECT RAISE(IGNORE);
+    END
+    ''')
+    # Fingerprints of the event boxes of a page at the last run, to only
+    # parse boxes that changed (see werder_havel_de.update_events)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS box_fingerprints (
+        source TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        event_key INTEGER NOT NULL,
+        PRIMARY KEY (source, fingerprint)
+    ) WITHOUT ROWID
+    ''')
+    # How many runs in a row each event was missing from its source, and
+    # when each source was scraped (see presence.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS event_presence (
+        event_key INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        missed_runs INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS source_runs (
+        source TEXT NOT NULL,
+        run_at TEXT NOT NULL,
+        event_count INTEGER,
+        PRIMARY KEY (source, run_at)
+    ) WITHOUT ROWID
+    ''')
+    # Venues with coordinates, the R*Tree index over them, and the venue of
+    # every location string seen so far (NULL if unknown), see geocode.py
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS venues (
+        id INTEGER PRIMARY KEY,
+        venue_id TEXT NOT NULL UNIQUE,
+        name TEXT,
+        lat REAL NOT NULL,
+        lon REAL NOT NULL
     )
     ''')
+    cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS venue_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS location_cache (
+        location TEXT PRIMARY KEY,
+        venue_id TEXT,
+        gazetteer TEXT NOT NULL
+    ) WITHOUT ROWID
+    ''')
+    # Events that failed validation, with the reasons, and the number of
+    # checked and rejected events per source and run (see validate.py)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS quarantine (
+        event_key INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        event TEXT NOT NULL,
+        reasons TEXT NOT NULL,
+        first_seen TEXT NOT NULL,
+        last_changed TEXT NOT NULL,
+        is_reviewed INTEGER,
+        is_visible INTEGER
+    )
+    ''')
+    # Stored events moved to the quarantine (see validate.recheck) keep their
+    # review flags, which are restored when the event comes back
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS events_restore_quarantined AFTER INSERT ON events
+    WHEN new.is_reviewed = 0
+    AND EXISTS (SELECT 1 FROM quarantine WHERE event_key = new.event_key AND is_reviewed = 1)
+    BEGIN
+        UPDATE events
+        SET is_reviewed = 1,
+            is_visible = (SELECT is_visible FROM quarantine WHERE event_key = new.event_key)
+        WHERE id = new.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS validation_runs (
+        source TEXT NOT NULL,
+        run_at TEXT NOT NULL,
+        checked INTEGER NOT NULL,
+        rejected INTEGER NOT NULL,
+        PRIMARY KEY (source, run_at)
+    ) WITHOUT ROWID
+    ''')
     conn.commit()
 
     if logger:
         logger.debug("Database table 'events' created/verified")
+
+    if create_search_index(conn) and logger:
+        logger.debug("Full-text search index 'events_fts' created")
     return conn
+
+
+def create_search_index(conn):
+    """
+    Create the FTS5 full-text index over the summary, location and
+    description of all events, plus the triggers keeping it in sync with the
+    events table. The index is filled from existing events when it is
+    created. Returns True if the index was newly created.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'events_fts'")
+    if cursor.fetchone():
+        return False
+
+    # unicode61 with remove_diacritics folds umlauts and accents
+    # (e.g. 'Höfe' is indexed as 'hofe'), so both spellings match.
+    cursor.executescript('''
+    BEGIN;
+    CREATE VIRTUAL TABLE events_fts USING fts5(
+        summary, location, description,
+        content='events', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts(rowid, summary, location, description)
+        VALUES (new.id, new.summary, new.location, new.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, summary, location, description)
+        VALUES ('delete', old.id, old.summary, old.location, old.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF summary, location, description ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, summary, location, description)
+        VALUES ('delete', old.id, old.summary, old.location, old.description);
+        INSERT INTO events_fts(rowid, summary, location, description)
+        VALUES (new.id, new.summary, new.location, new.description);
+    END;
+    INSERT INTO events_fts(events_fts) VALUES ('rebuild');
+    COMMIT;
+    ''')
+    return True
+
+
+INSERT_EVENT_SQL = f'''
+INSERT OR IGNORE INTO events
+({EVENT_COLUMNS}, is_reviewed, is_visible)
+VALUES ({', '.join('?' * len(Event._fields))}, 0, 0)
+'''
+
+
+def insert_events(conn, events):
+    """
+    Insert the given Event records in a single transaction, skipping events
+    whose event_key already exists and quarantining invalid events (see
+    validate.py). Returns the number of inserted events.
+    """
+    with conn:
+        # rowcount sums up the inserted rows, excluding changes made by triggers
+        cursor = conn.executemany(INSERT_EVENT_SQL, filter_valid(conn, events))
+    return cursor.rowcount
+
+
+UPSERT_EVENT_SQL = f'''
+INSERT INTO events
+({EVENT_COLUMNS}, is_reviewed, is_visible)
+VALUES ({', '.join('?' * len(Event._fields))}, 0, 0)
+ON CONFLICT (event_key) DO UPDATE SET
+    end_date = excluded.end_date,
+    start_datetime = excluded.start_datetime,
+    end_datetime = excluded.end_datetime,
+    location = excluded.location,
+    description = excluded.description,
+    event_type = excluded.event_type,
+    source_categories = excluded.source_categories,
+    is_cancelled = 0,
+    -- Determined again (see categories.py) only if what it is based on changed;
+    -- the summary is part of the event_key
+    category = CASE WHEN description IS excluded.description AND event_type IS excluded.event_type
+                     AND source_categories IS excluded.source_categories THEN category END
+-- Unchanged events are not written at all
+WHERE end_date IS NOT excluded.end_date
+   OR start_datetime IS NOT excluded.start_datetime
+   OR end_datetime IS NOT excluded.end_datetime
+   OR location IS NOT excluded.location
+   OR description IS NOT excluded.description
+   OR event_type IS NOT excluded.event_type
+   OR source_categories IS NOT excluded.source_categories
+   OR is_cancelled != 0
+'''
+
+
+def upsert_events(conn, events):
+    """
+    Insert the given Event records, or update the details of existing events
+    with the same event_key (the review flags are kept, a cancelled event
+    is restored, the category is determined again if the text changed).
+    Invalid events are quarantined. Returns the number of inserted or
+    changed events.
+    """
+    with conn:
+        cursor = conn.executemany(UPSERT_EVENT_SQL, filter_valid(conn, events))
+    return cursor.rowcount
@@ -0,0 +1,218 @@
+"""
+Quality checks for parsed events, before they are stored.
+
+``validate_events`` checks a batch of events, one event at a time in plain
+Python (no dataframe library): required fields, ISO dates (not 'unknown'), the end not before the start, plausible
+durations and dates, start timestamps on the start day, and broken encodings
+(mojibake, replacement and control characters). Placeholder locations
+('Unknown', '-') are blanked. ``insert_events``/``upsert_events`` (and the
+writer) store only the valid events; the others are kept in the
+``quarantine`` table with the reasons, and every batch is counted per source
+in ``validation_runs``, so that the queries downstream can rely on clean
+data.
+
+    python -m werder_events.validate report events.sqlite --days 30
+    python -m werder_events.validate recheck events.sqlite
+"""
+import argparse
+import json
+import logging
+import re
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple
+
+from werder_events.dates import parse_iso_date
+from werder_events.event import Event, EVENT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Longest plausible event, e.g. an exhibition
+MAX_DURATION = timedelta(days=366)
+# Events further ahead are most likely a misparsed year
+MAX_DAYS_AHEAD = 2 * 366
+MIN_DATE = date(2000, 1, 1)
+MAX_SUMMARY_LENGTH = 500
+PLACEHOLDER_LOCATIONS = frozenset({'unknown', 'unbekannt', 'n/a', '-', 'none', 'null', 'tba'})
+# UTF-8 decoded as Latin-1 ('Ã¤' for 'ä'), U+FFFD and control characters
+BAD_ENCODING_RE = re.compile('[ÃÂ][\x80-\xbf]|\ufffd|[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+# The value at the end of a reason, e.g. "invalid start_date 'unknown'" -> "invalid start_date"
+REASON_VALUE_RE = re.compile(r" ('.*'|None|\d{4}-\d{2}-\d{2}|\d+ days)$")
+
+
+class Rejected(NamedTuple):
+    event: Event
+    reasons: tuple
+
+
+def parse_date(value):
+    try:
+        return parse_iso_date(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def validate_events(events, today=None):
+    """
+    Check a batch of events. Returns ``(valid, rejected, checked)``: the
+    valid (possibly cleaned) events, ``Rejected`` tuples with the reasons,
+    and the number of checked events per source.
+    """
+    latest = (today or date.today()) + timedelta(days=MAX_DAYS_AHEAD)
+    valid, rejected = [], []
+    checked = Counter()
+    for event in events:
+        checked[event.source] += 1
+        reasons = []
+        if not event.summary or not event.summary.strip():
+            reasons.append("missing summary")
+        elif len(event.summary) > MAX_SUMMARY_LENGTH:
+            reasons.append("summary too long")
+        if not event.source:
+            reasons.append("missing source")
+
+        start = parse_date(event.start_date)
+        end = parse_date(event.end_date)
+        if start is None:
+            reasons.append(f"invalid start_date {event.start_date!r}")
+        elif not MIN_DATE <= start <= latest:
+            reasons.append(f"implausible start_date {event.start_date}")
+        if end is None:
+            reasons.append(f"invalid end_date {event.end_date!r}")
+        elif start and end < start:
+            reasons.append("ends before it starts")
+        elif start and end - start > MAX_DURATION:
+            reasons.append(f"lasts {(end - start).days} days")
+        if event.start_datetime and event.start_datetime[:10] != event.start_date:
+            reasons.append("start_datetime not on start_date")
+
+        if BAD_ENCODING_RE.search(f"{event.summary}\n{event.location}\n{event.description}"):
+            reasons.append("broken encoding")
+
+        if reasons:
+            rejected.append(Rejected(event, tuple(reasons)))
+        elif event.location and event.location.strip().lower() in PLACEHOLDER_LOCATIONS:
+            valid.append(event._replace(location=''))
+        else:
+            valid.append(event)
+    return valid, rejected, checked
+
+
+def store_validation(conn, rejected, checked, checked_at=None):
+    """
+    Quarantine the rejected events and count the batch in
+    ``validation_runs``. Events that are already quarantined are only
+    written if the event or the reasons changed (so that the text export
+    doesn't change on every run). Doesn't commit, so it runs in the
+    transaction of the caller.
+    """
+    checked_at = (checked_at or datetime.now(timezone.utc)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    conn.executemany('''
+        INSERT INTO quarantine (event_key, source, event, reasons, first_seen, last_changed)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (event_key) DO UPDATE SET
+            event = excluded.event, reasons = excluded.reasons, last_changed = excluded.last_changed
+        WHERE event != excluded.event OR reasons != excluded.reasons
+    ''', [(r.event.event_key, r.event.source or '', json.dumps(r.event._asdict(), ensure_ascii=False),
+           '; '.join(r.reasons), checked_at, checked_at) for r in rejected])
+    rejected_per_source = Counter(r.event.source for r in rejected)
+    conn.executemany('''
+        INSERT INTO validation_runs (source, run_at, checked, rejected) VALUES (?, ?, ?, ?)
+        ON CONFLICT (source, run_at) DO UPDATE SET
+            checked = checked + excluded.checked, rejected = rejected + excluded.rejected
+    ''', [(source or '', checked_at, count, rejected_per_source[source]) for source, count in checked.items()])
+
+
+def reason_kind(reason):
+    return REASON_VALUE_RE.sub('', reason)
+
+
+def log_rejected(rejected, checked):
+    for source, count in Counter(r.event.source for r in rejected).items():
+        reasons = Counter(reason_kind(reason) for r in rejected if r.event.source == source for reason in r.reasons)
+        logger.warning(f"{source}: {count} of {checked[source]} events quarantined "
+                       f"({', '.join(f'{reason}: {n}' for reason, n in reasons.most_common(3))})")
+
+
+def filter_valid(conn, events):
+    """
+    Validate a batch of events, quarantine the invalid ones (in the current
+    transaction of ``conn``) and return the valid ones.
+    """
+    valid, rejected, checked = validate_events(events)
+    if checked:
+        store_validation(conn, rejected, checked)
+    if rejected:
+        log_rejected(rejected, checked)
+    return valid
+
+
+def report(conn, days=30, today=None):
+    """
+    Return ``(source, checked, rejected, top_reasons)`` for every source
+    validated in the last ``days`` days; the reasons are those of the
+    events quarantined (or changed) in that time.
+    """
+    since = ((today or date.today()) - timedelta(days=days)).isoformat()
+    reasons = {}
+    for source, reason_list in conn.execute("SELECT source, reasons FROM quarantine WHERE last_changed >= ?", (since,)):
+        for reason in reason_list.split('; '):
+            reasons.setdefault(source, Counter())[reason_kind(reason)] += 1
+    return [
+        (source, checked, rejected, reasons.get(source, Counter()).most_common(3))
+        for source, checked, rejected in conn.execute('''
+            SELECT source, sum(checked), sum(rejected) FROM validation_runs
+            WHERE run_at >= ? GROUP BY source ORDER BY source
+        ''', (since,))
+    ]
+
+
+def recheck(conn, today=None):
+    """
+    Validate the stored events and move the invalid ones to the quarantine,
+    e.g. after tightening the checks. The quarantine keeps their review
+    flags, which are restored if the event is inserted again (see the
+    events_restore_quarantined trigger). Returns the number of moved events.
+    """
+    events = [Event._make(row) for row in conn.execute(f"SELECT {EVENT_COLUMNS} FROM events")]
+    valid, rejected, _ = validate_events(events, today)
+    with conn:
+        store_validation(conn, rejected, {})
+        conn.executemany('''
+            UPDATE quarantine SET (is_reviewed, is_visible) =
+                (SELECT is_reviewed, is_visible FROM events WHERE events.event_key = quarantine.event_key)
+            WHERE event_key = ?
+        ''', [(r.event.event_key,) for r in rejected])
+        conn.executemany("DELETE FROM events WHERE event_key = ?", [(r.event.event_key,) for r in rejected])
+        # Blanked placeholder locations
+        conn.executemany("UPDATE events SET location = '' WHERE event_key = ? AND location != ''",
+                         [(event.event_key,) for event in valid if event.location == ''])
+    return len(rejected)
+
+
+def main():
+    from werder_events.utils import create_database, setup_logger
+
+    parser = argparse.ArgumentParser(description="Report the validation errors per source, or check the stored events.")
+    parser.add_argument("command", choices=("report", "recheck"),
+                        help="report: error rates per source, recheck: quarantine invalid stored events")
+    parser.add_argument("db_path", help="Path to the SQLite database file")
+    parser.add_argument("--days", type=int, default=30, help="Report on the last DAYS days (default: 30)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    setup_logger(__name__, args.verbose)
+    conn = create_database(args.db_path)
+    try:
+        if args.command == "recheck":
+            print(f"{recheck(conn)} events moved to the quarantine")
+            return
+        for source, checked, rejected, reasons in report(conn, args.days):
+            print(f"{source:30} {rejected:5} of {checked:6} events rejected ({rejected / checked:6.1%})"
+                  + (": " + ", ".join(f"{reason} ({count})" for reason, count in reasons) if reasons else ""))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
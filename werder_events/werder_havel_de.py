@@ -1,94 +1,170 @@
+"""
+Scraper for the event calendar of werder-havel.de.
+
+The calendar page lists every event in its own ``event__wrapper`` box. The
+boxes are cut out of the page with a cheap scan of the ``<div>`` tags and
+fingerprinted; ``update_events`` only parses boxes whose fingerprint wasn't
+seen in the last run. Events whose box disappeared are missing from the
+run's event keys and eventually cancelled (see presence.py).
+"""
+import hashlib
+import re
 import sys
 import sqlite3
-from datetime import datetime, date
-import re
+from datetime import date, timedelta
 import argparse
 import logging
-import hashlib
 from bs4 import BeautifulSoup
 import requests
 
-from werder_events.utils import create_database, setup_logger
+from werder_events.dates import RELATIVE_DAYS, parse_date_range, parse_time_range, to_timestamp
+from werder_events.event import Event, make_event_key
+from werder_events.fetch import fetch
+from werder_events.presence import update_presence
+from werder_events.utils import create_database, setup_logger, upsert_events
 
+SOURCE = 'werder-havel.de'
 
+BOX_START_RE = re.compile(r'<div class="[^"]*\bevent__wrapper\b[^"]*"')
+DIV_TAG_RE = re.compile(r'<(/?)div\b', re.IGNORECASE)
+RELATIVE_DAY_RE = re.compile('|'.join(RELATIVE_DAYS), re.IGNORECASE)
+DATE_LINE = '<p class="subhead">'
 
-def parse_events(input_file, logger):
-    logger.info(f"Parsing events from {input_file}")
+
+def load_html(input_file, logger):
     if input_file.startswith('http'):
         logger.debug("Fetching data from URL")
-        response = requests.get(input_file)
-        soup = BeautifulSoup(response.text, 'html.parser')
-    else:
-        logger.debug("Reading data from local file")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f, 'html.parser')
-
-    events = []
-    event_boxes = soup.find_all('div', class_='event__wrapper')
-    logger.info(f"Found {len(event_boxes)} event boxes")
-
-    for i, box in enumerate(event_boxes, 1):
-        logger.debug(f"Parsing event {i}/{len(event_boxes)}")
-        event = {}
-        event['link'] = box.find('a', class_='openerBild')['href']
-        event['title'] = box.find('h4', class_='event__title').text.strip()
-        event['location'] = box.find('div', class_='event-ort').text.strip()
-        event['address'] = box.find('div', class_='event-stele').text.strip()
-        
-        date_time = box.find('p', class_='subhead').text.strip().split('|')
-        event['date'] = date_time[0].strip()
-        event['time'] = date_time[1].strip() if len(date_time) > 1 else ''
-
-        # Parse date and time
-        date_match = re.search(r'(\d{2}\.\d{2}\.\d{4})', event['date'])
-        if date_match:
-            event['start'] = datetime.strptime(date_match.group(1), "%d.%m.%Y").date()
-        else:
-            logger.warning(f"Could not parse date for event: {event['title']}")
-            event['start'] = None
-
-        time_match = re.search(r'(\d{2}:\d{2})', event['time'])
-        if time_match:
-            event['start_time'] = time_match.group(1)
+        return fetch(input_file).text
+    logger.debug("Reading data from local file")
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def iter_boxes(html):
+    """Yield the HTML of each event box (the ``event__wrapper`` div) of the page."""
+    position = 0
+    while True:
+        start = BOX_START_RE.search(html, position)
+        if start is None:
+            return
+        # Find the matching closing tag
+        depth = 0
+        for tag in DIV_TAG_RE.finditer(html, start.start()):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                position = html.index('>', tag.end()) + 1
+                break
         else:
-            event['start_time'] = None
+            position = len(html)
+        yield html[start.start():position]
+
+
+def box_fingerprint(box, today):
+    """
+    Return the fingerprint of an event box. A box with a relative date
+    ('Heute') means another day tomorrow, so the date is part of its
+    fingerprint.
+    """
+    digest = hashlib.blake2b(box.encode('utf-8'), digest_size=16)
+    date_line = box.find(DATE_LINE)
+    if date_line == -1:
+        is_relative = RELATIVE_DAY_RE.search(box)
+    else:
+        is_relative = RELATIVE_DAY_RE.search(box, date_line, date_line + 200)
+    if is_relative:
+        digest.update(today.isoformat().encode())
+    return digest.hexdigest()
+
+
+def parse_box(box, logger, today):
+    """Parse the HTML of one event box into an Event."""
+    soup = BeautifulSoup(box, 'html.parser')
+    title = soup.find('h4', class_='event__title').text.strip()
+    location = soup.find('div', class_='event-ort').text.strip()
+
+    date_time = soup.find('p', class_='subhead').text.strip().split('|')
+    date_str = date_time[0].strip()
+    time_str = date_time[1].strip() if len(date_time) > 1 else ''
+
+    # Parse date and time
+    start, end = parse_date_range(date_str, today)
+    if start is None:
+        logger.warning(f"Could not parse date for event: {title}")
+    start_time, end_time = parse_time_range(time_str)
+    if start and start == end and start_time and end_time and end_time < start_time:
+        # Ends after midnight, e.g. '20:00 - 24:00'
+        end = start + timedelta(days=1)
+    start_date = start.isoformat() if start else 'unknown'
+    start_datetime = to_timestamp(start, start_time)
+
+    return Event(
+        summary=title,
+        start_date=start_date,
+        end_date=end.isoformat() if end else 'unknown',
+        start_datetime=start_datetime,
+        end_datetime=to_timestamp(end, end_time),
+        location=location,
+        description='',
+        event_type="Single Day" if start == end else "Multi-Day",
+        source=SOURCE,
+        event_key=make_event_key(title, start_date, SOURCE),
+    )
 
-        event['type'] = "Single Day"
-        events.append(event)
 
+def parse_events(input_file, logger):
+    logger.info(f"Parsing events from {input_file}")
+    return parse_html(load_html(input_file, logger), logger)
+
+
+def parse_html(html, logger, today=None):
+    """
+    Parse all events from the calendar page. Relative dates ('Heute',
+    'Morgen') are resolved against ``today`` (default: the current date).
+    """
+    today = today or date.today()
+    boxes = list(iter_boxes(html))
+    logger.info(f"Found {len(boxes)} event boxes")
+    events = [parse_box(box, logger, today) for box in boxes]
     logger.info(f"Parsed {len(events)} events")
     return events
 
 
-def insert_event(conn, event, logger):
-    cursor = conn.cursor()
-    event_hash = hashlib.md5(f"{event['title']}{event.get('start', 'unknown_date')}".encode()).hexdigest()
-    
-    start_date = event['start'].isoformat() if isinstance(event.get('start'), date) else 'unknown'
-    end_date = event.get('end', start_date)
-    if isinstance(end_date, date):
-        end_date = end_date.isoformat()
-    
-    cursor.execute('''
-    INSERT OR IGNORE INTO events 
-    (summary, start_date, end_date, location, description, event_type, source, event_hash, is_reviewed, is_visible)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        event['title'],
-        start_date,
-        end_date,
-        event['location'],
-        event.get('description', ''),
-        event['type'],
-        'werder-havel.de',
-        event_hash,
-        False,
-        False
-    ))
-    inserted = cursor.rowcount > 0
-    conn.commit()
-    logger.debug(f"Event {'inserted' if inserted else 'already exists'}: {event['title']}")
-    return inserted
+def update_events(conn, html, logger, today=None):
+    """
+    Bring the events of this source in the database up to date with the
+    calendar page: boxes with a new fingerprint are parsed and upserted.
+    Returns a tuple ``(event_keys, parsed, upserted)`` with the keys of
+    all events on the page.
+    """
+    today = today or date.today()
+    known = dict(conn.execute(
+        'SELECT fingerprint, event_key FROM box_fingerprints WHERE source = ?', (SOURCE,)))
+
+    fingerprints = {}
+    events = []
+    for box in iter_boxes(html):
+        fingerprint = box_fingerprint(box, today)
+        if fingerprint in fingerprints:
+            continue
+        if fingerprint in known:
+            fingerprints[fingerprint] = known[fingerprint]
+        else:
+            event = parse_box(box, logger, today)
+            events.append(event)
+            fingerprints[fingerprint] = event.event_key
+    logger.info(f"Found {len(fingerprints)} event boxes, {len(events)} new or changed")
+
+    event_keys = list(fingerprints.values())
+    if not fingerprints or fingerprints.keys() == known.keys():
+        # Unchanged (or broken, empty) page, nothing to write
+        return event_keys, 0, 0
+
+    upserted = upsert_events(conn, events)
+    with conn:
+        conn.execute('DELETE FROM box_fingerprints WHERE source = ?', (SOURCE,))
+        conn.executemany('INSERT INTO box_fingerprints (source, fingerprint, event_key) VALUES (?, ?, ?)',
+                         [(SOURCE, fingerprint, event_key) for fingerprint, event_key in fingerprints.items()])
+    return event_keys, len(events), upserted
 
 
 def main(input_file, output_db, verbose):
@@ -96,25 +172,23 @@ def main(input_file, output_db, verbose):
     conn = None
     try:
         logger.info("Starting event extraction and database insertion")
-        events = parse_events(input_file, logger)
-        
+        html = load_html(input_file, logger)
+
         conn = create_database(output_db, logger)
-        
-        inserted_count = 0
-        for event in events:
-            if insert_event(conn, event, logger):
-                inserted_count += 1
+
+        event_keys, parsed, upserted = update_events(conn, html, logger)
+        update_presence(conn, SOURCE, event_keys, logger)
 
         cursor = conn.cursor()
         cursor.execute('SELECT COUNT(*) FROM events')
         total_events = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(*) FROM events WHERE source = ?', ('werder-havel.de',))
+        cursor.execute('SELECT COUNT(*) FROM events WHERE source = ?', (SOURCE,))
         source_events = cursor.fetchone()[0]
-        
+
         logger.info(f"Events from {input_file} have been successfully imported into {output_db}")
         logger.info(f"Total events in database: {total_events}")
         logger.info(f"Total events from this source: {source_events}")
-        logger.info(f"New events added in this run: {inserted_count}")
+        logger.info(f"New or changed events in this run: {upserted} ({parsed} of {len(event_keys)} boxes parsed)")
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching data from URL: {e}")
     except IOError as e:
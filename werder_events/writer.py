@@ -0,0 +1,234 @@
+"""
+A single writer for the events database, shared by concurrent producers.
+
+SQLite allows one writer at a time; scrapers that each open their own
+connection to the same file and write in parallel wait for each other's
+locks and eventually fail with "database is locked". The ``Writer`` owns
+the only write connection, on its own thread, and takes work from a bounded
+queue that any number of producer threads (fetching and parsing sources)
+feed:
+
+    with Writer('events.sqlite', logger) as writer:
+        inserted = writer.insert(events)        # concurrent.futures.Future
+        ...
+        print(inserted.result())
+
+``insert``/``upsert`` calls are collected into batches that are committed
+in one transaction, once the batch holds ``batch_size`` events or
+``max_delay`` seconds after its first call, each call in a savepoint so a
+failing call doesn't take the others down. ``call(func, *args)`` runs
+``func(conn, *args)`` on the writer thread after everything queued before
+it is committed (for writes that need to read, e.g. presence tracking), and
+commits. The events are validated (see validate.py) on the producer's
+thread, the invalid ones are quarantined with the batch.
+When the queue is full, ``insert``/``upsert``/``call`` block the producer
+until the writer caught up (backpressure). ``close`` (or leaving the
+``with`` block) writes everything that was queued before it returns.
+Should the writer thread stop unexpectedly, the futures of everything
+queued, and of later calls, fail with its error.
+
+Functions passed to ``call`` run on the writer thread and must not wait for
+the results of the writer themselves.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple
+
+from werder_events.utils import INSERT_EVENT_SQL, UPSERT_EVENT_SQL, create_database
+from werder_events.validate import log_rejected, store_validation, validate_events
+
+# Calls waiting in the queue before producers block
+MAX_QUEUE = 64
+# Events committed in one transaction (each commit also flushes the full-text index)
+BATCH_SIZE = 5000
+# Seconds a batch waits for more calls
+MAX_DELAY = 0.2
+
+
+class WriteItem(NamedTuple):
+    sql: str  # INSERT_EVENT_SQL or UPSERT_EVENT_SQL, None for a call
+    events: list  # or (func, args) of a call
+    future: Future
+    validation: tuple = None  # (rejected, checked) of the events, see validate.py
+
+
+STOP = object()
+
+
+class Writer:
+    def __init__(self, db_path, logger=None, max_queue=MAX_QUEUE, batch_size=BATCH_SIZE, max_delay=MAX_DELAY):
+        self.db_path = db_path
+        self.logger = logger or logging.getLogger("writer")
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue = queue.Queue(max_queue)
+        self.batches = self.committed = 0
+        self.closed = False
+        # Why the writer thread stopped unexpectedly, if it did
+        self.error = None
+        # The connection is opened on the writer thread, sqlite3 connections are bound to their thread
+        started = Future()
+        self.thread = threading.Thread(target=self.run, args=(started,), name="werder-events-writer")
+        self.thread.start()
+        started.result()
+
+    def put(self, sql, payload, validation=None):
+        if self.closed:
+            raise RuntimeError("Writer is closed")
+        future = Future()
+        self.queue.put(WriteItem(sql, payload, future, validation))
+        if self.error is not None:
+            # The writer thread died after failing what was queued before
+            self.fail_queued()
+        return future
+
+    def fail_queued(self):
+        """Fail the futures of everything in the queue with the writer's error."""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self.fail(item)
+
+    def fail(self, item):
+        if item is not None and item is not STOP and not item.future.done():
+            item.future.set_exception(self.error)
+
+    def put_events(self, sql, events):
+        # Validated on the producer's thread; the writer only stores the result
+        valid, rejected, checked = validate_events(events)
+        if rejected:
+            log_rejected(rejected, checked)
+        return self.put(sql, valid, (rejected, checked) if checked else None)
+
+    def insert(self, events):
+        """
+        Insert the valid events (see validate.py), skipping existing ones.
+        The future's result is the number of inserted events.
+        """
+        return self.put_events(INSERT_EVENT_SQL, events)
+
+    def upsert(self, events):
+        """Insert or update the valid events (see utils.upsert_events). The result is the number of changed rows."""
+        return self.put_events(UPSERT_EVENT_SQL, events)
+
+    def call(self, func, *args):
+        """Run ``func(conn, *args)`` on the writer thread; the future's result is its return value."""
+        return self.put(None, (func, args))
+
+    def run(self, started):
+        try:
+            self.conn = create_database(self.db_path, self.logger)
+        except BaseException as e:
+            started.set_exception(e)
+            return
+        started.set_result(None)
+        item, batch = None, []
+        try:
+            item = self.queue.get()
+            while item is not STOP:
+                if item.sql is None:
+                    self.run_call(item)
+                    item = None
+                else:
+                    batch, item = self.collect_batch(item)
+                    self.write_batch(batch)
+                if item is None:
+                    item = self.queue.get()
+        except BaseException as e:
+            # Nothing is written anymore: fail the pending calls instead of
+            # leaving the producers waiting for their results forever
+            self.logger.error(f"The writer stopped: {e!r}")
+            self.error = e
+            for pending in [*batch, item]:
+                self.fail(pending)
+            self.fail_queued()
+        finally:
+            self.conn.close()
+
+    def collect_batch(self, item):
+        """
+        Collect the insert/upsert calls of a batch, starting with ``item``.
+        Returns the batch and the call or STOP that ended it (or None).
+        """
+        batch, size = [item], len(item.events)
+        deadline = time.monotonic() + self.max_delay
+        while size < self.batch_size:
+            try:
+                item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is STOP or item.sql is None:
+                # A call runs after the batch is committed
+                return batch, item
+            batch.append(item)
+            size += len(item.events)
+        return batch, None
+
+    def run_call(self, item):
+        func, args = item.events
+        if not item.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(self.conn, *args)
+            self.conn.commit()
+        except BaseException as e:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            item.future.set_exception(e)
+        else:
+            item.future.set_result(result)
+
+    def write_batch(self, batch):
+        """Write the calls of a batch in one transaction, each in a savepoint."""
+        results = []
+        try:
+            self.conn.execute("BEGIN")
+            for item in batch:
+                self.conn.execute("SAVEPOINT item")
+                try:
+                    if item.validation:
+                        store_validation(self.conn, *item.validation)
+                    results.append(self.conn.executemany(item.sql, item.events).rowcount)
+                except Exception as e:
+                    # E.g. a constraint or a badly typed parameter only fails this call
+                    self.conn.execute("ROLLBACK TO item")
+                    results.append(e)
+                self.conn.execute("RELEASE item")
+            self.conn.commit()
+            self.committed += sum(len(item.events) for item in batch)
+        except Exception as e:
+            # E.g. the disk is full: the whole batch failed
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            self.logger.error(f"Writing a batch of {len(batch)} calls failed: {e}")
+            results = [e] * len(batch)
+        self.batches += 1
+        for item, result in zip(batch, results):
+            if item.future.set_running_or_notify_cancel():
+                if isinstance(result, Exception):
+                    item.future.set_exception(result)
+                else:
+                    item.future.set_result(result)
+
+    def close(self):
+        """
+        Write everything queued so far and close the connection. The
+        producers must be done queueing.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(STOP)
+        self.thread.join()
+        self.logger.debug(f"Writer closed: {self.committed} events in {self.batches} batches")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()